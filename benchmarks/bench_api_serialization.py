@@ -0,0 +1,100 @@
+"""
+Measures the CPU cost of serializing the device list for GET /api/devices.
+
+Compares FastAPI's default encoding of Device dataclasses with the
+inventory's cached per-device JSON, for a full list (cache hit), a list
+rebuilt after 1% of the devices changed, and a filtered list. Also reports
+the gzip cost and ratio for the response body.
+
+Usage:
+    python benchmarks/bench_api_serialization.py [DEVICES]
+"""
+import sys
+import gzip
+import json
+import time
+import logging
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pingpoint.inventory import Inventory  # noqa: E402
+from pingpoint.models import Device, Fingerprint  # noqa: E402
+from pingpoint.persistence import JournaledStore  # noqa: E402
+from pingpoint.serialization import orjson  # noqa: E402
+
+ROUNDS = 20
+
+
+def make_devices(count):
+    now = datetime.now()
+    ports = [
+        {'portid': str(port), 'protocol': 'tcp', 'service_name': name, 'product': product, 'version': '1.0'}
+        for port, name, product in ((22, 'ssh', 'OpenSSH'), (80, 'http', 'lighttpd'), (443, 'https', 'nginx'))
+    ]
+    devices = []
+    for i in range(count):
+        mac = ":".join(f"{(i >> shift) & 0xff:02X}" for shift in (40, 32, 24, 16, 8, 0))
+        devices.append(Device(
+            mac=mac,
+            ip_addresses=[f"10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}"],
+            vendor="Apple" if i % 4 == 0 else "Intel",
+            hostname=f"host-{i}",
+            friendly_name=f"Device {i}",
+            subnet="10.0.0.0/8",
+            status="online",
+            first_seen=now,
+            last_seen=now,
+            fingerprint=Fingerprint(os_match="Linux 5.X", os_accuracy="95", ports=list(ports), tier="quick"),
+        ))
+    return devices
+
+
+def per_request(func):
+    """Returns the average CPU milliseconds per call and the last result."""
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        result = func()
+    return (time.process_time() - start) * 1000 / ROUNDS, result
+
+
+def main(count):
+    logging.disable(logging.WARNING)
+    devices = make_devices(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "devices.json"
+        JournaledStore(path).snapshot(device.to_dict() for device in devices)
+        inventory = Inventory(persistence_file=path)
+
+        print(f"{count} devices, encoder: {'orjson' if orjson else 'json'}")
+        rows = []
+        rows.append(("FastAPI jsonable_encoder", *per_request(
+            lambda: json.dumps(jsonable_encoder(inventory.all_devices())).encode())))
+        rows.append(("cached list (hit)", *per_request(lambda: inventory.devices_json()[1])))
+
+        changed = [device.mac for device in devices[:max(1, count // 100)]]
+
+        def rebuild():
+            # Republishing re-encodes only the changed devices.
+            for i, mac in enumerate(changed):
+                inventory.update_device_details(mac, f"Renamed {time.time()} {i}", "", False)
+            return inventory.devices_json()[1]
+
+        rows.append(("cached list after 1% change", *per_request(rebuild)))
+        rows.append(("cached filtered list", *per_request(
+            lambda: inventory.encode_devices(inventory.find_devices(vendor="Apple")))))
+
+        print(f"{'path':<30}{'cpu ms/request':>16}{'bytes':>12}")
+        for name, cpu, body in rows:
+            print(f"{name:<30}{cpu:>16.2f}{len(body):>12}")
+
+        body = inventory.devices_json()[1]
+        cpu, compressed = per_request(lambda: gzip.compress(body, compresslevel=9))
+        print(f"{'gzip (level 9)':<30}{cpu:>16.2f}{len(compressed):>12}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
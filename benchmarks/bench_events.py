@@ -0,0 +1,96 @@
+"""
+Measures the memory used by the in-memory event history.
+
+Compares events that embed a full copy of the device (as they were stored
+before events became compact) with `EventStore`'s compact records, for
+devices that have been fingerprinted.
+
+Usage:
+    python benchmarks/bench_events.py [EVENTS]
+"""
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pingpoint.events import EventStore  # noqa: E402
+from pingpoint.models import Device, Fingerprint  # noqa: E402
+
+DEVICES = 500
+
+
+def make_devices():
+    now = datetime.now()
+    ports = [
+        {'portid': str(port), 'protocol': 'tcp', 'service_name': name, 'product': product, 'version': '1.0'}
+        for port, name, product in ((22, 'ssh', 'OpenSSH'), (80, 'http', 'lighttpd'), (443, 'https', 'nginx'))
+    ]
+    return [
+        Device(
+            mac=f"AA:BB:CC:00:{i >> 8:02X}:{i & 0xff:02X}",
+            ip_addresses=[f"192.168.{i >> 8}.{i & 0xff}"],
+            vendor="Intel",
+            hostname=f"host-{i}",
+            friendly_name=f"Device {i}",
+            subnet="192.168.0.0/16",
+            status="online",
+            first_seen=now,
+            last_seen=now,
+            fingerprint=Fingerprint(os_match="Linux 5.X", os_accuracy="95", ports=list(ports), tier="quick"),
+        )
+        for i in range(DEVICES)
+    ]
+
+
+def events(devices, count):
+    start = datetime.now()
+    for i in range(count):
+        device = devices[i % len(devices)]
+        offline = i % 2 == 0
+        yield device, {
+            "timestamp": (start + timedelta(seconds=i)).isoformat(),
+            "type": "device_offline" if offline else "device_reconnected",
+            "mac": device.mac,
+            "message": f"Device {device.friendly_name} is {'now offline' if offline else 'back online'}.",
+        }
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def main(count):
+    devices = make_devices()
+
+    def full_copies():
+        store = []
+        for device, event in events(devices, count):
+            store.append({"timestamp": event["timestamp"], "type": event["type"],
+                          "device": device.to_dict(), "message": event["message"]})
+        return store
+
+    def compact():
+        store = EventStore(capacity=count)
+        for _, event in events(devices, count):
+            store.append(event)
+        return store
+
+    full = measure(full_copies)
+    small = measure(compact)
+    print(f"{count} events for {DEVICES} devices")
+    print(f"{'representation':<22}{'bytes/event':>14}{'total MB':>12}")
+    print(f"{'full device copy':<22}{full / count:>14.0f}{full / 1e6:>12.1f}")
+    print(f"{'compact':<22}{small / count:>14.0f}{small / 1e6:>12.1f}")
+    print(f"{full / small:.1f}x more events fit in the same memory")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
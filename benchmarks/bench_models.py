@@ -0,0 +1,108 @@
+"""
+Measures the memory and load time of the device model.
+
+Builds device dictionaries in the devices.json format (random, mostly
+locally administered MACs as seen from phones, a handful of vendors and
+subnets, and fingerprints drawn from a small set of common ports), then
+measures converting them to `Device` objects and the memory those objects
+keep once the parsed dictionaries are freed. Then measures a
+full `Inventory` startup from devices.json and the memory it retains, which
+includes the published view and its cached JSON.
+
+Usage:
+    python benchmarks/bench_models.py [SIZE ...]
+"""
+import gc
+import sys
+import json
+import time
+import random
+import logging
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pingpoint.inventory import Inventory  # noqa: E402
+from pingpoint.models import Device, Fingerprint  # noqa: E402
+from pingpoint.persistence import JournaledStore  # noqa: E402
+
+VENDORS = ["Apple, Inc.", "Samsung Electronics Co.,Ltd", "Ubiquiti Inc", "Intel Corporate", None]
+SUBNETS = ["192.168.1.0/24", "192.168.10.0/24", "10.0.0.0/16"]
+PORTS = [
+    {'portid': '22', 'protocol': 'tcp', 'service_name': 'ssh', 'product': 'OpenSSH', 'version': '8.9p1'},
+    {'portid': '53', 'protocol': 'tcp', 'service_name': 'domain', 'product': 'dnsmasq', 'version': '2.89'},
+    {'portid': '80', 'protocol': 'tcp', 'service_name': 'http', 'product': 'lighttpd', 'version': None},
+    {'portid': '443', 'protocol': 'tcp', 'service_name': 'https', 'product': None, 'version': None},
+    {'portid': '62078', 'protocol': 'tcp', 'service_name': 'iphone-sync', 'product': None, 'version': None},
+]
+
+
+def make_records(count):
+    rng = random.Random(count)
+    now = datetime.now()
+    records = []
+    for i in range(count):
+        mac = bytes([rng.randrange(256) | 0x02] + [rng.randrange(256) for _ in range(5)]).hex(':').upper()
+        device = Device(
+            mac=mac,
+            ip_addresses=[f"192.168.1.{i % 250 + 2}"],
+            vendor=VENDORS[i % len(VENDORS)],
+            hostname=f"host-{i}",
+            friendly_name=mac,
+            subnet=SUBNETS[i % len(SUBNETS)],
+            status="online" if i % 3 else "offline",
+            first_seen=now - timedelta(days=i % 30),
+            last_seen=now - timedelta(seconds=i),
+            fingerprint=Fingerprint(os_match="Apple iOS 16", os_accuracy="95",
+                                    ports=rng.sample(PORTS, 3), tier="quick") if i % 2 else None,
+        )
+        records.append(device.to_dict())
+    # Round-trip through JSON so strings are not shared with the generator.
+    return json.loads(json.dumps(records))
+
+
+def measure_memory(build):
+    """Returns the bytes still allocated by `build` once it returns, and its result."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used, result
+
+
+def main(sizes):
+    logging.disable(logging.WARNING)
+    print(f"{'devices':>9}{'from_dict ms':>14}{'bytes/device':>14}{'startup ms':>12}{'bytes/device':>14}")
+    for size in sizes:
+        records = make_records(size)
+        start = time.perf_counter()
+        devices = {record['mac']: Device.from_dict(record) for record in records}
+        load = time.perf_counter() - start
+        assert [device.to_dict() for device in devices.values()] == records
+        del devices
+        # Parsed inside the measurement, so values the devices keep from the
+        # parsed dictionaries are counted and the dictionaries themselves are not.
+        text = json.dumps(records)
+        used, _ = measure_memory(lambda: {record['mac']: Device.from_dict(record) for record in json.loads(text)})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "devices.json"
+            JournaledStore(path).snapshot(records)
+            del records
+            start = time.perf_counter()
+            Inventory(persistence_file=path)
+            startup = time.perf_counter() - start
+            retained, inventory = measure_memory(lambda: Inventory(persistence_file=path))
+            assert len(inventory.all_devices()) == size
+
+        print(f"{size:>9}{load * 1000:>14.1f}{used / size:>14.0f}{startup * 1000:>12.1f}{retained / size:>14.0f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000, 50000])
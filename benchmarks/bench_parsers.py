@@ -0,0 +1,102 @@
+"""
+Measures parsing EdgeMax 'show arp' and 'show dhcp leases' output.
+
+Builds synthetic router dumps in which most devices have both an ARP entry
+and a lease, some only one of the two, and a few ARP entries are
+incomplete. Then compares the previous approach (a greedy regex per ARP line
+with a MAC re-check, a split per lease line, and keeping whichever record for
+a MAC came first) with `parse_edgemax_collection`, which reads each output in
+one pass and merges the ARP and lease fields per MAC address.
+
+Usage:
+    python benchmarks/bench_parsers.py [SIZE ...]
+"""
+import re
+import sys
+import time
+import random
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pingpoint.scanner import parse_edgemax_collection  # noqa: E402
+
+POOLS = ["LAN_POOL", "IOT_POOL", "GUEST_POOL"]
+NAMES = ["?", "iPhone", "living-room-tv", "Galaxy S23", "esp-3c71bf"]
+
+
+def make_dumps(count):
+    """Returns (arp_data, leases_data) for `count` devices."""
+    rng = random.Random(count)
+    arp = ["IP address       HW type     HW address           Flags Mask            Iface"]
+    leases = ["IP address      Hardware Address   Lease expiration     Pool       Client Name",
+              "----------      ----------------   ------------------   ----       -----------"]
+    for i in range(count):
+        ip = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+        mac = bytes([rng.randrange(256) & 0xFE] + [rng.randrange(256) for _ in range(5)]).hex(':')
+        kind = i % 20
+        if kind == 0:
+            arp.append(f"{ip:<16} 0x1         <incomplete>         C                     eth1")
+            continue
+        if kind != 1:
+            arp.append(f"{ip:<16} 0x1         {mac.upper():<20} C                     eth1")
+        if kind != 2:
+            expiry = f"2025/06/{rng.randrange(1, 29):02d} {rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}"
+            leases.append(f"{ip:<15} {mac:<18} {expiry}  {POOLS[i % len(POOLS)]:<10} {NAMES[i % len(NAMES)]}")
+    return "\n".join(arp), "\n".join(leases)
+
+
+def legacy_parse(arp_data, leases_data):
+    """The parsing and deduplication used by EdgeMaxScanner.scan before the single-pass parser."""
+    def is_valid_mac(mac):
+        return re.match(r"^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$", mac)
+
+    parsed_arp = []
+    arp_pattern = re.compile(r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\s+.*\s+([0-9a-fA-F:]{17})')
+    for line in arp_data.strip().split('\n'):
+        match = arp_pattern.search(line)
+        if match:
+            ip, mac = match.groups()
+            if is_valid_mac(mac):
+                parsed_arp.append({'ip': ip, 'mac': mac, 'vendor': None})
+    parsed_leases = []
+    for line in leases_data.strip().split('\n')[1:]:
+        parts = line.split()
+        if len(parts) >= 5 and is_valid_mac(parts[1]):
+            hostname = ' '.join(parts[5:]) if parts[5] != '?' else None
+            parsed_leases.append({'ip': parts[0], 'mac': parts[1], 'hostname': hostname, 'subnet': parts[4], 'vendor': None})
+
+    devices_by_mac = {}
+    for device in parsed_arp + parsed_leases:
+        mac_upper = device['mac'].upper()
+        if mac_upper not in devices_by_mac:
+            devices_by_mac[mac_upper] = device
+    return list(devices_by_mac.values())
+
+
+def best_of(runs, parse, *args):
+    """Returns the fastest of several runs in seconds, and the last result."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = parse(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(sizes):
+    logging.disable(logging.WARNING)
+    print(f"{'entries':>9}{'legacy ms':>11}{'single-pass ms':>16}{'speedup':>9}{'hostnames kept':>16}")
+    for size in sizes:
+        arp_data, leases_data = make_dumps(size)
+        legacy, legacy_devices = best_of(5, legacy_parse, arp_data, leases_data)
+        single, devices = best_of(5, parse_edgemax_collection, arp_data, leases_data)
+        assert len(devices) == len(legacy_devices)
+        hostnames = f"{sum(1 for d in legacy_devices if d.get('hostname'))}->{sum(1 for d in devices if d['hostname'])}"
+        print(f"{size:>9}{legacy * 1000:>11.1f}{single * 1000:>16.1f}{legacy / single:>8.1f}x{hostnames:>16}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000, 50000, 100000])
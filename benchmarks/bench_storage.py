@@ -0,0 +1,69 @@
+"""
+Compares the JSON (snapshot plus journal) and SQLite device stores.
+
+For each inventory size, measures a full snapshot, a save of 1% of the
+devices and a cold load.
+
+Usage:
+    python benchmarks/bench_storage.py [SIZE ...]
+"""
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pingpoint.models import Device  # noqa: E402
+from pingpoint.persistence import JournaledStore, SQLiteStore  # noqa: E402
+
+VENDORS = ["Apple", "Samsung", "Ubiquiti", "Intel", "Raspberry Pi", None]
+
+
+def make_devices(count):
+    now = datetime.now()
+    devices = []
+    for i in range(count):
+        mac = ":".join(f"{(i >> shift) & 0xff:02X}" for shift in (40, 32, 24, 16, 8, 0))
+        devices.append(Device(
+            mac=mac,
+            ip_addresses=[f"10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}"],
+            vendor=VENDORS[i % len(VENDORS)],
+            subnet=f"10.{(i >> 16) & 0xff}.0.0/16",
+            status="online" if i % 3 else "offline",
+            last_seen=now - timedelta(seconds=i),
+        ).to_dict())
+    return devices
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def bench(name, store, reopen, devices):
+    changed = devices[:max(1, len(devices) // 100)]
+    snapshot, _ = timed(lambda: store.snapshot(devices))
+    write, _ = timed(lambda: store.write(changed))
+    load, loaded = timed(lambda: reopen().load())
+    assert len(loaded) == len(devices)
+    print(f"{name:<8}{len(devices):>9}{snapshot * 1000:>12.1f}{write * 1000:>12.1f}{load * 1000:>12.1f}")
+
+
+def main(sizes):
+    print(f"{'store':<8}{'devices':>9}{'snapshot ms':>12}{'write 1% ms':>12}{'load ms':>12}")
+    for size in sizes:
+        devices = make_devices(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = Path(tmp) / "devices.json"
+            bench("json", JournaledStore(json_path), lambda: JournaledStore(json_path), devices)
+            db_path = Path(tmp) / "pingpoint.db"
+            sqlite_store = SQLiteStore(db_path)
+            bench("sqlite", sqlite_store, lambda: sqlite_store, devices)
+            sqlite_store.close()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
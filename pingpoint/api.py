@@ -1,12 +1,25 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, Request, Response, Query
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from datetime import datetime
 import yaml
 
 from pingpoint.inventory import Inventory
-from pingpoint.scanner import EdgeMaxScanner, NmapScanner
+from pingpoint.enrichment import EnrichmentQueue
+from pingpoint.cache import FingerprintCache
+from pingpoint.fingerbank import RateLimiter
+from pingpoint.notifications import NotificationDispatcher
+from pingpoint.coordinator import ScanCoordinator
+from pingpoint.liveness import LivenessProber
+from pingpoint.broadcast import Broadcaster
+from pingpoint.serialization import dumps
+from pingpoint.eventlog import EventLog
+from pingpoint.persistence import SQLiteStore, create_store
+from pingpoint.scanner import EdgeMaxScanner, NmapScanner, collection_engine
+from functools import partial
 from pingpoint.config import load_config
 from pathlib import Path
 import logging
@@ -34,7 +47,8 @@ class FingerbankConfig(BaseModel):
 class AppConfig(BaseModel):
     scan_interval: int = Field(..., alias='scan_interval')
     subnets: List[str]
-    edgemax: EdgeMaxConfig
+    # Optional, since routers may be configured under 'routers' instead
+    edgemax: Optional[EdgeMaxConfig] = None
     home_assistant: HomeAssistantConfig = Field(..., alias='home_assistant')
     fingerbank: FingerbankConfig
 
@@ -44,17 +58,102 @@ app = FastAPI(
     description="A home network monitoring service.",
     version="1.0.0"
 )
+# Device lists compress well; small responses are not worth compressing.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+@app.on_event("startup")
+def startup_event():
+    """Starts the background enrichment workers, notification dispatcher and liveness prober."""
+    enrichment_queue.start()
+    notifier.start()
+    if liveness_config.get('enabled', True):
+        liveness_prober.start()
 
 @app.on_event("shutdown")
 def shutdown_event():
     """Saves the inventory to disk when the application shuts down."""
     logging.info("Application shutting down, saving inventory...")
-    inventory.save_to_disk()
+    liveness_prober.stop()
+    enrichment_queue.stop()
+    notifier.stop()
+    EdgeMaxScanner.close_all()
+    inventory.save_to_disk(snapshot=True)
+    event_log.close()
     logging.info("Inventory saved.")
 
+# Settings that are only read once at startup. The app can still start
+# without a config file; the scanner loop reports that error.
+try:
+    startup_config = load_config(ROOT_DIR / "config.yaml")
+except Exception:
+    startup_config = {}
+
 # This will be our single, shared inventory instance
 # In a real application, you might manage this dependency more robustly
-inventory = Inventory(persistence_file=ROOT_DIR / "devices.json")
+events_config = startup_config.get('events') or {}
+storage_config = startup_config.get('storage') or {}
+if storage_config.get('path'):
+    storage_config = dict(storage_config, path=ROOT_DIR / storage_config['path'])
+store = create_store(
+    storage_config,
+    ROOT_DIR / "devices.json",
+    snapshot_interval=(startup_config.get('persistence') or {}).get('snapshot_interval_minutes', 10) * 60
+)
+if isinstance(store, SQLiteStore):
+    # Events share the database with devices instead of using log segments.
+    event_log = store
+else:
+    event_log = EventLog(
+        ROOT_DIR / events_config.get('log_directory', 'events'),
+        max_segment_bytes=int(events_config.get('max_segment_mb', 8) * 1024 * 1024),
+        max_segment_age=events_config.get('max_segment_age_hours', 24) * 3600,
+        max_segments=events_config.get('max_segments', 100)
+    )
+offline_config = startup_config.get('offline') or {}
+inventory = Inventory(
+    persistence_file=ROOT_DIR / "devices.json",
+    event_capacity=events_config.get('capacity', 100000),
+    event_log=event_log,
+    store=store,
+    last_seen_resolution=(startup_config.get('api') or {}).get('last_seen_resolution_seconds', 300),
+    offline_debounce_scans=offline_config.get('debounce_scans', 2),
+    offline_grace_seconds=offline_config['grace_minutes'] * 60 if offline_config.get('grace_minutes') is not None else None
+)
+enrichment_config = startup_config.get('enrichment') or {}
+fingerbank_requests_per_minute = (startup_config.get('fingerbank') or {}).get('requests_per_minute', 5)
+enrichment_queue = EnrichmentQueue(
+    inventory,
+    persistence_file=ROOT_DIR / "enrichment_queue.json",
+    workers=enrichment_config.get('workers', 2),
+    config_path=ROOT_DIR / "config.yaml",
+    cache=FingerprintCache(
+        ROOT_DIR / "fingerprint_cache.json",
+        ttl=enrichment_config.get('cache_ttl_hours', 168) * 3600,
+        max_entries=enrichment_config.get('cache_size', 10000)
+    ),
+    rate_limiter=RateLimiter(fingerbank_requests_per_minute) if fingerbank_requests_per_minute else None
+)
+inventory.enrichment_queue = enrichment_queue
+notifications_config = startup_config.get('notifications') or {}
+notifier = NotificationDispatcher(
+    queue_size=notifications_config.get('queue_size', 1000),
+    max_retries=notifications_config.get('max_retries', 3),
+    retry_backoff=notifications_config.get('retry_backoff_seconds', 1.0),
+    batch_window=notifications_config.get('batch_window_seconds', 0)
+)
+inventory.notifier = notifier
+scan_coordinator = ScanCoordinator(inventory)
+liveness_config = startup_config.get('liveness') or {}
+liveness_prober = LivenessProber(
+    inventory,
+    interval=liveness_config.get('interval_seconds', 10),
+    timeout=liveness_config.get('timeout_seconds', 1.0),
+    misses=liveness_config.get('misses', 2),
+    methods=liveness_config.get('methods', ['tcp', 'icmp']),
+    webhook_url=(startup_config.get('home_assistant') or {}).get('webhook_url')
+)
+broadcaster = Broadcaster()
+inventory.broadcaster = broadcaster
 
 # Mount the 'static' directory to serve frontend files
 # The path is constructed relative to the project root
@@ -74,63 +173,214 @@ async def read_config_page(request: Request):
 
 
 @app.get("/api/devices")
-async def get_devices():
+async def get_devices(
+    request: Request,
+    since: Optional[int] = None,
+    status: Optional[str] = None,
+    subnet: Optional[str] = None,
+    vendor: Optional[str] = None,
+    ip: Optional[str] = None,
+    hostname: Optional[str] = None,
+    category: Optional[str] = None
+):
     """
-    Returns a list of all known devices from the inventory.
+    Returns a list of all known devices from the inventory, optionally filtered
+    by status, subnet, vendor, IP address, hostname or category.
+
+    `subnet` may be a CIDR network such as 10.10.0.0/16, which matches every
+    device whose current IP address is in it. `ip` also matches devices that
+    had the address before, after the one that holds it now. Filtered lookups use
+    the inventory's indexes rather than checking every device.
+
+    The response carries the inventory's change sequence number as its ETag,
+    and a matching If-None-Match header gets a 304 Not Modified.
+
+    With `since`, only the devices changed and removed after that sequence
+    number are returned, as {"seq", "reset", "changed", "removed"}. Pass the
+    returned `seq` on the next request. If `reset` is true, `changed` holds
+    every device and replaces the client's copy. Filters do not apply in
+    this mode.
     """
-    return inventory.all_devices()
+    # Responses are assembled from the inventory's cached per-device JSON.
+    if since is not None:
+        seq, reset, changed, removed = inventory.changes_since(since)
+        content = b'{"seq":%d,"reset":%s,"changed":%s,"removed":%s}' % (
+            seq, b"true" if reset else b"false", inventory.encode_devices(changed), dumps(removed))
+        return Response(content=content, media_type="application/json")
+
+    filters = {'status': status, 'subnet': subnet, 'vendor': vendor, 'ip': ip, 'hostname': hostname,
+               'category': category}
+    if all(value is None for value in filters.values()):
+        seq, content = inventory.devices_json()
+        etag = f'"{seq}"'
+    else:
+        # Read the sequence number before the devices so the ETag is never newer than the content.
+        etag = f'"{inventory.seq}"'
+        content = None
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    if content is None:
+        content = inventory.encode_devices(inventory.find_devices(**filters))
+    return Response(content=content, media_type="application/json", headers={"ETag": etag})
 
 
 @app.get("/api/events")
-async def get_events():
+async def get_events(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    mac: Optional[str] = None,
+    type: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=5000),
+    cursor: Optional[int] = None,
+):
+    """
+    Returns recent events, newest first.
+
+    Events can be filtered by time range, MAC address and event type. When
+    more events match than `limit`, the `X-Next-Cursor` response header holds
+    the cursor to pass for the next (older) page.
+    """
+    events, next_cursor = inventory.events.query(
+        since=since,
+        until=until,
+        mac=mac.upper() if mac else None,
+        event_type=type,
+        limit=limit,
+        cursor=cursor
+    )
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else None
+    return Response(content=dumps([inventory.expand_event(event) for event in events]),
+                    media_type="application/json", headers=headers)
+
+
+@app.get("/api/stream")
+async def stream(request: Request, last_event_id: Optional[int] = None):
     """
-    Returns a list of recent events.
+    Streams inventory changes as server-sent events.
+
+    'devices' messages carry inventory deltas in the format of
+    `/api/devices?since=` plus a `since` field (the sequence number the delta
+    applies to). 'event' messages carry new events as returned by
+    `/api/events`. A 'reset' message means the client missed messages and
+    should reload. Clients resume with the standard Last-Event-ID header (or
+    the `last_event_id` parameter).
     """
-    return inventory.events
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    subscription = broadcaster.subscribe(last_event_id)
+
+    async def messages():
+        try:
+            while True:
+                message = await subscription.get(timeout=15)
+                if message is None:
+                    if await request.is_disconnected():
+                        return
+                    # A comment line keeps proxies from closing an idle stream.
+                    yield ": keepalive\n\n"
+                    continue
+                yield message
+        except ConnectionAbortedError:
+            return
+        finally:
+            subscription.close()
+
+    return StreamingResponse(messages(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/api/stream/status")
+async def get_stream_status():
+    """
+    Returns the number of connected stream clients and messages sent.
+    """
+    return broadcaster.stats()
 
 
-def run_and_update_scan(scanner_instance):
-    """Helper function to run a scan and update the inventory."""
+@app.get("/api/enrichment/status")
+async def get_enrichment_status():
+    """
+    Returns the fingerprinting queue depth and recent job latencies.
+    """
+    return enrichment_queue.stats()
+
+
+@app.get("/api/notifications/status")
+async def get_notification_status():
+    """
+    Returns the notification queue depth, delivery counters and send latencies.
+    """
+    return notifier.stats()
+
+
+@app.get("/api/liveness/status")
+async def get_liveness_status():
+    """
+    Returns liveness probe rounds, timings and the devices currently failing probes.
+    """
+    return liveness_prober.stats()
+
+
+@app.get("/api/routers")
+async def get_router_health():
+    """
+    Returns the health of each EdgeMax router polled so far.
+    """
+    return collection_engine.health()
+
+
+def trigger_scan(source: str, scan, queue: bool) -> dict:
+    """
+    Hands a scan to the coordinator and describes the outcome.
+
+    Args:
+        source: The scan source name.
+        scan: A callable that runs the scan and returns (or yields) the hosts found.
+        queue: Whether to queue a follow-up scan if one is already running.
+    """
     config = load_config(ROOT_DIR / "config.yaml")
     webhook_url = config.get('home_assistant', {}).get('webhook_url')
-    try:
-        results = scanner_instance.scan()
-        inventory.update_from_scan(results, webhook_url)
-        inventory.save_to_disk()
-    except Exception as e:
-        logging.error(f"Manual scan failed: {e}")
+    outcome = scan_coordinator.trigger(source, scan, webhook_url, queue_if_running=queue)
+    messages = {
+        "started": f"{source} scan initiated in the background.",
+        "attached": f"A {source} scan is already running.",
+        "queued": f"A {source} scan is already running; another will start when it finishes.",
+    }
+    return {"message": messages[outcome], "status": outcome, "scan": scan_coordinator.status()[source]}
 
 
 @app.post("/api/scan/edgemax")
-async def trigger_edgemax_scan(background_tasks: BackgroundTasks):
-    """Triggers a network scan using the EdgeMax router."""
+async def trigger_edgemax_scan(queue: bool = False):
+    """Triggers a network scan of all configured EdgeMax routers."""
     try:
         config = load_config(ROOT_DIR / "config.yaml")
-        em_config = config['edgemax']
-        scanner = EdgeMaxScanner(
-            host=em_config['host'],
-            port=em_config['port'],
-            username=em_config['username'],
-            password=em_config['password']
-        )
-        background_tasks.add_task(run_and_update_scan, scanner)
-        return {"message": "EdgeMax scan initiated in the background."}
+        return trigger_scan("edgemax", partial(collection_engine.collect, config, fallback=False), queue)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/scan/nmap")
-async def trigger_nmap_scan(background_tasks: BackgroundTasks):
+async def trigger_nmap_scan(queue: bool = False):
     """Triggers a network scan using Nmap."""
     try:
         config = load_config(ROOT_DIR / "config.yaml")
-        scanner = NmapScanner(subnets=config['subnets'])
-        background_tasks.add_task(run_and_update_scan, scanner)
-        return {"message": "Nmap scan initiated in the background."}
+        scanner = NmapScanner.from_config(config)
+        # Stream hosts into the inventory while the sweep is running.
+        return trigger_scan("nmap", scanner.scan_iter, queue)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/scan/status")
+async def get_scan_status():
+    """
+    Returns the state of each scan source: whether it is running, hosts
+    processed so far, and the duration and result count of the last scan.
+    """
+    return scan_coordinator.status()
+
+
 @app.put("/api/device/{mac}")
 async def update_device(mac: str, details: DeviceDetails):
     """Updates a device's friendly name, notes, and alert settings."""
@@ -142,9 +392,15 @@ async def update_device(mac: str, details: DeviceDetails):
     )
     if updated_device is None:
         raise HTTPException(status_code=404, detail="Device not found")
-    inventory.save_to_disk()
     return updated_device
 
+@app.delete("/api/device/{mac}")
+async def delete_device(mac: str):
+    """Removes a device from the inventory."""
+    if not inventory.remove_device(mac.upper()):
+        raise HTTPException(status_code=404, detail="Device not found")
+    return {"message": f"Device {mac.upper()} removed."}
+
 @app.get("/api/config")
 async def get_config():
     """Returns the current application configuration."""
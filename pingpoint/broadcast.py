@@ -0,0 +1,152 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Optional
+
+from .serialization import dumps
+
+
+class Subscription:
+    """A single client of a `Broadcaster`, read from its own event loop."""
+    def __init__(self, broadcaster, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self._broadcaster = broadcaster
+        self._loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def _deliver(self, message: str):
+        """Queues a message. Runs on the subscription's event loop."""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+            self._broadcaster._drop(self)
+            # Wake the reader so it notices it was dropped.
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> Optional[str]:
+        """
+        Waits for the next message.
+
+        Returns:
+            The message, or None if the wait timed out.
+
+        Raises:
+            ConnectionAbortedError: If the subscriber fell too far behind and was dropped.
+        """
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if message is None and self.dropped:
+            raise ConnectionAbortedError("subscriber fell behind and was dropped")
+        return message
+
+    def close(self):
+        self._broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    """
+    Fans out inventory changes to server-sent event (SSE) clients.
+
+    `publish` may be called from any thread. Each message is serialized once
+    into its SSE wire format and handed to every subscriber's bounded queue on
+    the subscriber's event loop. A subscriber whose queue is full is dropped
+    rather than allowed to hold up the others; its client reconnects and
+    resumes.
+
+    The most recent `history_size` messages are kept, so a reconnecting client
+    that sends the id of the last message it saw receives what it missed. If
+    that id is too old, the client gets a 'reset' message instead and should
+    reload its state.
+    """
+    def __init__(self, history_size: int = 1000, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history_size)  # (id, message) pairs
+        # Ids start at the current time in microseconds, so ids a client saw
+        # before a restart are never mistaken for new ones.
+        self._next_id = time.time_ns() // 1000
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._published = 0
+        self._dropped = 0
+
+    def publish(self, kind: str, data) -> int:
+        """
+        Sends a message to all subscribers.
+
+        Args:
+            kind: The SSE event name, e.g. 'devices' or 'event'.
+            data: A JSON-serializable payload.
+
+        Returns:
+            The id of the message.
+        """
+        return self.publish_json(kind, dumps(data))
+
+    def publish_json(self, kind: str, payload: bytes) -> int:
+        """Sends an already JSON-encoded message to all subscribers."""
+        payload = payload.decode()
+        with self._lock:
+            message_id = self._next_id
+            self._next_id += 1
+            message = f"id: {message_id}\nevent: {kind}\ndata: {payload}\n\n"
+            self._history.append((message_id, message))
+            self._published += 1
+            # Scheduled under the lock so every subscriber sees messages in id order.
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber._loop.call_soon_threadsafe(subscriber._deliver, message)
+                except RuntimeError:
+                    # The subscriber's event loop has been closed.
+                    self._subscribers.discard(subscriber)
+        return message_id
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Registers a subscriber on the running event loop.
+
+        Args:
+            last_event_id: The id of the last message the client received, to resume after it.
+        """
+        subscription = Subscription(self, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if last_event_id is None:
+                return subscription
+            missed = [message for message_id, message in self._history if message_id > last_event_id]
+            oldest = self._history[0][0] if self._history else self._next_id
+            complete = last_event_id + 1 >= oldest and last_event_id < self._next_id
+            reset_id = self._next_id - 1
+        if not complete or len(missed) >= self.queue_size:
+            subscription.queue.put_nowait(f"id: {reset_id}\nevent: reset\ndata: {{}}\n\n")
+        else:
+            for message in missed:
+                subscription.queue.put_nowait(message)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _drop(self, subscription: Subscription):
+        self.unsubscribe(subscription)
+        with self._lock:
+            self._dropped += 1
+        logging.warning("Dropped a slow event stream subscriber.")
+
+    def stats(self) -> dict:
+        """Returns subscriber and message counts."""
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self._published,
+                "dropped_subscribers": self._dropped,
+                "last_event_id": self._next_id - 1,
+            }
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from .models import Fingerprint
+
+
+def fingerprint_signature(mac: str, fingerprint: Fingerprint) -> str:
+    """
+    Returns a key that is the same for devices that look identical on the network.
+
+    The key combines the vendor part of the MAC address (OUI), the set of open
+    ports and the OS match, which is everything Fingerbank classifies a device
+    by. A fleet of identical smart plugs or cameras therefore shares one key.
+    """
+    ports = sorted({(p.get('protocol') or 'tcp', int(p['portid'])) for p in fingerprint.ports})
+    port_list = ",".join(f"{protocol}/{portid}" for protocol, portid in ports)
+    return f"{mac.upper()[:8]}|{port_list}|{fingerprint.os_match or ''}"
+
+
+class FingerprintCache:
+    """
+    A persistent cache of fingerprinting and Fingerbank results.
+
+    Entries expire `ttl` seconds after they were stored. Once the cache holds
+    `max_entries` entries, the least recently used one is evicted. Keys and
+    values are plain JSON-serializable data chosen by the caller.
+
+    The cache is written to `persistence_file` (atomically, via a temporary
+    file) at most every `save_interval` seconds when it changes, and on
+    `save`, so results survive a restart.
+    """
+    def __init__(self, persistence_file: Optional[Path] = None, ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 10000, save_interval: float = 60):
+        self.persistence_file = Path(persistence_file) if persistence_file else None
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.save_interval = save_interval
+        self._entries = OrderedDict()  # key -> (stored_at, value), least recently used first
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self.load_from_disk()
+
+    def get(self, key: str):
+        """Returns the value stored for `key`, or None if there is none or it has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] >= self.ttl:
+                del self._entries[key]
+                self._dirty = True
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, key: str, value):
+        """Stores a value, evicting the least recently used entry if the cache is full."""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            self._dirty = True
+            save_due = time.monotonic() - self._last_save >= self.save_interval
+        if save_due:
+            self.save()
+
+    def stats(self) -> dict:
+        """Returns the number of entries and the hit, miss and eviction counts."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / lookups if lookups else None,
+            }
+
+    def save(self):
+        """Writes the cache to disk if it changed since the last save."""
+        if self.persistence_file is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[key, stored_at, value] for key, (stored_at, value) in self._entries.items()]
+            self._dirty = False
+            self._last_save = time.monotonic()
+        temp_path = self.persistence_file.with_name(self.persistence_file.name + ".tmp")
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(entries, f, separators=(',', ':'))
+            os.replace(temp_path, self.persistence_file)
+        except IOError as e:
+            logging.error(f"Error saving fingerprint cache to {self.persistence_file}: {e}")
+
+    def load_from_disk(self):
+        """Restores unexpired entries from the last save, least recently used first."""
+        if self.persistence_file is None:
+            return
+        try:
+            with open(self.persistence_file, "r") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (IOError, json.JSONDecodeError) as e:
+            logging.error(f"Error loading fingerprint cache from {self.persistence_file}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, stored_at, value in entries[-self.max_entries:]:
+                if now - stored_at < self.ttl:
+                    self._entries[key] = (stored_at, value)
+        logging.info(f"Loaded {len(self._entries)} cached fingerprint results from {self.persistence_file}")
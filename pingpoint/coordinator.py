@@ -0,0 +1,165 @@
+import time
+import logging
+import threading
+from typing import Callable, Iterable, Optional
+
+from .scandiff import ScanDiffer
+
+
+class ScanCoordinator:
+    """
+    Runs inventory scans so that at most one scan per source is in flight.
+
+    Manual triggers from the API and the scheduled scan loop all go through
+    the coordinator. A request for a source that is already scanning attaches
+    to the running scan instead of starting another one. A trigger can
+    instead ask for a follow-up run, and any number of such requests made
+    during one scan coalesce into a single follow-up.
+
+    A scan that returns a list is compared with the previous scan of its
+    source, and only the difference is applied (`Inventory.apply_scan_delta`).
+    A scan that yields hosts as they are found, such as a streaming Nmap
+    sweep, is applied host by host while it runs.
+
+    The state of each source (running, hosts processed so far, and the
+    duration, result count and changes of the last scan) is available from
+    `status`.
+    """
+    def __init__(self, inventory):
+        self.inventory = inventory
+        self._states = {}  # Keyed by source name
+        self._queued = {}  # Follow-up (scan, webhook_url) per source
+        self._differs = {}  # Keyed by source name
+        self._condition = threading.Condition()
+
+    def _state(self, source: str) -> dict:
+        """Returns the state of a source, creating it if needed. The caller must hold the lock."""
+        if source not in self._states:
+            self._states[source] = {
+                "running": False,
+                "started": None,
+                "progress": 0,
+                "last_finished": None,
+                "last_duration_seconds": None,
+                "last_result_count": None,
+                "last_error": None,
+                "last_changes": None,
+                "runs": 0,
+                "attached": 0,
+                "generation": 0,
+            }
+        return self._states[source]
+
+    def _begin(self, state: dict):
+        """Marks a source as running. The caller must hold the lock."""
+        state["running"] = True
+        state["started"] = time.time()
+        state["progress"] = 0
+
+    def trigger(self, source: str, scan: Callable[[], Iterable[dict]], webhook_url: Optional[str] = None,
+                queue_if_running: bool = False) -> str:
+        """
+        Starts a scan in the background unless one is already running for the source.
+
+        Args:
+            source: The scan source, e.g. 'edgemax' or 'nmap'.
+            scan: A callable that runs the scan and returns (or yields) the hosts found.
+            webhook_url: The webhook to notify about inventory changes.
+            queue_if_running: Run the scan again once the running scan finishes,
+                instead of only attaching to it.
+
+        Returns:
+            'started', 'attached' (to the running scan) or 'queued' (as a follow-up).
+        """
+        with self._condition:
+            state = self._state(source)
+            if state["running"]:
+                if queue_if_running:
+                    # The latest trigger replaces an earlier queued one.
+                    self._queued[source] = (scan, webhook_url)
+                    return "queued"
+                state["attached"] += 1
+                return "attached"
+            self._begin(state)
+        self._start_thread(source, scan, webhook_url)
+        return "started"
+
+    def run(self, source: str, scan: Callable[[], Iterable[dict]], webhook_url: Optional[str] = None,
+            timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Runs a scan on the calling thread, or waits for the scan already running for the source.
+
+        Returns:
+            The number of hosts found by the scan that ran or was waited for,
+            or None if it failed or the wait timed out.
+        """
+        with self._condition:
+            state = self._state(source)
+            if state["running"]:
+                state["attached"] += 1
+                generation = state["generation"]
+                if not self._condition.wait_for(lambda: state["generation"] != generation, timeout):
+                    return None
+                return state["last_result_count"]
+            self._begin(state)
+        self._run(source, scan, webhook_url)
+        with self._condition:
+            return state["last_result_count"]
+
+    def status(self) -> dict:
+        """Returns the state of every source scanned so far, keyed by source name."""
+        now = time.time()
+        with self._condition:
+            status = {}
+            for source, state in self._states.items():
+                status[source] = {key: value for key, value in state.items() if key != "generation"}
+                status[source]["queued"] = source in self._queued
+                status[source]["elapsed_seconds"] = round(now - state["started"], 3) if state["running"] else None
+            return status
+
+    def _start_thread(self, source: str, scan, webhook_url: Optional[str]):
+        thread = threading.Thread(target=self._run, args=(source, scan, webhook_url), name=f"scan-{source}", daemon=True)
+        thread.start()
+
+    def _run(self, source: str, scan, webhook_url: Optional[str]):
+        """Runs a scan into the inventory and records its outcome. The source must already be marked running."""
+        state = self._states[source]
+
+        def counted(hosts):
+            for host in hosts:
+                state["progress"] += 1
+                yield host
+
+        error = None
+        changes = None
+        try:
+            hosts = scan()
+            if isinstance(hosts, list):
+                differ = self._differs.setdefault(source, ScanDiffer())
+                delta = differ.diff(counted(hosts))
+                self.inventory.apply_scan_delta(delta, webhook_url)
+                differ.commit()
+                changes = {key: len(value) for key, value in delta._asdict().items()}
+            else:
+                self.inventory.update_from_scan(counted(hosts), webhook_url)
+        except Exception as e:
+            error = str(e)
+            logging.error(f"Scan '{source}' failed: {e}")
+
+        with self._condition:
+            finished = time.time()
+            state["running"] = False
+            state["last_finished"] = finished
+            state["last_duration_seconds"] = round(finished - state["started"], 3)
+            state["last_result_count"] = None if error else state["progress"]
+            state["last_error"] = error
+            state["last_changes"] = changes
+            state["runs"] += 1
+            state["generation"] += 1
+            self._condition.notify_all()
+            queued = self._queued.pop(source, None)
+            if queued is not None:
+                self._begin(state)
+        logging.info(f"Scan '{source}' finished in {state['last_duration_seconds']} seconds.")
+        if queued is not None:
+            self._start_thread(source, *queued)
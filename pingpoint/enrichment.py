@@ -0,0 +1,281 @@
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from dataclasses import replace
+from pathlib import Path
+from typing import Optional
+
+from .scanner import NmapScanner
+from .fingerbank import FingerbankClient, RateLimiter
+from .cache import FingerprintCache
+from .config import load_config
+from .models import Fingerprint
+
+# Defaults for the 'fingerprint' section of config.yaml
+DEFAULT_FINGERPRINT_SETTINGS = {
+    'quick_top_ports': 100,
+    'quick_timeout': 60,
+    'deep_timeout': 600,
+    'min_identified_services': 1,
+}
+
+
+class EnrichmentQueue:
+    """
+    Fingerprints and enriches new devices on a pool of background workers.
+
+    The scan cycle only enqueues work, so a burst of new devices no longer
+    blocks the inventory update behind `nmap -A` and Fingerbank lookups. Jobs
+    are deduplicated by MAC address, and the pending queue is written to disk
+    so that work survives a restart.
+
+    With a `cache`, the final fingerprint of each device is kept by MAC
+    address, so a device that is removed and rediscovered is not scanned
+    again, and Fingerbank answers are shared between identical devices. The
+    `rate_limiter` spaces out Fingerbank requests.
+    """
+    def __init__(self, inventory, persistence_file: Optional[Path] = None, workers: int = 2,
+                 config_path: Path = Path(__file__).parent.parent / "config.yaml", history_size: int = 100,
+                 cache: Optional[FingerprintCache] = None, rate_limiter: Optional[RateLimiter] = None):
+        self.inventory = inventory
+        self.persistence_file = persistence_file
+        self.workers = max(1, workers)
+        self.config_path = config_path
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self._fingerbank = None  # Reused while the API key stays the same
+        self._pending = OrderedDict()  # Keyed by MAC address
+        self._in_progress = {}  # Keyed by MAC address
+        self._history = deque(maxlen=history_size)
+        self._completed = 0
+        self._failed = 0
+        self._condition = threading.Condition()
+        self._threads = []
+        self._running = False
+        self.load_from_disk()
+
+    def enqueue(self, mac: str, ip: str) -> bool:
+        """
+        Queues a device for fingerprinting.
+
+        Args:
+            mac: The MAC address of the device.
+            ip: The IP address to fingerprint.
+
+        Returns:
+            True if a new job was queued, False if the device was already queued or in progress.
+        """
+        with self._condition:
+            if mac in self._in_progress:
+                return False
+            if mac in self._pending:
+                # Keep the queue position but fingerprint the most recent IP.
+                self._pending[mac]['ip'] = ip
+                return False
+            self._pending[mac] = {'mac': mac, 'ip': ip, 'enqueued_at': time.time()}
+            self._save_locked()
+            self._condition.notify()
+        logging.info(f"Queued device {mac} ({ip}) for fingerprinting.")
+        return True
+
+    def start(self):
+        """Starts the worker threads."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"enrichment-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"Started {self.workers} enrichment workers with {len(self._pending)} pending jobs.")
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stops the worker threads. Jobs that are still running are left in the
+        persisted queue and will be retried on the next start.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self.cache is not None:
+            self.cache.save()
+
+    def stats(self) -> dict:
+        """Returns queue depth and recent job latencies."""
+        with self._condition:
+            recent = list(self._history)
+            durations = [job['duration_seconds'] for job in recent]
+            tier_durations = {}
+            for job in recent:
+                for tier, seconds in job['tier_seconds'].items():
+                    tier_durations.setdefault(tier, []).append(seconds)
+            return {
+                "pending": len(self._pending),
+                "in_progress": len(self._in_progress),
+                "workers": self.workers,
+                "completed": self._completed,
+                "failed": self._failed,
+                "average_duration_seconds": sum(durations) / len(durations) if durations else None,
+                "average_tier_seconds": {tier: sum(values) / len(values) for tier, values in tier_durations.items()},
+                "recent_jobs": recent[::-1],
+                "cache": self.cache.stats() if self.cache is not None else None,
+            }
+
+    def _worker(self):
+        """Takes jobs off the queue until the queue is stopped."""
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                mac, job = self._pending.popitem(last=False)
+                self._in_progress[mac] = job
+
+            started = time.time()
+            try:
+                succeeded = self._process(job)
+            except Exception as e:
+                logging.error(f"Enrichment of device {mac} failed: {e}")
+                succeeded = False
+            finished = time.time()
+
+            with self._condition:
+                self._in_progress.pop(mac, None)
+                if succeeded:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                self._history.append({
+                    "mac": mac,
+                    "ip": job['ip'],
+                    "succeeded": succeeded,
+                    "wait_seconds": round(started - job['enqueued_at'], 3),
+                    "duration_seconds": round(finished - started, 3),
+                    "tier_seconds": job.pop('tiers', {}),
+                    "finished": finished,
+                })
+                self._save_locked()
+
+    def _process(self, job: dict) -> bool:
+        """
+        Fingerprints a device and enriches it with Fingerbank data.
+
+        A quick top-ports probe runs first. The deep OS/script scan only runs
+        when the quick result is ambiguous or Fingerbank cannot classify the
+        device. A fingerprint cached for the device replaces both tiers. The
+        time spent in each tier is recorded on the job.
+        """
+        config = load_config(self.config_path)
+        settings = {**DEFAULT_FINGERPRINT_SETTINGS, **(config.get('fingerprint') or {})}
+        fb_api_key = config.get('fingerbank', {}).get('api_key')
+        if not fb_api_key:
+            logging.warning("Fingerbank API key not found in config.yaml. Skipping enrichment.")
+
+        tiers = job['tiers'] = {}
+        cache_key = f"fingerprint:{job['mac']}"
+        cached = self.cache.get(cache_key) if self.cache is not None else None
+        if cached is not None:
+            started = time.time()
+            applied = self._apply(job['mac'], Fingerprint.from_dict(cached), fb_api_key)
+            tiers['cached'] = round(time.time() - started, 3)
+            return applied is not None
+
+        scanner = NmapScanner(subnets=[])
+        started = time.time()
+        fingerprint = scanner.quick_fingerprint(job['ip'], top_ports=settings['quick_top_ports'],
+                                                timeout=settings['quick_timeout'])
+        tiers['quick'] = round(time.time() - started, 3)
+
+        needs_deep = fingerprint is None or self._is_ambiguous(fingerprint, settings)
+        if not needs_deep:
+            classified = self._apply(job['mac'], fingerprint, fb_api_key)
+            if classified is None:
+                return False
+            # Without an API key there is no classification to wait for.
+            needs_deep = bool(fb_api_key) and not classified
+
+        if needs_deep:
+            started = time.time()
+            deep = scanner.scan_for_fingerprint(job['ip'], timeout=settings['deep_timeout'])
+            tiers['deep'] = round(time.time() - started, 3)
+            if deep is not None:
+                fingerprint = fingerprint.merge(deep) if fingerprint is not None else deep
+            if fingerprint is None:
+                return False
+            if self._apply(job['mac'], fingerprint, fb_api_key) is None:
+                return False
+
+        if self.cache is not None:
+            self.cache.put(cache_key, fingerprint.to_dict())
+        return True
+
+    def _is_ambiguous(self, fingerprint: Fingerprint, settings: dict) -> bool:
+        """Returns True if a quick fingerprint identified too few services to be useful."""
+        identified = [p for p in fingerprint.ports if p.get('product') or p.get('service_name') not in (None, 'unknown')]
+        return len(identified) < settings['min_identified_services']
+
+    def _apply(self, mac: str, fingerprint: Fingerprint, fb_api_key: Optional[str]) -> Optional[bool]:
+        """
+        Stores a fingerprint on its device and queries Fingerbank.
+
+        Returns:
+            True if Fingerbank classified the device, False if it did not, or
+            None if the device is no longer in the inventory.
+        """
+        current = self.inventory.get_device(mac)
+        if current is None:
+            logging.info(f"Device {mac} was removed before fingerprinting finished.")
+            return None
+        # Enrich a private copy; the inventory's own device only changes in apply_enrichment.
+        device = replace(current, fingerprint=fingerprint)
+        logging.info(f"Successfully fingerprinted new device {device.friendly_name} ({fingerprint.tier} scan)")
+
+        classified = False
+        if fb_api_key:
+            classified = self._fingerbank_client(fb_api_key).enrich_device(device)
+
+        if not self.inventory.apply_enrichment(mac, device):
+            logging.info(f"Device {mac} was removed before fingerprinting finished.")
+            return None
+        return classified
+
+    def _fingerbank_client(self, api_key: str) -> FingerbankClient:
+        """Returns a Fingerbank client for the API key, keeping its HTTP session between jobs."""
+        client = self._fingerbank
+        if client is None or client.api_key != api_key:
+            client = self._fingerbank = FingerbankClient(api_key, cache=self.cache, rate_limiter=self.rate_limiter)
+        return client
+
+    def _save_locked(self):
+        """Writes pending and in-progress jobs to disk. The caller must hold the lock."""
+        if self.persistence_file is None:
+            return
+        jobs = list(self._in_progress.values()) + list(self._pending.values())
+        try:
+            with open(self.persistence_file, "w") as f:
+                json.dump(jobs, f)
+        except IOError as e:
+            logging.error(f"Error saving enrichment queue to {self.persistence_file}: {e}")
+
+    def load_from_disk(self):
+        """Restores jobs that were pending or in progress when the queue was last saved."""
+        if self.persistence_file is None:
+            return
+        try:
+            with open(self.persistence_file, "r") as f:
+                jobs = json.load(f)
+        except FileNotFoundError:
+            return
+        except (IOError, json.JSONDecodeError) as e:
+            logging.error(f"Error loading enrichment queue from {self.persistence_file}: {e}")
+            return
+        with self._condition:
+            for job in jobs:
+                self._pending.setdefault(job['mac'], job)
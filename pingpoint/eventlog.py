@@ -0,0 +1,226 @@
+import os
+import json
+import mmap
+import time
+import logging
+import threading
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List
+
+from .events import event_mac
+
+
+class _Segment:
+    """A single log file and its sparse time index."""
+    def __init__(self, path: Path, first_id: int, created: float):
+        self.path = path
+        self.index_path = path.with_suffix('.idx')
+        self.first_id = first_id
+        self.created = created
+        self.size = path.stat().st_size if path.exists() else 0
+        self.records = 0
+        # (epoch seconds, byte offset) of every Nth record
+        self.index_times = []
+        self.index_offsets = []
+
+    def load_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                for line in f:
+                    timestamp, offset = line.split()
+                    self.index_times.append(float(timestamp))
+                    self.index_offsets.append(int(offset))
+        except FileNotFoundError:
+            pass
+
+    @property
+    def first_time(self) -> Optional[float]:
+        return self.index_times[0] if self.index_times else None
+
+
+class EventLog:
+    """
+    A durable, append-only log of events split into rotating segment files.
+
+    Each segment holds newline-delimited JSON records and is rotated when it
+    grows past `max_segment_bytes` or gets older than `max_segment_age`
+    seconds. A small sidecar index records the timestamp and byte offset of
+    every `index_interval`-th record, so time-range reads can seek into a
+    memory-mapped segment instead of parsing it from the start.
+    """
+    def __init__(self, directory: Path, max_segment_bytes: int = 8 * 1024 * 1024,
+                 max_segment_age: float = 24 * 3600, max_segments: Optional[int] = 100,
+                 index_interval: int = 256):
+        self.directory = Path(directory)
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.max_segments = max_segments
+        self.index_interval = index_interval
+        self._segments = []  # Oldest first
+        self._file = None
+        self._index_file = None
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._open_segments()
+
+    def _open_segments(self):
+        """Finds existing segments and repairs a partially written final record."""
+        for path in sorted(self.directory.glob("events-*.log")):
+            try:
+                first_id = int(path.stem.split('-', 1)[1])
+            except ValueError:
+                continue
+            segment = _Segment(path, first_id, path.stat().st_mtime)
+            segment.load_index()
+            if segment.first_time is not None:
+                segment.created = segment.first_time
+            self._segments.append(segment)
+
+        if self._segments:
+            last = self._segments[-1]
+            with open(last.path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    logging.warning(f"Truncating partial record at the end of {last.path}")
+                    f.truncate(data.rfind(b"\n") + 1)
+                last.records = data.count(b"\n")
+            last.size = last.path.stat().st_size
+
+    def append(self, event: dict):
+        """Appends an event, rotating to a new segment if needed. The event must have an 'id'."""
+        record = (json.dumps(event, separators=(',', ':')) + "\n").encode()
+        timestamp = datetime.fromisoformat(event['timestamp']).timestamp()
+        with self._lock:
+            segment = self._segments[-1] if self._segments else None
+            if segment is None or (segment.records and (
+                    segment.size + len(record) > self.max_segment_bytes or
+                    time.time() - segment.created > self.max_segment_age)):
+                segment = self._rotate(event['id'])
+            elif self._file is None:
+                self._open_for_append(segment)
+
+            if segment.records % self.index_interval == 0:
+                segment.index_times.append(timestamp)
+                segment.index_offsets.append(segment.size)
+                self._index_file.write(f"{timestamp} {segment.size}\n")
+                self._index_file.flush()
+            self._file.write(record)
+            self._file.flush()
+            segment.size += len(record)
+            segment.records += 1
+
+    def flush(self):
+        """Does nothing; records are written to the segment as they are appended."""
+
+    def _open_for_append(self, segment: _Segment):
+        self._file = open(segment.path, "ab")
+        self._index_file = open(segment.index_path, "a")
+
+    def _rotate(self, first_id: int) -> _Segment:
+        """Starts a new segment and drops the oldest ones beyond `max_segments`. The caller must hold the lock."""
+        self._close_files()
+        segment = _Segment(self.directory / f"events-{first_id:012d}.log", first_id, time.time())
+        self._segments.append(segment)
+        self._open_for_append(segment)
+        if self.max_segments is not None:
+            while len(self._segments) > self.max_segments:
+                expired = self._segments.pop(0)
+                for path in (expired.path, expired.index_path):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+        return segment
+
+    def _close_files(self):
+        for f in (self._file, self._index_file):
+            if f is not None:
+                f.close()
+        self._file = None
+        self._index_file = None
+
+    def close(self):
+        """Closes the active segment."""
+        with self._lock:
+            self._close_files()
+
+    def tail(self, count: int) -> List[dict]:
+        """
+        Returns the most recent `count` events, oldest first.
+
+        Only the segments needed to cover `count` records are read.
+        """
+        with self._lock:
+            segments = list(self._segments)
+        chunks = []
+        needed = count
+        for segment in reversed(segments):
+            if needed <= 0:
+                break
+            events = list(self._read_segment(segment))
+            chunks.append(events[-needed:])
+            needed -= len(chunks[-1])
+        return [event for chunk in reversed(chunks) for event in chunk]
+
+    def iter_reverse(self, before: Optional[int] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, mac: Optional[str] = None,
+                     event_type: Optional[str] = None):
+        """
+        Yields logged events newest first.
+
+        Args:
+            before: Only yield events with an id lower than this.
+            since: Stop at events older than this time.
+            until: Skip events newer than this time.
+            mac: Only yield events for this MAC address.
+            event_type: Only yield events of this type.
+        """
+        since_ts = since.timestamp() if since is not None else None
+        until_ts = until.timestamp() if until is not None else None
+        with self._lock:
+            segments = list(self._segments)
+        for position in range(len(segments) - 1, -1, -1):
+            segment = segments[position]
+            if before is not None and segment.first_id >= before:
+                continue
+            if until_ts is not None and segment.first_time is not None and segment.first_time > until_ts:
+                continue
+            events = list(self._read_segment(segment, since_ts))
+            for event in reversed(events):
+                if before is not None and event['id'] >= before:
+                    continue
+                timestamp = datetime.fromisoformat(event['timestamp']).timestamp()
+                if until_ts is not None and timestamp > until_ts:
+                    continue
+                if since_ts is not None and timestamp < since_ts:
+                    return
+                if event_type is not None and event['type'] != event_type:
+                    continue
+                if mac is not None and event_mac(event) != mac:
+                    continue
+                yield event
+            if since_ts is not None and segment.first_time is not None and segment.first_time < since_ts:
+                return
+
+    def _read_segment(self, segment: _Segment, since_ts: Optional[float] = None):
+        """Yields the records of a segment in order, seeking past those indexed before `since_ts`."""
+        start = 0
+        if since_ts is not None and segment.index_times:
+            # Records before the last index entry older than since_ts are all older too.
+            position = bisect_left(segment.index_times, since_ts) - 1
+            if position >= 0:
+                start = segment.index_offsets[position]
+        try:
+            with open(segment.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    mapped.seek(start)
+                    for line in iter(mapped.readline, b""):
+                        if line.endswith(b"\n"):
+                            yield json.loads(line)
+        except FileNotFoundError:
+            # The segment was removed by retention while we were reading.
+            return
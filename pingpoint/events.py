@@ -0,0 +1,248 @@
+import sys
+import itertools
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Optional, List, Tuple
+
+
+def event_mac(event: dict) -> Optional[str]:
+    """Returns the MAC address an event is about, including events logged with a full device copy."""
+    if 'mac' in event:
+        return event['mac']
+    return (event.get('device') or {}).get('mac')
+
+
+class EventStore:
+    """
+    A bounded, indexed, in-memory store of inventory events.
+
+    Events get increasing integer ids and are kept in a ring buffer of
+    `capacity` entries; the oldest are dropped as new ones arrive. Secondary
+    indexes by MAC address and event type, plus the time ordering of the
+    buffer, let queries touch only the events they return.
+
+    For compatibility with the plain list it replaces, indexing and iteration
+    run newest first, so `store[0]` is the most recent event.
+
+    Events are stored compactly, in parallel columns: the time, a type code,
+    the interned MAC address and message, and a diff of the fields the event
+    changed as `{field: [old, new]}`. They do not embed a copy of the device;
+    `Inventory.expand_event` joins an event with the device state when it is
+    served. Events are returned as dictionaries with 'id', 'timestamp',
+    'type', 'mac', 'message' and, when present, 'changes' keys. Timestamps
+    are naive local times.
+
+    When an `EventLog` is given, every event is also appended to it, the
+    in-memory window is restored from its tail at startup, and queries that
+    reach past the window continue into the log.
+    """
+    def __init__(self, capacity: int = 10000, log=None):
+        self.capacity = max(1, capacity)
+        self._log = log
+        # Columns, oldest first; index i holds event id _offset + i
+        self._times = array('d')  # Epoch seconds
+        self._types = array('H')  # Indexes into _type_names
+        self._macs = []
+        self._messages = []
+        self._changes = {}  # Field diffs by event id, for the few events that have them
+        self._offset = 0  # Id of the first event in the columns
+        self._oldest = 0  # Id of the oldest retained event
+        self._next_id = 0
+        # Sorted event ids per key. Evicted ids are trimmed lazily in _compact.
+        self._by_mac = {}
+        self._by_type = {}
+        self._type_names = []
+        self._type_codes = {}
+        self._lock = threading.Lock()
+        if log is not None:
+            self._restore(log.tail(self.capacity))
+
+    def _restore(self, events: List[dict]):
+        """Loads previously logged events, oldest first, into the in-memory window."""
+        if not events:
+            return
+        self._offset = self._oldest = events[0]['id']
+        self._next_id = self._oldest
+        for event in events:
+            if event['id'] != self._next_id:
+                # Ids in the log are contiguous; a gap means a damaged segment.
+                break
+            self._add(event, datetime.fromisoformat(event['timestamp']).timestamp())
+
+    def _add(self, event: dict, timestamp: float) -> int:
+        """Appends an event to the columns and indexes. The caller must hold the lock."""
+        event_id = self._next_id
+        self._next_id += 1
+        code = self._type_codes.get(event['type'])
+        if code is None:
+            code = self._type_codes[event['type']] = len(self._type_names)
+            self._type_names.append(event['type'])
+        mac = event_mac(event)
+        if mac:
+            mac = sys.intern(mac)
+            self._by_mac.setdefault(mac, array('q')).append(event_id)
+        self._by_type.setdefault(event['type'], array('q')).append(event_id)
+        self._times.append(timestamp)
+        self._types.append(code)
+        self._macs.append(mac)
+        # Messages repeat (e.g. a device going offline and back), so share them.
+        self._messages.append(sys.intern(event.get('message', '')))
+        if event.get('changes'):
+            self._changes[event_id] = event['changes']
+        return event_id
+
+    def _get(self, event_id: int) -> dict:
+        """Rebuilds an event dictionary from the columns. The caller must hold the lock."""
+        i = event_id - self._offset
+        event = {
+            "id": event_id,
+            "timestamp": datetime.fromtimestamp(self._times[i]).isoformat(),
+            "type": self._type_names[self._types[i]],
+            "mac": self._macs[i],
+            "message": self._messages[i],
+        }
+        changes = self._changes.get(event_id)
+        if changes:
+            event["changes"] = changes
+        return event
+
+    def append(self, event: dict) -> dict:
+        """
+        Adds an event to the store, evicting the oldest event if the store is full.
+
+        The event must have 'timestamp' (ISO 8601) and 'type' keys, and is
+        indexed by its 'mac' when present. 'changes' and 'message' are kept;
+        other keys, such as a full 'device' copy, are not.
+
+        Returns:
+            The stored event, with its 'id' set.
+        """
+        timestamp = datetime.fromisoformat(event['timestamp']).timestamp()
+        with self._lock:
+            stored = self._get(self._add(event, timestamp))
+            if self._log is not None:
+                self._log.append(stored)
+
+            if self._next_id - self._oldest > self.capacity:
+                self._oldest += 1
+                if self._oldest - self._offset >= self.capacity:
+                    self._compact()
+        return stored
+
+    def flush(self):
+        """Writes events the log has queued (see `SQLiteStore.append`)."""
+        if self._log is not None:
+            self._log.flush()
+
+    def _compact(self):
+        """Drops evicted events from the columns and indexes. The caller must hold the lock."""
+        evicted = self._oldest - self._offset
+        for column in (self._times, self._types, self._macs, self._messages):
+            del column[:evicted]
+        # Diffs were added in id order, so the evicted ones come first.
+        for event_id in list(itertools.takewhile(lambda event_id: event_id < self._oldest, self._changes)):
+            del self._changes[event_id]
+        self._offset = self._oldest
+        for index in (self._by_mac, self._by_type):
+            for key in list(index):
+                ids = index[key]
+                start = bisect_left(ids, self._oldest)
+                if start == len(ids):
+                    del index[key]
+                elif start:
+                    del ids[:start]
+
+    def __len__(self):
+        with self._lock:
+            return self._next_id - self._oldest
+
+    def __getitem__(self, index: int) -> dict:
+        """Returns the event at `index`, counting from the newest event."""
+        with self._lock:
+            size = self._next_id - self._oldest
+            if index < 0:
+                index += size
+            if not 0 <= index < size:
+                raise IndexError("event index out of range")
+            return self._get(self._next_id - 1 - index)
+
+    def __iter__(self):
+        with self._lock:
+            events = [self._get(event_id) for event_id in range(self._oldest, self._next_id)]
+        return reversed(events)
+
+    def query(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+              mac: Optional[str] = None, event_type: Optional[str] = None,
+              limit: int = 100, cursor: Optional[int] = None) -> Tuple[List[dict], Optional[int]]:
+        """
+        Returns matching events, newest first.
+
+        Args:
+            since: Only return events at or after this time.
+            until: Only return events at or before this time.
+            mac: Only return events for this MAC address.
+            event_type: Only return events of this type.
+            limit: The maximum number of events to return.
+            cursor: Only return events older than this one, as returned by a previous query.
+
+        Returns:
+            A tuple of (events, next_cursor). next_cursor is None when there are no more results.
+        """
+        with self._lock:
+            start = self._oldest - self._offset
+            lo = self._oldest
+            hi = self._next_id
+            if since is not None:
+                lo = self._offset + bisect_left(self._times, since.timestamp(), start)
+            if until is not None:
+                hi = self._offset + bisect_right(self._times, until.timestamp(), start)
+            if cursor is not None:
+                hi = min(hi, cursor)
+
+            candidates = None
+            for index, key in ((self._by_mac, mac), (self._by_type, event_type)):
+                if key is None:
+                    continue
+                ids = index.get(key, [])
+                if candidates is None or len(ids) < len(candidates):
+                    candidates = ids
+            if candidates is None:
+                candidate_ids = range(hi - 1, lo - 1, -1)
+            else:
+                end = bisect_left(candidates, hi)
+                first = bisect_left(candidates, lo)
+                candidate_ids = (candidates[i] for i in range(end - 1, first - 1, -1))
+
+            in_memory = (self._get(event_id) for event_id in candidate_ids)
+            results, has_more = self._collect(in_memory, mac, event_type, limit)
+            # Older events are only on disk if the time range reaches past the window.
+            search_log = self._log is not None and not has_more and lo == self._oldest
+            oldest = self._oldest
+
+        if search_log:
+            older = self._log.iter_reverse(before=min(hi, oldest), since=since, until=until,
+                                           mac=mac, event_type=event_type)
+            more, has_more = self._collect(older, mac, event_type, limit - len(results))
+            results.extend(more)
+        return results, results[-1]['id'] if has_more else None
+
+    @staticmethod
+    def _collect(events, mac, event_type, limit):
+        """
+        Takes up to `limit` matching events.
+
+        Returns:
+            A tuple of (events, has_more), where has_more is True if there were further matches.
+        """
+        results = []
+        for event in events:
+            if event_type is not None and event['type'] != event_type:
+                continue
+            if mac is not None and event_mac(event) != mac:
+                continue
+            if len(results) == limit:
+                return results, True
+            results.append(event)
+        return results, False
@@ -1,15 +1,62 @@
+import time
 import requests
 import logging
+import threading
 from typing import Optional
 from .models import Fingerprint, Device
+from .cache import FingerprintCache, fingerprint_signature
+
+
+class RateLimiter:
+    """
+    A token bucket that allows `rate` calls per `per` seconds, in bursts of up to `burst`.
+
+    `acquire` blocks until the caller may proceed. Callers are served in the
+    order they arrive.
+    """
+    def __init__(self, rate: float, per: float = 60.0, burst: Optional[int] = None):
+        self.interval = per / rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Takes a token, waiting for one if none is left.
+
+        Returns:
+            The number of seconds waited.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+            self._updated = now
+            # Reserve a token even if it has not been refilled yet, so later
+            # callers queue up behind this one.
+            self._tokens -= 1
+            wait = -self._tokens * self.interval if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
 
 class FingerbankClient:
     """
     A client for interacting with the Fingerbank API.
+
+    Requests share a pooled HTTP session. With a `cache`, answers are stored
+    by fingerprint signature (OUI, open ports and OS match), so identical
+    devices are classified without another request. With a `rate_limiter`,
+    requests are spaced out to stay within the API quota.
     """
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[FingerprintCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None, session: Optional[requests.Session] = None):
         self.api_key = api_key
         self.base_url = "https://api.fingerbank.org/api/v2"
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.session = session or requests.Session()
 
     def enrich_device(self, device: Device) -> bool:
         """
@@ -25,51 +72,72 @@ class FingerbankClient:
             logging.warning(f"Device {device.friendly_name} has no fingerprint to enrich.")
             return False
 
+        key = f"fingerbank:{fingerprint_signature(device.mac, device.fingerprint)}"
+        data = self.cache.get(key) if self.cache is not None else None
+        if data is not None:
+            logging.info(f"Classified device {device.friendly_name} from the Fingerbank cache")
+        else:
+            data = self._interrogate(device)
+            if data is None:
+                return False
+            if self.cache is not None:
+                # Unclassified answers are cached too, so they do not use up quota either.
+                self.cache.put(key, {'device_name': data.get('device_name'),
+                                     'vulnerabilities': data.get('vulnerabilities')})
+        return self._apply(device, data)
+
+    def _interrogate(self, device: Device) -> Optional[dict]:
+        """Queries the Fingerbank API. Returns the response, or None if the request failed."""
         payload = self._prepare_payload(device.fingerprint, device.mac)
         headers = {"Content-Type": "application/json"}
         url = f"{self.base_url}/combinations/interrogate?key={self.api_key}"
 
+        if self.rate_limiter is not None:
+            waited = self.rate_limiter.acquire()
+            if waited:
+                logging.info(f"Waited {waited:.1f} seconds for the Fingerbank rate limit")
         try:
             logging.info(f"Querying Fingerbank for device {device.friendly_name}")
-            response = requests.post(url, json=payload, headers=headers, timeout=15)
+            response = self.session.post(url, json=payload, headers=headers, timeout=15)
             response.raise_for_status()
-            
-            data = response.json()
-            if data.get('device_name'):
-                device_name = data.get('device_name')
-                # If the friendly_name is still the default (MAC address), update it.
-                if device.friendly_name == device.mac:
-                    device.friendly_name = device_name
-
-                # Parse category and vendor from device_name
-                if '/' in device_name:
-                    parts = device_name.split('/', 1)
-                    device.category = parts[0].strip()
-                    device.vendor = parts[1].strip()
-                else:
-                    # If no slash, the whole name is the category
-                    device.category = device_name.strip()
-                    device.vendor = None
-
-                # Extract vulnerabilities and handle different response formats
-                vulnerabilities = data.get('vulnerabilities')
-
-                # The API may return a dictionary with a 'message' key for no CVEs,
-                # an empty list, or a list of CVEs.
-                if vulnerabilities and vulnerabilities != {'message': 'No CVEs for this device'}:
-                    device.vulnerabilities = True
-                    logging.info(f"Vulnerabilities found for {device.friendly_name}.")
-                else:
-                    device.vulnerabilities = False
-
-                logging.info(f"Successfully enriched device {device.friendly_name} from Fingerbank.")
-                return True
-            else:
-                logging.info(f"Fingerbank had no information for device {device.friendly_name}")
-                return False
-
+            return response.json()
         except requests.RequestException as e:
             logging.error(f"Fingerbank API request failed: {e}")
+            return None
+
+    def _apply(self, device: Device, data: dict) -> bool:
+        """Updates a device from a Fingerbank answer. Returns True if Fingerbank named the device."""
+        if data.get('device_name'):
+            device_name = data.get('device_name')
+            # If the friendly_name is still the default (MAC address), update it.
+            if device.friendly_name == device.mac:
+                device.friendly_name = device_name
+
+            # Parse category and vendor from device_name
+            if '/' in device_name:
+                parts = device_name.split('/', 1)
+                device.category = parts[0].strip()
+                device.vendor = parts[1].strip()
+            else:
+                # If no slash, the whole name is the category. The vendor,
+                # e.g. from the MAC address, is kept.
+                device.category = device_name.strip()
+
+            # Extract vulnerabilities and handle different response formats
+            vulnerabilities = data.get('vulnerabilities')
+
+            # The API may return a dictionary with a 'message' key for no CVEs,
+            # an empty list, or a list of CVEs.
+            if vulnerabilities and vulnerabilities != {'message': 'No CVEs for this device'}:
+                device.vulnerabilities = True
+                logging.info(f"Vulnerabilities found for {device.friendly_name}.")
+            else:
+                device.vulnerabilities = False
+
+            logging.info(f"Successfully enriched device {device.friendly_name} from Fingerbank.")
+            return True
+        else:
+            logging.info(f"Fingerbank had no information for device {device.friendly_name}")
             return False
 
     def _prepare_payload(self, fingerprint: Fingerprint, mac: str) -> dict:
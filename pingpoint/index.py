@@ -0,0 +1,203 @@
+import socket
+import ipaddress
+from functools import lru_cache
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
+
+from .models import Device
+
+
+def _address(ip: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Returns an IP address as (IP version, integer value), or None if it is not one."""
+    if ip:
+        for version, family in ((4, socket.AF_INET), (6, socket.AF_INET6)):
+            try:
+                return version, int.from_bytes(socket.inet_pton(family, ip), 'big')
+            except OSError:
+                continue
+    return None
+
+
+@lru_cache(maxsize=256)
+def parse_network(value: str):
+    """Returns a CIDR network such as '10.10.0.0/16' as an ipaddress network, or None if it is not one."""
+    if '/' not in value:
+        return None
+    try:
+        return ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return None
+
+
+class DeviceIndex:
+    """
+    Secondary indexes over the devices of an inventory.
+
+    Devices are filed by every IP address they have used, by lower-cased
+    hostname, and by subnet, vendor, category and status. Those with
+    `alert_on_offline` set are kept in a set of their own. Current IP
+    addresses are also kept as a sorted list of integers per IP version, so
+    the devices in a CIDR network are found by binary search.
+
+    `update` is called with each device that changed, and re-files it only
+    under the keys that differ from the last time. The index is not
+    thread-safe; the inventory serializes access to it.
+    """
+    FIELDS = ('subnet', 'vendor', 'category', 'status')
+
+    def __init__(self):
+        self._keys = {}  # MAC address -> (ips, hostname, fields, (version, address), flagged) it is filed under
+        self._by_ip: Dict[str, Union[str, Set[str]]] = {}
+        self._by_hostname: Dict[str, Union[str, Set[str]]] = {}
+        self._by_field: Dict[str, Dict[str, Union[str, Set[str]]]] = {field: {} for field in self.FIELDS}
+        self._addresses = {4: [], 6: []}  # Sorted current addresses as integers, per IP version
+        self._at_address: Dict[Tuple[int, int], Union[str, Set[str]]] = {}
+        self._flagged: Set[str] = set()
+
+    def __len__(self):
+        return len(self._keys)
+
+    # Most keys belong to a single device, so a key maps to a bare MAC
+    # address until a second device shares it, saving a set per key.
+    @staticmethod
+    def _file(index: dict, key, mac: str):
+        macs = index.get(key)
+        if macs is None:
+            index[key] = mac
+        elif isinstance(macs, str):
+            if macs != mac:
+                index[key] = {macs, mac}
+        else:
+            macs.add(mac)
+
+    @staticmethod
+    def _unfile(index: dict, key, mac: str):
+        macs = index.get(key)
+        if macs == mac:
+            del index[key]
+        elif isinstance(macs, set):
+            macs.discard(mac)
+            if len(macs) == 1:
+                index[key] = macs.pop()
+
+    @staticmethod
+    def _members(macs) -> Iterable[str]:
+        """Returns the MAC addresses filed under a key, given its index entry."""
+        if macs is None:
+            return ()
+        return (macs,) if isinstance(macs, str) else macs
+
+    def update(self, mac: str, device: Optional[Device]):
+        """Files a device under its current keys, or removes it from the index if `device` is None."""
+        old = self._keys.get(mac)
+        if device is None:
+            if old is None:
+                return
+            new = (frozenset(), None, (None,) * len(self.FIELDS), None, False)
+            del self._keys[mac]
+        else:
+            new = (
+                frozenset(device.ip_addresses),
+                device.hostname.lower() if device.hostname else None,
+                (device.subnet, device.vendor, device.category, device.status),  # As in FIELDS
+                _address(device.ip_addresses[-1]) if device.ip_addresses else None,
+                device.alert_on_offline,
+            )
+            if new == old:
+                return
+            self._keys[mac] = new
+        old_ips, old_hostname, old_fields, old_address, _ = old or (frozenset(), None, (None,) * len(self.FIELDS), None, False)
+        ips, hostname, fields, address, flagged = new
+
+        for ip in old_ips - ips:
+            self._unfile(self._by_ip, ip, mac)
+        for ip in ips - old_ips:
+            self._file(self._by_ip, ip, mac)
+        if hostname != old_hostname:
+            if old_hostname is not None:
+                self._unfile(self._by_hostname, old_hostname, mac)
+            if hostname is not None:
+                self._file(self._by_hostname, hostname, mac)
+        for field, old_value, value in zip(self.FIELDS, old_fields, fields):
+            if value != old_value:
+                if old_value is not None:
+                    self._unfile(self._by_field[field], old_value, mac)
+                if value is not None:
+                    self._file(self._by_field[field], value, mac)
+        if address != old_address:
+            if old_address is not None:
+                self._unfile(self._at_address, old_address, mac)
+                if old_address not in self._at_address:
+                    addresses = self._addresses[old_address[0]]
+                    del addresses[bisect_left(addresses, old_address[1])]
+            if address is not None:
+                if address not in self._at_address:
+                    insort(self._addresses[address[0]], address[1])
+                self._file(self._at_address, address, mac)
+        if flagged:
+            self._flagged.add(mac)
+        else:
+            self._flagged.discard(mac)
+
+    def flagged(self) -> Set[str]:
+        """Returns the MAC addresses of devices with `alert_on_offline` set."""
+        return set(self._flagged)
+
+    def in_network(self, network) -> Set[str]:
+        """Returns the MAC addresses of devices whose current IP address is in an ipaddress network."""
+        addresses = self._addresses[network.version]
+        start = bisect_left(addresses, int(network.network_address))
+        end = bisect_right(addresses, int(network.broadcast_address))
+        macs = set()
+        for value in addresses[start:end]:
+            macs.update(self._members(self._at_address[(network.version, value)]))
+        return macs
+
+    def lookup(self, ip: Optional[str] = None, hostname: Optional[str] = None,
+               subnet: Optional[str] = None, **fields: Optional[str]) -> Optional[Set[str]]:
+        """
+        Returns the MAC addresses of devices matching all of the given values.
+
+        Args:
+            ip: An IP address the device has used, currently or in the past.
+            hostname: The device's hostname, compared case-insensitively.
+            subnet: The device's subnet (a scanned range or DHCP pool name).
+                A CIDR network also matches devices whose current IP address
+                is in it.
+            fields: Exact values of 'vendor', 'category' or 'status'.
+
+        Returns:
+            The matching MAC addresses, or None if no value was given.
+        """
+        candidates = []
+        if ip is not None:
+            candidates.append(self._members(self._by_ip.get(ip)))
+        if hostname is not None:
+            candidates.append(self._members(self._by_hostname.get(hostname.lower())))
+        if subnet is not None:
+            network = parse_network(subnet)
+            macs = self._members(self._by_field['subnet'].get(subnet))
+            candidates.append(self.in_network(network).union(macs) if network is not None else macs)
+        for field, value in fields.items():
+            if value is not None:
+                candidates.append(self._members(self._by_field[field].get(value)))
+        if not candidates:
+            return None
+        candidates.sort(key=len)
+        return set(candidates[0]).intersection(*candidates[1:])
+
+    @staticmethod
+    def matches(device: Device, ip: Optional[str] = None, hostname: Optional[str] = None,
+                subnet: Optional[str] = None, **fields: Optional[str]) -> bool:
+        """Returns True if a device matches all of the given values, as `lookup` compares them."""
+        if ip is not None and ip not in device.ip_addresses:
+            return False
+        if hostname is not None and (device.hostname or '').lower() != hostname.lower():
+            return False
+        if subnet is not None and device.subnet != subnet:
+            network = parse_network(subnet)
+            address = _address(device.ip_addresses[-1]) if device.ip_addresses else None
+            if (network is None or address is None or address[0] != network.version
+                    or not int(network.network_address) <= address[1] <= int(network.broadcast_address)):
+                return False
+        return all(value is None or getattr(device, field) == value for field, value in fields.items())
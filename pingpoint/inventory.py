@@ -1,179 +1,691 @@
-from datetime import datetime
-from typing import Optional, List
+import json
+import time
+import sqlite3
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, List, Iterable, Dict, NamedTuple, Tuple
 import logging
-from .scanner import NmapScanner
-from .fingerbank import FingerbankClient
-from .config import load_config
 from pathlib import Path
 from .models import Device, Fingerprint
+from .events import EventStore
+from .eventlog import EventLog
+from .persistence import JournaledStore
+from .serialization import dumps, join_array
+from .oui import lookup_vendor
+from .scandiff import ScanDelta
+from .index import DeviceIndex
+
+
+class _View(NamedTuple):
+    """An immutable, published state of the inventory."""
+    seq: int  # The change sequence number of this view
+    devices: Dict[str, Device]  # Read-only device copies, keyed by MAC address
+    encoded: Dict[str, bytes]  # The JSON encoding of each device copy
+    seqs: Dict[str, int]  # The sequence number at which each device last changed
+    removed: Dict[str, int]  # Tombstones: the sequence number at which each device was removed
+    floor: int  # Deltas since a sequence number below this cannot be computed
 
 
 class Inventory:
-    """Manages the collection of all known devices."""
-    def __init__(self, persistence_file: Path, offline_debounce_scans: int = 2):
-        self.devices = {}  # Keyed by MAC address
+    """
+    Manages the collection of all known devices.
+
+    Writers (scans, detail updates, enrichment) serialize on a single lock and
+    modify `devices`. When a write finishes, a new read-only view is
+    published: a dict of device copies in which only the devices touched by
+    that write are re-copied. `get_device`, `all_devices` and `find_devices`
+    read the latest published view without taking the lock, so API readers
+    never wait on a running scan. Devices returned by them are point-in-time
+    copies and must not be modified.
+
+    Every published change is numbered by a monotonically increasing change
+    sequence, so clients can fetch only the devices changed since the
+    sequence number they last saw (`changes_since`). A device whose only
+    change is a newer last_seen is republished at most once every
+    `last_seen_resolution` seconds, so a steady network produces no changes.
+
+    A device goes offline after missing `offline_debounce_scans` consecutive
+    scans or, when `offline_grace_seconds` is set, once it has not been seen
+    for that long (which suits partial or sharded scans, where a device
+    missing from one scan may simply not have been covered by it). Each
+    online device has a deadline in a heap, so a scan only touches the
+    devices it found and those whose deadline has come, not the whole
+    inventory.
+
+    Published devices are also filed in secondary indexes (see
+    `pingpoint.index`) by IP address, hostname, subnet, vendor, category and
+    status, so `find_devices` looks up its matches instead of checking every
+    device.
+    """
+    # Tombstones of removed devices kept for delta clients
+    MAX_TOMBSTONES = 10000
+    # The device status each event type implies, so events need not store it
+    EVENT_STATUS = {"device_joined": "online", "device_reconnected": "online", "ip_change": "online",
+                    "device_offline": "offline"}
+
+    def __init__(self, persistence_file: Path, offline_debounce_scans: int = 2, event_capacity: int = 100000,
+                 event_log: Optional[EventLog] = None, snapshot_interval: float = 600, store=None,
+                 last_seen_resolution: float = 300, offline_grace_seconds: Optional[float] = None):
+        self.devices = {}  # Keyed by MAC address; only modified while holding _lock
+        self._lock = threading.RLock()
+        self.last_seen_resolution = last_seen_resolution
+        # Sequence numbers start at the current time in microseconds, so they
+        # keep increasing across restarts (and stay exact as JavaScript numbers).
+        self._seq = time.time_ns() // 1000
+        self._published = _View(self._seq, {}, {}, {}, {}, self._seq)
+        self._devices_json = None  # (seq, bytes) of the last full device list
+        # Updated by _publish before each view is swapped in. Guarded by its own
+        # lock, held only briefly, so queries do not wait for a scan to finish.
+        self._index = DeviceIndex()
+        self._index_lock = threading.Lock()
         self.persistence_file = persistence_file
-        self.events = [] # To log recent events
+        # Any store with the JournaledStore interface, e.g. persistence.SQLiteStore
+        self.store = store if store is not None else JournaledStore(persistence_file, snapshot_interval=snapshot_interval)
+        # MACs of devices changed since the last save. Changes to last_seen
+        # alone are not tracked; they are persisted with the next snapshot.
+        self._dirty = set()
+        self.events = EventStore(capacity=event_capacity, log=event_log)  # Recent events, newest first
         self.offline_debounce_scans = offline_debounce_scans
-        # A temporary dict to track how many consecutive scans a device has been missing
-        self._offline_counters = {}
+        # Fixed at construction, since heap deadlines are times in one mode and scan numbers in the other
+        self._offline_grace = timedelta(seconds=offline_grace_seconds) if offline_grace_seconds is not None else None
+        self._scan_count = 0
+        self._last_seen_scan = {}  # The scan number each online device was last seen in
+        # (deadline, mac) of online devices. A deadline is only a lower bound,
+        # because devices are not rescheduled when seen; it is checked when due.
+        self._expiry = []
+        self._scheduled = set()  # MACs with an entry in _expiry
+        # Devices the liveness prober found offline. Scans still record their
+        # addresses and hostname but do not bring them back online, since the
+        # router's ARP table outlives a departed device; the prober does once
+        # they answer again.
+        self._probed_offline = set()
+        # The IP address each device was last scanned at, which the prober uses
+        self._scanned_ip = {}
+        # Devices that have answered a liveness probe. Only their failed probes
+        # count, since some devices never answer the configured probes at all.
+        self._probe_answered = set()
+        # Background fingerprinting of new devices (see pingpoint.enrichment)
+        self.enrichment_queue = None
+        # Background webhook delivery (see notifications.NotificationDispatcher).
+        # Without one, notifications are sent synchronously.
+        self.notifier = None
+        # Pushes published changes and new events to clients (see pingpoint.broadcast)
+        self.broadcaster = None
         self.load_from_disk()
 
-    def _add_event(self, event_type: str, device: Device, message: str, webhook_url: Optional[str] = None):
+    def _add_event(self, event_type: str, device: Device, message: str, webhook_url: Optional[str] = None,
+                   changes: Optional[dict] = None):
         """
         Adds a new event to the log and triggers a notification if applicable.
+
+        Args:
+            changes: The fields the event changed, as {field: [old, new]}.
         """
         logging.info(message)
-        event = {
+        event = self.events.append({
             "timestamp": datetime.now().isoformat(),
             "type": event_type,
-            "device": device.to_dict(),
+            "mac": device.mac,
+            "changes": changes,
             "message": message
-        }
-        self.events.insert(0, event)
-        if len(self.events) > 200:
-            self.events.pop()
+        })
+        if self.broadcaster is not None:
+            self.broadcaster.publish("event", self._expand_event(event, device))
 
         # Notification logic
-        # Import here to avoid circular dependency
-        from .notifications import send_notification
-        if event_type == "device_joined":
-            send_notification(webhook_url, event_type, device)
-        elif event_type == "device_offline" and device.alert_on_offline:
-            send_notification(webhook_url, event_type, device)
+        if event_type == "device_joined" or (event_type == "device_offline" and device.alert_on_offline):
+            if self.notifier is not None:
+                self.notifier.submit(webhook_url, event_type, device)
+            else:
+                # Import here to avoid circular dependency
+                from .notifications import send_notification
+                send_notification(webhook_url, event_type, device)
 
-    def update_from_scan(self, scan_results: List[dict], webhook_url: Optional[str] = None):
+    def update_from_scan(self, scan_results: Iterable[dict], webhook_url: Optional[str] = None):
         """
-        Updates the inventory based on a list of devices found in a new scan.
+        Updates the inventory based on the devices found in a new scan.
         Detects new devices, status changes, and IP changes.
+
+        `scan_results` may be a generator such as `NmapScanner.scan_iter()`, in
+        which case hosts are processed while the scan is still running.
         """
-        logging.info(f"Raw scan results: {scan_results}")
         now = datetime.now()
         scanned_macs = set()
+        with self._lock:
+            self._scan_count += 1
 
         for scanned_device_data in scan_results:
+            logging.debug(f"Scan result: {scanned_device_data}")
             mac = scanned_device_data.get('mac')
             if not mac:
                 continue
-            
+
             mac = mac.upper()
             scanned_macs.add(mac)
-            
-            existing_device = self.get_device(mac)
-            ip = scanned_device_data.get('ip')
-
-            if existing_device is None:
-                # New device found
-                new_device = Device(
-                    mac=mac,
-                    ip_addresses=[ip] if ip else [],
-                    vendor=scanned_device_data.get('vendor'),
-                    hostname=scanned_device_data.get('hostname'),
-                    subnet=scanned_device_data.get('subnet'),
-                    status="online",
-                    first_seen=now,
-                    last_seen=now,
-                    friendly_name=mac
-                )
-                self.devices[mac] = new_device
-                self._add_event("device_joined", new_device, f"New device {mac} joined with IP {ip}", webhook_url)
-                
-                # Perform fingerprint scan for the new device
-                if ip and ip != '----------':
-                    nmap_scanner = NmapScanner(subnets=[])
-                    fingerprint = nmap_scanner.scan_for_fingerprint(ip)
-                    if fingerprint:
-                        new_device.fingerprint = fingerprint
-                        logging.info(f"Successfully fingerprinted new device {new_device.friendly_name}")
-                        
-                        # Enrich with Fingerbank data
-                        config = load_config(Path(__file__).parent.parent / "config.yaml")
-                        fb_api_key = config.get('fingerbank', {}).get('api_key')
-                        if fb_api_key:
-                            fb_client = FingerbankClient(api_key=fb_api_key)
-                            fb_client.enrich_device(new_device)
-                        else:
-                            logging.warning("Fingerbank API key not found in config.yaml. Skipping enrichment.")
+            # The lock is taken per host, not across the scan, so other
+            # writers are not held up while a streaming scan runs.
+            with self._lock:
+                self._update_from_host(mac, scanned_device_data, now, webhook_url)
+
+        with self._lock:
+            self._expire(now, webhook_url)
+            self._publish(self._dirty, seen=scanned_macs)
+            self.save_to_disk()
+
+    def apply_scan_delta(self, delta: ScanDelta, webhook_url: Optional[str] = None):
+        """
+        Updates the inventory from the difference between a scan and the previous scan of its source.
+
+        This has the same effect as passing the whole scan to
+        `update_from_scan`, but hosts that are unchanged since the previous
+        scan only have their last_seen time bumped, so the work done scales
+        with what changed on the network rather than with its size. See
+        `pingpoint.scandiff.ScanDiffer`.
+        """
+        now = datetime.now()
+        with self._lock:
+            self._scan_count += 1
+            scan_count = self._scan_count
+            seen = []
+            for host in delta.unchanged:
+                mac = host['mac']
+                device = self.devices.get(mac)
+                if device is None or device.status != "online":
+                    # Removed or gone offline since the previous scan; apply it in full.
+                    self._update_from_host(mac, host, now, webhook_url)
+                else:
+                    device.last_seen = now
+                    self._last_seen_scan[mac] = scan_count
+                seen.append(mac)
+
+        for host in itertools.chain(delta.added, delta.changed):
+            mac = host['mac']
+            seen.append(mac)
+            with self._lock:
+                self._update_from_host(mac, host, now, webhook_url)
+
+        with self._lock:
+            self._expire(now, webhook_url)
+            self._publish(self._dirty, seen=seen)
+            self.save_to_disk()
+
+    def _deadline(self, mac: str, device: Device):
+        """Returns when an online device goes offline: a time, or a scan number. The caller must hold the lock."""
+        if self._offline_grace is not None:
+            return device.last_seen + self._offline_grace
+        return self._last_seen_scan.get(mac, 0) + self.offline_debounce_scans
 
+    def _schedule(self, mac: str, device: Device):
+        """Ensures an online device has an expiry entry. The caller must hold the lock."""
+        if mac not in self._scheduled:
+            self._scheduled.add(mac)
+            heapq.heappush(self._expiry, (self._deadline(mac, device), mac))
+
+    def _expire(self, now: datetime, webhook_url: Optional[str]):
+        """Marks online devices whose deadline has passed as offline. The caller must hold the lock."""
+        clock = now if self._offline_grace is not None else self._scan_count
+        while self._expiry and self._expiry[0][0] <= clock:
+            _, mac = heapq.heappop(self._expiry)
+            self._scheduled.discard(mac)
+            device = self.devices.get(mac)
+            if device is None or device.status != "online":
+                continue
+            deadline = self._deadline(mac, device)
+            if deadline > clock:
+                # Seen since the entry was made
+                self._schedule(mac, device)
+                continue
+            device.status = "offline"
+            self._last_seen_scan.pop(mac, None)
+            self._dirty.add(mac)
+            self._add_event("device_offline", device, f"Device {device.friendly_name} is now offline.", webhook_url)
+
+    def apply_probe_results(self, results: Dict[str, bool], webhook_url: Optional[str] = None):
+        """
+        Applies a round of liveness probes (see pingpoint.liveness) between scans.
+
+        Args:
+            results: Whether each probed device answered, keyed by MAC address.
+                A device that answered counts as seen; one reported as not
+                answering goes offline immediately, since the prober applies
+                its own debounce, but only if it has answered a probe before.
+                Devices that never do are left to the scans.
+            webhook_url: The webhook to notify about devices going offline or returning.
+        """
+        now = datetime.now()
+        seen = []
+        with self._lock:
+            for mac, alive in results.items():
+                device = self.devices.get(mac)
+                if device is None:
+                    continue
+                if alive:
+                    self._probed_offline.discard(mac)
+                    self._probe_answered.add(mac)
+                    device.last_seen = now
+                    self._last_seen_scan[mac] = self._scan_count
+                    seen.append(mac)
+                    if device.status == "offline":
+                        device.status = "online"
+                        self._schedule(mac, device)
+                        self._dirty.add(mac)
+                        self._add_event("device_reconnected", device, f"Device {device.friendly_name} came back online.", webhook_url)
+                elif device.status == "online" and mac in self._probe_answered:
+                    self._probed_offline.add(mac)
+                    device.status = "offline"
+                    self._last_seen_scan.pop(mac, None)
+                    self._dirty.add(mac)
+                    self._add_event("device_offline", device, f"Device {device.friendly_name} is now offline.", webhook_url)
+            self._publish(self._dirty, seen=seen)
+            self.save_to_disk()
+
+    def clear_probe_results(self, mac: Optional[str] = None):
+        """
+        Forgets what the liveness prober found about one device, or about all of them.
+
+        Devices it marked offline are brought back online by the next scan
+        that sees them again.
+        """
+        with self._lock:
+            if mac is None:
+                self._probed_offline.clear()
+                self._probe_answered.clear()
             else:
-                # Existing device, update its state
-                existing_device.last_seen = now
-                
-                # Update hostname and subnet if they are not already set
-                if not existing_device.hostname and scanned_device_data.get('hostname'):
-                    existing_device.hostname = scanned_device_data.get('hostname')
-                if not existing_device.subnet and scanned_device_data.get('subnet'):
-                    existing_device.subnet = scanned_device_data.get('subnet')
-
-                if existing_device.status == "offline":
+                self._probed_offline.discard(mac)
+                self._probe_answered.discard(mac)
+
+    def current_ip(self, mac: str) -> Optional[str]:
+        """Returns the IP address a device was last scanned at, or its newest one if not scanned since startup."""
+        with self._lock:
+            device = self.devices.get(mac)
+            if device is None:
+                return None
+            return self._scanned_ip.get(mac) or (device.ip_addresses[-1] if device.ip_addresses else None)
+
+    def missed_scans(self, mac: str) -> int:
+        """Returns the number of consecutive scans an online device has been missing from."""
+        with self._lock:
+            device = self.devices.get(mac)
+            if device is None or device.status != "online":
+                return 0
+            return self._scan_count - self._last_seen_scan.get(mac, 0)
+
+    def _update_from_host(self, mac: str, scanned_device_data: dict, now: datetime, webhook_url: Optional[str]):
+        """Applies a single scanned host to the inventory. The caller must hold the lock."""
+        existing_device = self.devices.get(mac)
+        ip = scanned_device_data.get('ip')
+
+        if existing_device is None:
+            # New device found
+            new_device = Device(
+                mac=mac,
+                ip_addresses=[ip] if ip else [],
+                # Sources without vendor data (e.g. router ARP tables) fall back to the local OUI database.
+                vendor=scanned_device_data.get('vendor') or lookup_vendor(mac),
+                hostname=scanned_device_data.get('hostname'),
+                subnet=scanned_device_data.get('subnet'),
+                status="online",
+                first_seen=now,
+                last_seen=now,
+                friendly_name=mac
+            )
+            self.devices[mac] = new_device
+            self._last_seen_scan[mac] = self._scan_count
+            self._schedule(mac, new_device)
+            self._dirty.add(mac)
+            self._add_event("device_joined", new_device, f"New device {mac} joined with IP {ip}", webhook_url)
+            
+            # Fingerprinting runs on the enrichment workers, off the scan path
+            if ip and ip != '----------' and self.enrichment_queue is not None:
+                self.enrichment_queue.enqueue(mac, ip)
+
+        else:
+            # Existing device, update its state
+            probed_offline = mac in self._probed_offline
+            existing_device.last_seen = now
+            if not probed_offline:
+                self._last_seen_scan[mac] = self._scan_count
+            
+            # Update hostname, subnet and vendor if they are not already set
+            if not existing_device.hostname and scanned_device_data.get('hostname'):
+                existing_device.hostname = scanned_device_data.get('hostname')
+                self._dirty.add(mac)
+            if not existing_device.subnet and scanned_device_data.get('subnet'):
+                existing_device.subnet = scanned_device_data.get('subnet')
+                self._dirty.add(mac)
+            if not existing_device.vendor:
+                vendor = scanned_device_data.get('vendor') or lookup_vendor(mac)
+                if vendor:
+                    existing_device.vendor = vendor
+                    self._dirty.add(mac)
+
+            if existing_device.status == "offline":
+                if probed_offline:
+                    logging.debug(f"Keeping {mac} offline until a liveness probe at {ip} answers.")
+                else:
                     existing_device.status = "online"
+                    self._schedule(mac, existing_device)
+                    self._dirty.add(mac)
                     self._add_event("device_reconnected", existing_device, f"Device {existing_device.friendly_name} came back online.", webhook_url)
-                
-                if ip and ip not in existing_device.ip_addresses:
-                    existing_device.ip_addresses.append(ip)
-                    self._add_event("ip_change", existing_device, f"Device {existing_device.friendly_name} detected with new IP {ip}", webhook_url)
-
-                # Reset the offline counter since the device was seen
-                self._offline_counters.pop(mac, None)
-
-        # Check for devices that are now offline
-        inventory_macs = set(self.devices.keys())
-        missing_macs = inventory_macs - scanned_macs
-
-        for mac in missing_macs:
-            device = self.get_device(mac)
-            if device.status == "online":
-                self._offline_counters[mac] = self._offline_counters.get(mac, 0) + 1
-                if self._offline_counters[mac] >= self.offline_debounce_scans:
-                    device.status = "offline"
-                    self._add_event("device_offline", device, f"Device {device.friendly_name} is now offline.", webhook_url)
-                    # Remove from counter once marked offline
-                    self._offline_counters.pop(mac, None)
+            
+            if ip and ip not in existing_device.ip_addresses:
+                old_ips = list(existing_device.ip_addresses)
+                existing_device.ip_addresses.append(ip)
+                self._dirty.add(mac)
+                self._add_event("ip_change", existing_device, f"Device {existing_device.friendly_name} detected with new IP {ip}", webhook_url,
+                                changes={"ip_addresses": [old_ips, list(existing_device.ip_addresses)]})
+
+        if ip and ip != '----------':
+            self._scanned_ip[mac] = ip
+
+    def _publish(self, changed: Iterable[str], seen: Iterable[str] = ()):
+        """
+        Publishes a new view in which the given devices are re-copied under a new sequence number.
+        The caller must hold the lock.
+
+        Args:
+            changed: MAC addresses of devices that were modified, added or removed.
+            seen: MAC addresses of devices that were only seen again; they are
+                republished if their last_seen moved by `last_seen_resolution` or more.
+        """
+        try:
+            # Events added by this write are stored together.
+            self.events.flush()
+        except (IOError, sqlite3.Error) as e:
+            logging.error(f"Error storing events: {e}")
+        current = self._published
+        changed = set(changed)
+        for mac in seen:
+            if mac in changed:
+                continue
+            device, published = self.devices.get(mac), current.devices.get(mac)
+            if published is None or device.last_seen_seconds - published.last_seen_seconds >= self.last_seen_resolution:
+                changed.add(mac)
+        if not changed:
+            return
 
-        self.save_to_disk()
+        self._seq += 1
+        devices, encoded, seqs = dict(current.devices), dict(current.encoded), dict(current.seqs)
+        removed, floor = current.removed, current.floor
+        for mac in changed:
+            device = self.devices.get(mac)
+            if device is None:
+                if mac in devices:
+                    del devices[mac]
+                    del encoded[mac]
+                    del seqs[mac]
+                    removed = dict(removed) if removed is current.removed else removed
+                    removed[mac] = self._seq
+            else:
+                # Fingerprints are replaced, never modified, once on a device.
+                devices[mac] = device.copy()
+                # Encoded once per change, so responses are assembled from cached bytes.
+                encoded[mac] = dumps(devices[mac].to_dict())
+                seqs[mac] = self._seq
+                if mac in removed:
+                    removed = dict(removed) if removed is current.removed else removed
+                    del removed[mac]
+        with self._index_lock:
+            for mac in changed:
+                self._index.update(mac, devices.get(mac))
+        if len(removed) > self.MAX_TOMBSTONES:
+            # Drop the oldest tombstones; clients behind them must reload everything.
+            kept = sorted(removed.items(), key=lambda item: item[1])[-self.MAX_TOMBSTONES:]
+            floor = max(floor, kept[0][1])
+            removed = dict(kept)
+        self._published = _View(self._seq, devices, encoded, seqs, removed, floor)
+        if self.broadcaster is not None:
+            self.broadcaster.publish_json("devices", b"".join([
+                b'{"since":%d,"seq":%d,"changed":' % (self._seq - 1, self._seq),
+                join_array(encoded[mac] for mac in changed if mac in encoded),
+                b',"removed":',
+                dumps([mac for mac in changed if mac not in devices]),
+                b'}',
+            ]))
+
+    @property
+    def seq(self) -> int:
+        """The change sequence number of the latest published view."""
+        return self._published.seq
 
+    def snapshot(self) -> Dict[str, Device]:
+        """Returns the latest published view of the inventory, keyed by MAC address. It must not be modified."""
+        return self._published.devices
 
     def get_device(self, mac: str) -> Optional[Device]:
-        """Retrieves a device by its MAC address."""
-        return self.devices.get(mac)
+        """Retrieves a point-in-time copy of a device by its MAC address."""
+        return self._published.devices.get(mac)
 
     def all_devices(self) -> List[Device]:
         """Returns a list of all devices."""
-        return list(self.devices.values())
+        return list(self._published.devices.values())
+
+    def devices_json(self) -> Tuple[int, bytes]:
+        """
+        Returns the JSON array of all devices and the sequence number of the view it was built from.
+
+        The array is assembled from the cached per-device encodings and kept
+        until the next change.
+        """
+        view = self._published
+        cached = self._devices_json
+        if cached is None or cached[0] != view.seq:
+            cached = self._devices_json = (view.seq, join_array(view.encoded.values()))
+        return cached
+
+    def encode_devices(self, devices: Iterable[Device]) -> bytes:
+        """Returns a JSON array of the given devices, reusing cached encodings where they are current."""
+        view = self._published
+        return join_array(
+            view.encoded[device.mac] if view.devices.get(device.mac) is device else dumps(device.to_dict())
+            for device in devices
+        )
+
+    def expand_event(self, event: dict) -> dict:
+        """
+        Returns an event from `events` with a 'device' view joined in.
+
+        The view is the device's current state with the fields the event
+        changed (its 'changes', and the status implied by its type) set to
+        their values at the time of the event. Events for devices that have
+        since been removed only carry the MAC address.
+        """
+        mac = event.get('mac')
+        return self._expand_event(event, self._published.devices.get(mac) if mac else None)
+
+    @classmethod
+    def _expand_event(cls, event: dict, device: Optional[Device]) -> dict:
+        if 'device' in event:
+            # Logged before events were stored compactly
+            return event
+        if device is None:
+            view = {"mac": event.get('mac'), "friendly_name": None, "ip_addresses": []}
+        else:
+            view = device.to_dict()
+        if event.get('type') in cls.EVENT_STATUS:
+            view['status'] = cls.EVENT_STATUS[event['type']]
+        for name, (_, new) in (event.get('changes') or {}).items():
+            view[name] = new
+        return dict(event, device=view)
+
+    def changes_since(self, seq: int) -> Tuple[int, bool, List[Device], List[str]]:
+        """
+        Returns the devices changed and removed after a change sequence number.
+
+        Args:
+            seq: A sequence number from a previous call, or 0 for everything.
+
+        Returns:
+            A tuple of (seq, reset, changed, removed). `seq` is the current
+            sequence number to pass next time. When `reset` is True the delta
+            could not be computed (e.g. after a restart), and `changed` holds
+            every device; the caller should replace its copy.
+        """
+        view = self._published
+        if seq < view.floor or seq > view.seq:
+            return view.seq, True, list(view.devices.values()), []
+        changed = [view.devices[mac] for mac, changed_at in view.seqs.items() if changed_at > seq]
+        removed = [mac for mac, removed_at in view.removed.items() if removed_at > seq]
+        return view.seq, False, changed, removed
+
+    def find_devices(self, status: Optional[str] = None, subnet: Optional[str] = None,
+                     vendor: Optional[str] = None, ip: Optional[str] = None,
+                     hostname: Optional[str] = None, category: Optional[str] = None) -> List[Device]:
+        """
+        Returns the devices matching all of the given values.
+
+        Args:
+            status: 'online' or 'offline'.
+            subnet: The device's subnet as reported by its scan (a scanned
+                range or DHCP pool name), or a CIDR network such as
+                '10.10.0.0/16', which also matches every device whose current
+                IP address is in it.
+            vendor: The exact vendor name.
+            ip: An IP address the device has or had. The device currently
+                holding it comes first, followed by earlier holders.
+            hostname: The hostname, compared case-insensitively.
+            category: The exact device category.
+
+        Returns:
+            The matching devices, most recently seen first. Without any
+            value, all devices in inventory order.
+        """
+        filters = {'status': status, 'subnet': subnet, 'vendor': vendor, 'ip': ip,
+                   'hostname': hostname, 'category': category}
+        with self._index_lock:
+            macs = self._index.lookup(**filters)
+        if macs is None:
+            return self.all_devices()
+        # The view can be published just before or after the index was read,
+        # so the candidates are re-checked against it.
+        view = self._published.devices
+        devices = [view[mac] for mac in macs if mac in view]
+        devices = [device for device in devices if DeviceIndex.matches(device, **filters)]
+        if ip is None:
+            devices.sort(key=lambda device: device.last_seen_seconds, reverse=True)
+        else:
+            devices.sort(key=lambda device: (device.ip_addresses[-1] == ip, device.last_seen_seconds), reverse=True)
+        return devices
+
+    def flagged_devices(self) -> List[Device]:
+        """Returns the devices with `alert_on_offline` set, without checking every device."""
+        with self._index_lock:
+            macs = self._index.flagged()
+        view = self._published.devices
+        return [view[mac] for mac in macs if mac in view and view[mac].alert_on_offline]
 
     def update_device_details(self, mac: str, friendly_name: str, notes: str, alert_on_offline: bool) -> Optional[Device]:
         """Updates the friendly name, notes, and alert settings for a specific device."""
-        device = self.get_device(mac)
-        if device:
+        with self._lock:
+            device = self.devices.get(mac)
+            if device is None:
+                return None
             device.friendly_name = friendly_name
             device.notes = notes
             device.alert_on_offline = alert_on_offline
+            if not alert_on_offline:
+                # No longer probed, so scans decide its status again.
+                self.clear_probe_results(mac)
+            self._dirty.add(mac)
+            self._publish([mac])
             self.save_to_disk()
-            return device
-        return None
+            return self._published.devices[mac]
+
+    def apply_enrichment(self, mac: str, enriched: Device) -> bool:
+        """
+        Copies the fingerprint and Fingerbank classification from an enriched
+        copy of a device onto the inventory's device.
+
+        Enrichment runs on a private copy outside the lock so that slow
+        lookups never block writers. A friendly name the user set in the
+        meantime is kept.
+
+        Returns:
+            False if the device is no longer in the inventory, True otherwise.
+        """
+        with self._lock:
+            device = self.devices.get(mac)
+            if device is None:
+                return False
+            device.fingerprint = enriched.fingerprint
+            device.category = enriched.category
+            # Fingerbank does not always name a vendor; keep the one from the MAC address then.
+            device.vendor = enriched.vendor or device.vendor
+            device.vulnerabilities = enriched.vulnerabilities
+            if device.friendly_name == mac:
+                device.friendly_name = enriched.friendly_name
+            self._dirty.add(mac)
+            self._publish([mac])
+            self.save_to_disk()
+            return True
+
+    def remove_device(self, mac: str) -> bool:
+        """
+        Removes a device from the inventory.
+
+        Returns:
+            True if the device was removed, False if it was not in the inventory.
+        """
+        with self._lock:
+            if self.devices.pop(mac, None) is None:
+                return False
+            self._last_seen_scan.pop(mac, None)
+            self._scanned_ip.pop(mac, None)
+            self.clear_probe_results(mac)
+            self._dirty.add(mac)
+            self._publish([mac])
+            self.save_to_disk()
+        logging.info(f"Removed device {mac} from the inventory.")
+        return True
+
+    def save_to_disk(self, snapshot: bool = False):
+        """
+        Persists changes made since the last save.
+
+        Changed devices are appended to the journal. A full snapshot is
+        written when one is due, or when `snapshot` is True.
+        """
+        with self._lock:
+            self._save_locked(snapshot)
 
-    def save_to_disk(self):
-        """Saves the current inventory to a JSON file."""
+    def _save_locked(self, snapshot: bool):
+        dirty = set(self._dirty)
         try:
-            with open(self.persistence_file, "w") as f:
-                import json
-                json.dump([dev.to_dict() for dev in self.devices.values()], f, indent=2)
-        except IOError as e:
+            changed = [self.devices[mac].to_dict() for mac in dirty if mac in self.devices]
+            removed = [mac for mac in dirty if mac not in self.devices]
+            self._dirty.clear()
+            self.store.write(changed, removed)
+            if snapshot or self.store.snapshot_due():
+                self.store.snapshot(dev.to_dict() for dev in self.devices.values())
+        except (IOError, sqlite3.Error) as e:
+            # Keep the changes for the next save instead of failing the caller's scan or job.
+            self._dirty |= dirty
             logging.error(f"Error saving inventory to {self.persistence_file}: {e}")
 
     def load_from_disk(self):
-        """Loads the inventory from a JSON file."""
+        """Loads the inventory from its snapshot and journal."""
         try:
-            with open(self.persistence_file, "r") as f:
-                import json
-                devices_data = json.load(f)
-                self.devices = {dev['mac']: Device.from_dict(dev) for dev in devices_data}
-        except FileNotFoundError:
-            # It's okay if the file doesn't exist on first run
-            self.devices = {}
-        except (IOError, json.JSONDecodeError) as e:
+            devices_data = self.store.load()
+            devices = {mac: Device.from_dict(dev) for mac, dev in devices_data.items()}
+        except (IOError, json.JSONDecodeError, sqlite3.Error) as e:
             logging.error(f"Error loading inventory from {self.persistence_file}: {e}")
-            self.devices = {}
+            devices = {}
+        with self._lock:
+            self.devices = devices
+            online = [mac for mac, device in devices.items() if device.status == "online"]
+            self._last_seen_scan = dict.fromkeys(online, self._scan_count)
+            self._scanned_ip = {}
+            self._scheduled = set(online)
+            self._expiry = [(self._deadline(mac, devices[mac]), mac) for mac in online]
+            heapq.heapify(self._expiry)
+            self._seq += 1
+            # Deltas cannot span a reload, so this is the new floor.
+            self._published = _View(self._seq, {}, {}, {}, {}, self._seq)
+            with self._index_lock:
+                self._index = DeviceIndex()
+            self._publish(devices)
 
 
 # Example of how to use it:
@@ -195,7 +707,7 @@ if __name__ == '__main__':
     # 1. Test basic save and load
     inventory = Inventory(persistence_file=test_persistence_file)
     inventory.devices[device.mac] = device
-    inventory.save_to_disk()
+    inventory.save_to_disk(snapshot=True)
     new_inventory = Inventory(persistence_file=test_persistence_file)
     assert len(new_inventory.all_devices()) == 1
     assert new_inventory.get_device("AA:BB:CC:DD:EE:FF") is not None
@@ -234,6 +746,7 @@ if __name__ == '__main__':
 
     # Clean up
     import os
-    if os.path.exists(test_persistence_file):
-        os.remove(test_persistence_file)
+    for path in (test_persistence_file, f"{test_persistence_file}.journal"):
+        if os.path.exists(path):
+            os.remove(path)
     print(f"\nCleaned up {test_persistence_file}.")
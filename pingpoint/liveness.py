@@ -0,0 +1,182 @@
+import time
+import socket
+import logging
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from .models import Device
+
+ARP_TABLE = "/proc/net/arp"
+ARP_COMPLETE = 0x2
+
+
+class LivenessProber:
+    """
+    Checks devices flagged with `alert_on_offline` between full scans.
+
+    Every `interval` seconds, each flagged device is probed with cheap checks
+    tried in order until one succeeds:
+
+    - 'tcp': connects to up to `max_ports` TCP ports its fingerprint found
+      open. A refused connection also proves the host is up.
+    - 'icmp': a single ping.
+    - 'arp': a complete entry for the device in the local ARP cache. Only
+      useful on the same network segment, and an entry can outlive the
+      device by a minute or more, so it is not used by default.
+
+    A device that fails `misses` consecutive rounds goes offline, and one
+    that answers again comes back online, through
+    `Inventory.apply_probe_results`. Offline alerts for critical devices
+    therefore arrive within `interval * misses` seconds instead of waiting
+    for full sweeps. Misses only count for devices that have answered a
+    probe before; one that never does (no open ports found and ICMP
+    filtered) is left to the scans.
+    """
+    METHODS = ('tcp', 'icmp', 'arp')
+
+    def __init__(self, inventory, interval: float = 10, timeout: float = 1.0, misses: int = 2,
+                 methods: Iterable[str] = ('tcp', 'icmp'), max_ports: int = 2, workers: int = 8,
+                 webhook_url: Optional[str] = None, history_size: int = 100):
+        unknown = set(methods) - set(self.METHODS)
+        if unknown:
+            raise ValueError(f"Unknown liveness probe methods: {', '.join(sorted(unknown))}")
+        self.inventory = inventory
+        self.interval = interval
+        self.timeout = timeout
+        self.misses = max(1, misses)
+        self.methods = tuple(methods)
+        self.max_ports = max_ports
+        self.webhook_url = webhook_url
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="liveness-probe")
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._failures = {}  # Consecutive failed rounds per MAC address
+        self._round_times = deque(maxlen=history_size)
+        self._rounds = 0
+        self._probes = 0
+        self._last_probed = 0
+        self._last_error = None
+
+    def start(self):
+        """Starts probing in a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._worker, name="liveness", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stops the probing thread."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._executor.shutdown(wait=False)
+        # Without probes, scans decide the status of every device again.
+        self.inventory.clear_probe_results()
+
+    def stats(self) -> dict:
+        """Returns round counts and timings."""
+        with self._lock:
+            times = list(self._round_times)
+            return {
+                "running": self._thread is not None,
+                "interval_seconds": self.interval,
+                "rounds": self._rounds,
+                "probes": self._probes,
+                "devices_probed": self._last_probed,
+                "failing": sorted(mac for mac, count in self._failures.items() if count),
+                "average_round_seconds": sum(times) / len(times) if times else None,
+                "last_error": self._last_error,
+            }
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_round()
+            except Exception as e:
+                with self._lock:
+                    self._last_error = str(e)
+                logging.error(f"Liveness probe round failed: {e}")
+            self._stop.wait(self.interval)
+
+    def probe_round(self) -> dict:
+        """
+        Probes every flagged device once and applies the outcome to the inventory.
+
+        Returns:
+            Whether each probed device answered, keyed by MAC address.
+        """
+        start = time.monotonic()
+        devices = [device for device in self.inventory.flagged_devices() if device.ip_addresses]
+        # A device can return to an address it used before, so probe where it was last scanned.
+        ips = [self.inventory.current_ip(device.mac) for device in devices]
+        answers = dict(zip((device.mac for device in devices), self._executor.map(self.probe, devices, ips)))
+
+        results = {}
+        with self._lock:
+            for mac in list(self._failures):
+                if mac not in answers:
+                    # No longer flagged or no longer in the inventory
+                    del self._failures[mac]
+            for mac, alive in answers.items():
+                if alive:
+                    self._failures.pop(mac, None)
+                    results[mac] = True
+                else:
+                    self._failures[mac] = self._failures.get(mac, 0) + 1
+                    if self._failures[mac] >= self.misses:
+                        results[mac] = False
+            self._rounds += 1
+            self._probes += len(devices)
+            self._last_probed = len(devices)
+            self._round_times.append(time.monotonic() - start)
+        if results:
+            self.inventory.apply_probe_results(results, self.webhook_url)
+        return answers
+
+    def probe(self, device: Device, ip: Optional[str] = None) -> bool:
+        """Returns True if the device answers any of the configured probes at `ip`, by default its newest IP address."""
+        ip = ip or device.ip_addresses[-1]
+        for method in self.methods:
+            try:
+                if getattr(self, f"_probe_{method}")(device, ip):
+                    return True
+            except Exception as e:
+                logging.debug(f"Liveness probe '{method}' failed for {device.mac} ({ip}): {e}")
+        return False
+
+    def _probe_tcp(self, device: Device, ip: str) -> bool:
+        ports = [int(port['portid']) for port in (device.fingerprint.ports if device.fingerprint else ())
+                 if port.get('protocol') == 'tcp'][:self.max_ports]
+        for port in ports:
+            try:
+                with socket.create_connection((ip, port), timeout=self.timeout):
+                    return True
+            except ConnectionRefusedError:
+                # Only a live host sends a reset
+                return True
+            except OSError:
+                continue
+        return False
+
+    def _probe_icmp(self, device: Device, ip: str) -> bool:
+        result = subprocess.run(
+            ["ping", "-c", "1", "-W", str(max(1, round(self.timeout))), ip],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=self.timeout + 2
+        )
+        return result.returncode == 0
+
+    def _probe_arp(self, device: Device, ip: str) -> bool:
+        with open(ARP_TABLE, "r") as f:
+            next(f, None)  # Header
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 4 and fields[0] == ip:
+                    return int(fields[2], 16) & ARP_COMPLETE and fields[3].upper() == device.mac
+        return False
@@ -13,11 +13,17 @@ def setup_logging():
 import time
 import threading
 import uvicorn
+from functools import partial
 from pingpoint.scanner import scan_network
-from pingpoint.api import app, inventory
+from pingpoint.api import app, inventory, scan_coordinator
 
-def run_scanner(inventory_instance):
-    """The main scanning loop."""
+def run_scanner(coordinator):
+    """
+    The main scanning loop.
+
+    Scans run through the coordinator, so a manual EdgeMax scan that is
+    already running is waited for instead of being repeated.
+    """
     config_path = Path(__file__).parent.parent / "config.yaml"
 
     while True:
@@ -27,10 +33,9 @@ def run_scanner(inventory_instance):
             webhook_url = config.get('home_assistant', {}).get('webhook_url')
 
             logging.info("Starting network scan...")
-            scan_results = scan_network(config)
-            inventory_instance.update_from_scan(scan_results, webhook_url)
-            inventory_instance.save_to_disk()
-            logging.info(f"Scan complete. Found {len(scan_results)} devices.")
+            found = coordinator.run("edgemax", partial(scan_network, config), webhook_url)
+            if found is not None:
+                logging.info(f"Scan complete. Found {found} devices.")
         except Exception as e:
             logging.error(f"An error occurred during the scan cycle: {e}")
             # Set a default scan interval in case of config load failure
@@ -57,7 +62,7 @@ def main():
         return
 
     # Start the scanner in a background thread
-    scanner_thread = threading.Thread(target=run_scanner, args=(inventory,), daemon=True)
+    scanner_thread = threading.Thread(target=run_scanner, args=(scan_coordinator,), daemon=True)
     scanner_thread.start()
 
     # Start the FastAPI server
@@ -66,7 +71,7 @@ def main():
         uvicorn.run(app, host="0.0.0.0", port=8000)
     finally:
         logging.info("Shutting down. Saving inventory...")
-        inventory.save_to_disk()
+        inventory.save_to_disk(snapshot=True)
         logging.info("Inventory saved.")
 
 
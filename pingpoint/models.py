@@ -1,18 +1,183 @@
-from dataclasses import dataclass, field, asdict
-from datetime import datetime
+import re
+import sys
+import weakref
+import threading
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta
 from typing import Optional, List
+from .oui import is_locally_administered
 
+_MAC_PATTERN = re.compile(r"^[0-9A-F]{2}(:[0-9A-F]{2}){5}$")
+_EPOCH = datetime(1970, 1, 1)
+
+# Port descriptions in use, keyed by their items. Fingerprints share them, so
+# each distinct open port (e.g. 22/tcp OpenSSH 8.9) is stored once. An entry
+# goes away with the last fingerprint that uses it.
+_PORTS = weakref.WeakValueDictionary()
+_PORTS_LOCK = threading.Lock()
+
+
+class _Port(dict):
+    """A port description. It is read-only, since fingerprints share it."""
+    __slots__ = ('__weakref__',)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Port descriptions are shared between fingerprints and cannot be modified")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _pack_mac(mac):
+    """Stores a canonical (upper-case, colon-separated) MAC address as a 48-bit integer."""
+    if type(mac) is str and _MAC_PATTERN.match(mac):
+        return int(mac.replace(':', ''), 16)
+    return _intern(mac)
+
+
+def _unpack_mac(value):
+    if type(value) is int:
+        return value.to_bytes(6, 'big').hex(':').upper()
+    return value
+
+
+def _pack_time(value):
+    """
+    Stores a naive local datetime as seconds since 1970-01-01 in local time.
+
+    Unlike `datetime.timestamp`, this needs no time zone lookup and converts
+    back exactly, to the microsecond.
+    """
+    return (value - _EPOCH).total_seconds() if isinstance(value, datetime) else value
+
+
+def _unpack_time(value):
+    return _EPOCH + timedelta(seconds=value) if isinstance(value, float) else value
+
+
+def _pack_ports(ports):
+    """Stores ports as a tuple of shared, read-only port dictionaries."""
+    shared = []
+    with _PORTS_LOCK:
+        for port in ports:
+            port = port if type(port) is _Port else _Port(port)
+            try:
+                shared.append(_PORTS.setdefault(tuple(port.items()), port))
+            except TypeError:
+                # Unhashable values; keep this port to itself
+                shared.append(port)
+    return tuple(shared)
+
+
+def _slotted(**converters):
+    """
+    Rebuilds a dataclass with `__slots__`, as `dataclass(slots=True)` does on Python 3.10 and later.
+
+    Args:
+        converters: (pack, unpack) functions by field name. These fields are
+            kept in a private slot in packed form and converted by a property
+            on every assignment and access. Either function may be None.
+    """
+    def wrap(cls):
+        names = [f.name for f in fields(cls)]
+        namespace = {key: value for key, value in cls.__dict__.items()
+                     if key not in names and key not in ('__dict__', '__weakref__')}
+        namespace['__slots__'] = tuple(f"_{name}" if name in converters else name for name in names)
+        for name, (pack, unpack) in converters.items():
+            namespace[name] = _converted(f"_{name}", pack, unpack)
+        return type(cls)(cls.__name__, cls.__bases__, namespace)
+    return wrap
+
+
+def _converted(slot: str, pack, unpack) -> property:
+    def get(self):
+        value = getattr(self, slot)
+        return value if unpack is None else unpack(value)
+
+    def set(self, value):
+        setattr(self, slot, value if pack is None else pack(value))
+    return property(get, set)
+
+
+@_slotted(os_match=(_intern, None), os_accuracy=(_intern, None), tier=(_intern, None), ports=(_pack_ports, None))
 @dataclass
 class Fingerprint:
-    """Stores device fingerprint information from an Nmap scan."""
+    """
+    Stores device fingerprint information from an Nmap scan.
+
+    `ports` is stored as a tuple of read-only port dictionaries that are
+    shared with other fingerprints; assign a new list to change the ports.
+    """
     os_match: Optional[str] = None
     os_accuracy: Optional[str] = None
     ports: List[dict] = field(default_factory=list)
     hostname: Optional[str] = None
+    # The deepest scan tier that contributed to this fingerprint ('quick' or 'deep')
+    tier: Optional[str] = None
+
+    def merge(self, other: "Fingerprint") -> "Fingerprint":
+        """
+        Combines this fingerprint with one from a deeper scan.
+
+        Values found by `other` take precedence; ports are combined by protocol
+        and port number. Neither fingerprint is modified, since this one may
+        already be on a published device.
+
+        Returns:
+            A new fingerprint.
+        """
+        ports = {(p['protocol'], p['portid']): p for p in self.ports}
+        for port in other.ports:
+            ports[(port['protocol'], port['portid'])] = port
+        return Fingerprint(
+            os_match=other.os_match or self.os_match,
+            os_accuracy=other.os_accuracy or self.os_accuracy,
+            ports=list(ports.values()),
+            hostname=other.hostname or self.hostname,
+            tier=other.tier or self.tier,
+        )
+
+    def to_dict(self):
+        """Converts the fingerprint to a dictionary. Port dictionaries are shared, not copied."""
+        return {
+            'os_match': self._os_match,
+            'os_accuracy': self._os_accuracy,
+            'ports': list(self._ports),
+            'hostname': self.hostname,
+            'tier': self._tier,
+        }
 
+    @classmethod
+    def from_dict(cls, data):
+        """Creates a Fingerprint object from a dictionary. The dictionary is not modified."""
+        fingerprint = object.__new__(cls)
+        fingerprint._os_match = _intern(data.get('os_match'))
+        fingerprint._os_accuracy = _intern(data.get('os_accuracy'))
+        fingerprint._ports = _pack_ports(data.get('ports') or ())
+        fingerprint.hostname = data.get('hostname')
+        fingerprint._tier = _intern(data.get('tier'))
+        return fingerprint
+
+@_slotted(mac=(_pack_mac, _unpack_mac), vendor=(_intern, None), category=(_intern, None),
+          subnet=(_intern, None), status=(_intern, None),
+          first_seen=(_pack_time, _unpack_time), last_seen=(_pack_time, _unpack_time))
 @dataclass
 class Device:
-    """Represents a single device on the network."""
+    """
+    Represents a single device on the network.
+
+    Instances are slotted and keep some fields packed: the MAC address as a
+    48-bit integer, first_seen and last_seen as epoch seconds, and vendor,
+    category, subnet and status as interned strings. The attributes still
+    read and accept the usual strings and datetimes.
+    """
     mac: str
     ip_addresses: List[str] = field(default_factory=list)
     vendor: Optional[str] = None
@@ -29,32 +194,100 @@ class Device:
     vulnerabilities: bool = False
 
     def to_dict(self):
-        """Converts the device object to a dictionary for JSON serialization."""
-        data = asdict(self)
-        data['first_seen'] = self.first_seen.isoformat()
-        data['last_seen'] = self.last_seen.isoformat()
-        return data
+        """
+        Converts the device object to a dictionary for JSON serialization.
+
+        This is called for every event and every published change, so unlike
+        `dataclasses.asdict` it only copies one level deep, and it reads the
+        packed fields directly.
+        """
+        return {
+            'mac': _unpack_mac(self._mac),
+            'ip_addresses': list(self.ip_addresses),
+            'vendor': self._vendor,
+            'category': self._category,
+            'hostname': self.hostname,
+            'friendly_name': self.friendly_name,
+            'subnet': self._subnet,
+            'status': self._status,
+            'first_seen': _unpack_time(self._first_seen).isoformat(),
+            'last_seen': _unpack_time(self._last_seen).isoformat(),
+            'alert_on_offline': self.alert_on_offline,
+            'notes': self.notes,
+            'fingerprint': self.fingerprint.to_dict() if self.fingerprint else None,
+            'vulnerabilities': self.vulnerabilities,
+            'locally_administered': self.locally_administered,
+        }
+
+    @property
+    def last_seen_seconds(self) -> float:
+        """last_seen in seconds since 1970-01-01 local time; cheaper to compare than the datetime."""
+        return self._last_seen
+
+    @property
+    def locally_administered(self) -> bool:
+        """True if the MAC address is locally administered, as randomized (private) addresses are."""
+        if type(self._mac) is int:
+            return bool(self._mac >> 40 & 0x02)
+        return is_locally_administered(self._mac)
+
+    def copy(self) -> "Device":
+        """
+        Returns a copy of the device with its own ip_addresses list.
+
+        Other values, including the fingerprint, are shared. This is much
+        faster than `dataclasses.replace`, which converts every packed field.
+        """
+        device = object.__new__(type(self))
+        device._mac = self._mac
+        device.ip_addresses = list(self.ip_addresses)
+        device._vendor = self._vendor
+        device._category = self._category
+        device.hostname = self.hostname
+        device.friendly_name = self.friendly_name
+        device._subnet = self._subnet
+        device._status = self._status
+        device._first_seen = self._first_seen
+        device._last_seen = self._last_seen
+        device.alert_on_offline = self.alert_on_offline
+        device.notes = self.notes
+        device.fingerprint = self.fingerprint
+        device.vulnerabilities = self.vulnerabilities
+        return device
 
     @classmethod
     def from_dict(cls, data):
-        """Creates a Device object from a dictionary."""
-        data['first_seen'] = datetime.fromisoformat(data['first_seen'])
-        data['last_seen'] = datetime.fromisoformat(data['last_seen'])
-        if data.get('fingerprint'):
-            data['fingerprint'] = Fingerprint(**data['fingerprint'])
-        
+        """
+        Creates a Device object from a dictionary. The dictionary is not modified.
+
+        This runs for every device at startup, so it fills the packed fields
+        directly instead of going through `__init__` and the properties.
+        """
         # Handle old and new format for vulnerabilities, ensuring it's always a boolean.
         vulnerabilities = data.get('vulnerabilities')
         if isinstance(vulnerabilities, list):
             # If it's a list, it's only true if the list is not empty.
-            data['vulnerabilities'] = len(vulnerabilities) > 0
+            vulnerabilities = len(vulnerabilities) > 0
         elif vulnerabilities is None or vulnerabilities == "None":
             # Handles cases where the value is missing or the literal string "None".
-            data['vulnerabilities'] = False
+            vulnerabilities = False
         else:
             # For any other case (e.g., it's already a boolean), cast it.
-            data['vulnerabilities'] = bool(vulnerabilities)
-            
-        if 'category' not in data:
-            data['category'] = None
-        return cls(**data)
+            vulnerabilities = bool(vulnerabilities)
+
+        device = object.__new__(cls)
+        device._mac = _pack_mac(data['mac'])
+        device.ip_addresses = list(data.get('ip_addresses') or ())
+        device._vendor = _intern(data.get('vendor'))
+        device._category = _intern(data.get('category'))
+        device.hostname = data.get('hostname')
+        device.friendly_name = data.get('friendly_name')
+        device._subnet = _intern(data.get('subnet'))
+        device._status = _intern(data.get('status', "offline"))
+        device._first_seen = _pack_time(datetime.fromisoformat(data['first_seen']))
+        device._last_seen = _pack_time(datetime.fromisoformat(data['last_seen']))
+        device.alert_on_offline = data.get('alert_on_offline', False)
+        device.notes = data.get('notes')
+        device.fingerprint = Fingerprint.from_dict(data['fingerprint']) if data.get('fingerprint') else None
+        device.vulnerabilities = vulnerabilities
+        return device
@@ -1,7 +1,25 @@
-import requests
+import time
+import queue
 import logging
+import threading
+from collections import deque
+
+import requests
 from .inventory import Device
 
+
+def build_payload(event_type: str, device: Device) -> dict:
+    """Builds the webhook payload for a single device event."""
+    return {
+        "event": event_type,
+        "device": device.friendly_name,
+        "ip": ", ".join(device.ip_addresses),
+        "mac": device.mac,
+        "vendor": device.vendor,
+        "time": device.last_seen.isoformat()
+    }
+
+
 def send_notification(webhook_url: str, event_type: str, device: Device):
     """
     Sends a notification to the configured Home Assistant webhook.
@@ -15,14 +33,7 @@ def send_notification(webhook_url: str, event_type: str, device: Device):
         logging.warning("Webhook URL is not configured. Skipping notification.")
         return
 
-    payload = {
-        "event": event_type,
-        "device": device.friendly_name,
-        "ip": ", ".join(device.ip_addresses),
-        "mac": device.mac,
-        "vendor": device.vendor,
-        "time": device.last_seen.isoformat()
-    }
+    payload = build_payload(event_type, device)
 
     try:
         logging.info(f"Sending notification for event '{event_type}' for device {device.mac}")
@@ -32,6 +43,175 @@ def send_notification(webhook_url: str, event_type: str, device: Device):
     except requests.exceptions.RequestException as e:
         logging.error(f"Failed to send notification to Home Assistant: {e}")
 
+
+class NotificationDispatcher:
+    """
+    Sends webhook notifications from a background thread.
+
+    `submit` only builds the payload and puts it on a bounded queue, so a slow
+    or unreachable Home Assistant never blocks the scan cycle. When the queue
+    is full, new notifications are dropped and counted. Requests share a
+    pooled HTTP session and are retried with exponential backoff on
+    connection errors, 5xx and 429 responses.
+
+    With a `batch_window` greater than zero, notifications that arrive within
+    that many seconds of each other are coalesced into one request:
+    `{"event": "batch", "count": N, "events": [...]}`. A single notification
+    is always sent in the original format.
+    """
+    def __init__(self, queue_size: int = 1000, max_retries: int = 3, retry_backoff: float = 1.0,
+                 batch_window: float = 0.0, max_batch_size: int = 50, timeout: float = 10,
+                 history_size: int = 100):
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.batch_window = batch_window
+        self.max_batch_size = max(1, max_batch_size)
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._session = requests.Session()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=history_size)
+        self._submitted = 0
+        self._sent = 0
+        self._failed = 0
+        self._dropped = 0
+        self._retries = 0
+        self._requests = 0
+        self._last_error = None
+
+    def submit(self, webhook_url: str, event_type: str, device: Device) -> bool:
+        """
+        Queues a notification without waiting for it to be sent.
+
+        Returns:
+            True if the notification was queued, False if it was skipped or dropped.
+        """
+        if not webhook_url:
+            logging.warning("Webhook URL is not configured. Skipping notification.")
+            return False
+        try:
+            self._queue.put_nowait((webhook_url, build_payload(event_type, device)))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            logging.warning(f"Notification queue is full; dropped '{event_type}' for device {device.mac}")
+            return False
+        with self._lock:
+            self._submitted += 1
+        return True
+
+    def start(self):
+        """Starts the dispatcher thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._worker, name="notifications", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stops the dispatcher thread. Notifications that are still queued are
+        sent without retries before the thread exits, within `timeout` seconds.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        """Returns queue depth, delivery counters and recent send latencies."""
+        with self._lock:
+            latencies = list(self._latencies)
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self.queue_size,
+                "submitted": self._submitted,
+                "sent": self._sent,
+                "failed": self._failed,
+                "dropped": self._dropped,
+                "retries": self._retries,
+                "requests": self._requests,
+                "average_latency_seconds": sum(latencies) / len(latencies) if latencies else None,
+                "max_latency_seconds": max(latencies) if latencies else None,
+                "last_error": self._last_error,
+            }
+
+    def _worker(self):
+        """Sends queued notifications until stopped and the queue is empty."""
+        while True:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            batch = [first]
+            if self.batch_window > 0:
+                deadline = time.monotonic() + self.batch_window
+                while len(batch) < self.max_batch_size and not self._stop.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+            self._send_all(batch)
+
+    def _send_all(self, batch):
+        """Sends a list of (webhook_url, payload) items, coalescing them per URL when batching."""
+        by_url = {}
+        for webhook_url, payload in batch:
+            by_url.setdefault(webhook_url, []).append(payload)
+        for webhook_url, payloads in by_url.items():
+            if len(payloads) == 1:
+                self._send(webhook_url, payloads[0], 1)
+            else:
+                self._send(webhook_url, {"event": "batch", "count": len(payloads), "events": payloads}, len(payloads))
+
+    def _send(self, webhook_url: str, payload: dict, count: int):
+        """Posts one payload, retrying transient failures with exponential backoff."""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            retryable = True
+            try:
+                response = self._session.post(webhook_url, json=payload, timeout=self.timeout)
+                if response.status_code < 500 and response.status_code != 429:
+                    response.raise_for_status()
+                    error = None
+                else:
+                    error = f"HTTP {response.status_code}"
+            except requests.exceptions.HTTPError as e:
+                # Other 4xx responses will not succeed on a retry.
+                error = str(e)
+                retryable = False
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+            with self._lock:
+                self._requests += 1
+                self._latencies.append(time.monotonic() - started)
+            if error is None:
+                with self._lock:
+                    self._sent += count
+                logging.info(f"Sent {count} notification(s) for event '{payload['event']}'.")
+                return
+            if not retryable or attempt == self.max_retries or self._stop.is_set():
+                break
+            with self._lock:
+                self._retries += 1
+            if self._stop.wait(self.retry_backoff * 2 ** attempt):
+                break
+        with self._lock:
+            self._failed += count
+            self._last_error = error
+        logging.error(f"Failed to send notification to Home Assistant: {error}")
+
+
 # Example of how to use it:
 if __name__ == '__main__':
     import os
@@ -0,0 +1,200 @@
+import os
+import csv
+import sys
+import logging
+import argparse
+import threading
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, Optional
+
+import requests
+
+# Written by `python -m pingpoint.oui` from the IEEE registries
+DATA_FILE = Path(__file__).parent / "data" / "oui.txt"
+# Shipped with nmap, which the Docker image installs
+NMAP_PREFIXES = Path("/usr/share/nmap/nmap-mac-prefixes")
+
+# MA-L (24-bit), MA-M (28-bit) and MA-S (36-bit) assignments
+IEEE_REGISTRIES = (
+    "https://standards-oui.ieee.org/oui/oui.csv",
+    "https://standards-oui.ieee.org/oui28/mam.csv",
+    "https://standards-oui.ieee.org/oui36/oui36.csv",
+)
+
+
+def _mac_to_int(mac: str) -> Optional[int]:
+    """Converts a MAC address with ':' or '-' separators to a 48-bit integer, or None if it is not one."""
+    digits = mac.replace(':', '').replace('-', '')
+    if len(digits) != 12:
+        return None
+    try:
+        return int(digits, 16)
+    except ValueError:
+        return None
+
+
+def is_locally_administered(mac: str) -> bool:
+    """
+    Returns True if a MAC address is locally administered rather than assigned by a vendor.
+
+    Phones and computers use such addresses when MAC randomization (private
+    Wi-Fi addresses) is enabled, so they have no vendor and may change.
+    """
+    value = _mac_to_int(mac)
+    return value is not None and bool(value >> 40 & 0x02)
+
+
+class OuiDatabase:
+    """
+    Maps MAC addresses to the vendor they were assigned to.
+
+    Prefixes of 24 (MA-L), 28 (MA-M) and 36 (MA-S) bits are supported, and
+    the longest matching prefix wins, since a MA-M or MA-S block is carved
+    out of a MA-L block registered to the IEEE itself. Each prefix length
+    is held as a sorted array of prefixes with a parallel array of indexes
+    into a list of distinct vendor names, and looked up by binary search.
+    """
+    def __init__(self):
+        self._pending = {}  # (bits, prefix) -> vendor, until the tables are built
+        self._tables = []  # (bits, prefixes, vendor indexes), longest prefix first
+        self._vendors = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_files(cls, paths: Iterable[Path]) -> "OuiDatabase":
+        """Loads every existing file in `paths`. Later files override earlier ones."""
+        database = cls()
+        for path in paths:
+            if Path(path).exists():
+                database.load_file(path)
+        return database
+
+    def add(self, prefix: str, vendor: str):
+        """Adds an assignment given as 6, 7 or 9 hex digits (with optional separators)."""
+        digits = prefix.replace(':', '').replace('-', '').upper()
+        with self._lock:
+            self._pending[(len(digits) * 4, int(digits, 16))] = vendor
+            self._tables = None
+
+    def load_file(self, path: Path) -> int:
+        """
+        Loads a prefix file with one "PREFIX Vendor name" entry per line.
+
+        This is the format of nmap's nmap-mac-prefixes and of the file
+        written by `update`. Lines starting with '#' are ignored.
+
+        Returns:
+            The number of entries loaded.
+        """
+        count = 0
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                prefix, _, vendor = line.strip().partition(' ')
+                if not prefix or prefix.startswith('#') or len(prefix) not in (6, 7, 9):
+                    continue
+                try:
+                    self.add(prefix, vendor.strip())
+                except ValueError:
+                    continue
+                count += 1
+        logging.info(f"Loaded {count} vendor prefixes from {path}")
+        return count
+
+    def _build(self):
+        """Freezes the added entries into sorted arrays. The caller must hold the lock."""
+        vendor_ids = {}
+        by_bits = {}
+        for (bits, prefix), vendor in sorted(self._pending.items()):
+            vendor_id = vendor_ids.setdefault(vendor, len(vendor_ids))
+            prefixes, ids = by_bits.setdefault(bits, (array('Q'), array('I')))
+            prefixes.append(prefix)
+            ids.append(vendor_id)
+        self._vendors = list(vendor_ids)
+        self._tables = [(bits, *by_bits[bits]) for bits in sorted(by_bits, reverse=True)]
+
+    def lookup(self, mac: str) -> Optional[str]:
+        """Returns the vendor a MAC address was assigned to, or None if it is unknown."""
+        value = _mac_to_int(mac)
+        # Vendor-assigned addresses have the multicast and locally administered bits clear.
+        if value is None or value >> 40 & 0x03:
+            return None
+        tables = self._tables
+        if tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self._build()
+                tables = self._tables
+        for bits, prefixes, ids in tables:
+            prefix = value >> (48 - bits)
+            i = bisect_left(prefixes, prefix)
+            if i < len(prefixes) and prefixes[i] == prefix:
+                return self._vendors[ids[i]]
+        return None
+
+    def __len__(self):
+        return len(self._pending)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_database() -> OuiDatabase:
+    """Returns the database loaded from nmap's prefixes and the bundled IEEE data file, loading it on first use."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                database = OuiDatabase.from_files([NMAP_PREFIXES, DATA_FILE])
+                if not len(database):
+                    logging.warning(f"No MAC vendor prefixes found; run 'python -m pingpoint.oui' to download them to {DATA_FILE}")
+                _default = database
+    return _default
+
+
+def lookup_vendor(mac: str) -> Optional[str]:
+    """Returns the vendor of a MAC address from the default database, or None if it is unknown."""
+    return default_database().lookup(mac)
+
+
+def update(path: Path = DATA_FILE, urls: Iterable[str] = IEEE_REGISTRIES, timeout: float = 60) -> int:
+    """
+    Downloads the IEEE MA-L, MA-M and MA-S registries and writes them to `path`.
+
+    Returns:
+        The number of prefixes written.
+    """
+    entries = {}
+    for url in urls:
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        # Columns: Registry, Assignment, Organization Name, Organization Address
+        for row in csv.DictReader(response.text.splitlines()):
+            assignment = (row.get('Assignment') or '').strip()
+            vendor = ' '.join((row.get('Organization Name') or '').split())
+            if assignment and vendor:
+                entries[assignment.upper()] = vendor
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("# MAC vendor prefixes from the IEEE registries, written by 'python -m pingpoint.oui'\n")
+        for prefix in sorted(entries):
+            f.write(f"{prefix} {entries[prefix]}\n")
+    os.replace(temp_path, path)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the IEEE MAC vendor registries.")
+    parser.add_argument("--output", type=Path, default=DATA_FILE, help="The prefix file to write.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        count = update(args.output)
+    except requests.RequestException as e:
+        logging.error(f"Downloading the IEEE registries failed: {e}")
+        sys.exit(1)
+    logging.info(f"Wrote {count} vendor prefixes to {args.output}")
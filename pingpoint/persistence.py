@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, List
+
+from .events import event_mac
+
+
+class JournaledStore:
+    """
+    Persists devices as a compact snapshot plus a write-ahead journal.
+
+    Each save appends only the devices that changed to the journal, so its
+    cost scales with the number of changes rather than the inventory size.
+    The full snapshot is rewritten atomically (temp file plus rename) when the
+    journal grows too large or the snapshot interval has passed, after which
+    the journal is truncated. Loading replays the journal over the snapshot.
+
+    The snapshot uses the same format as the original devices.json, so
+    existing inventories load without migration.
+    """
+    def __init__(self, snapshot_path: Path, journal_path: Optional[Path] = None,
+                 snapshot_interval: float = 600, max_journal_bytes: int = 4 * 1024 * 1024):
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = Path(journal_path) if journal_path else Path(f"{snapshot_path}.journal")
+        self.snapshot_interval = snapshot_interval
+        self.max_journal_bytes = max_journal_bytes
+        try:
+            self._last_snapshot = self.snapshot_path.stat().st_mtime
+        except FileNotFoundError:
+            self._last_snapshot = time.time()
+
+    def load(self) -> Dict[str, dict]:
+        """
+        Loads the snapshot and replays the journal over it.
+
+        Returns:
+            A dictionary of device dictionaries keyed by MAC address.
+        """
+        devices = {}
+        try:
+            with open(self.snapshot_path, "r") as f:
+                devices = {dev['mac']: dev for dev in json.load(f)}
+        except FileNotFoundError:
+            # It's okay if the file doesn't exist on first run
+            pass
+
+        replayed = 0
+        try:
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash can leave a partial last line behind.
+                        logging.warning(f"Ignoring incomplete journal record in {self.journal_path}")
+                        break
+                    if record['op'] == 'put':
+                        devices[record['device']['mac']] = record['device']
+                    elif record['op'] == 'delete':
+                        devices.pop(record['mac'], None)
+                    replayed += 1
+        except FileNotFoundError:
+            pass
+        if replayed:
+            logging.info(f"Replayed {replayed} journal records from {self.journal_path}")
+        return devices
+
+    def write(self, changed: Iterable[dict], removed: Iterable[str] = ()):
+        """Appends changed and removed devices to the journal and syncs it to disk."""
+        lines = [json.dumps({'op': 'put', 'device': device}, separators=(',', ':')) for device in changed]
+        lines.extend(json.dumps({'op': 'delete', 'mac': mac}) for mac in removed)
+        if not lines:
+            return
+        with open(self.journal_path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def snapshot_due(self) -> bool:
+        """Returns True if the journal should be folded into a new snapshot."""
+        if time.time() - self._last_snapshot >= self.snapshot_interval:
+            return True
+        try:
+            return self.journal_path.stat().st_size >= self.max_journal_bytes
+        except FileNotFoundError:
+            return False
+
+    def snapshot(self, devices: Iterable[dict]):
+        """Atomically writes a full snapshot and truncates the journal."""
+        temp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(list(devices), f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        # Replaying the journal over the new snapshot is harmless, so a crash
+        # between the rename and the truncation loses nothing.
+        with open(self.journal_path, "w"):
+            pass
+        self._last_snapshot = time.time()
+
+
+class SQLiteStore:
+    """
+    Persists devices and events in a SQLite database.
+
+    This is an alternative to `JournaledStore` with the same interface, and
+    it can also stand in for `EventLog` as the durable event history. The
+    database runs in WAL mode. Each save is a single transaction. Devices
+    are stored as JSON documents keyed by MAC address and only ever loaded
+    whole; the inventory answers filtered queries from its own in-memory
+    indexes. Events are indexed by time, MAC address and type for queries
+    that reach past the in-memory window.
+
+    On first start, an existing JSON inventory at `legacy_json` is imported.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS devices (
+            mac TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            timestamp REAL NOT NULL,
+            type TEXT NOT NULL,
+            mac TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_events_mac ON events (mac, id);
+        CREATE INDEX IF NOT EXISTS idx_events_type ON events (type, id);
+    """
+
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None, snapshot_interval: float = 600):
+        self.path = Path(path)
+        self.snapshot_interval = snapshot_interval
+        self._last_snapshot = time.time()
+        self._lock = threading.Lock()
+        self._pending_events = []  # Event rows waiting for the next flush
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        if legacy_json is not None:
+            self._migrate(Path(legacy_json))
+
+    def _migrate(self, legacy_json: Path):
+        """Imports a JSON inventory if the database has no devices yet."""
+        if not legacy_json.exists() or self._conn.execute("SELECT 1 FROM devices LIMIT 1").fetchone():
+            return
+        devices = JournaledStore(legacy_json).load()
+        self.write(devices.values())
+        logging.info(f"Migrated {len(devices)} devices from {legacy_json} to {self.path}")
+
+    def load(self) -> Dict[str, dict]:
+        """Returns all stored devices as dictionaries keyed by MAC address."""
+        with self._lock:
+            rows = self._conn.execute("SELECT mac, data FROM devices").fetchall()
+        return {mac: json.loads(data) for mac, data in rows}
+
+    def write(self, changed: Iterable[dict], removed: Iterable[str] = ()):
+        """Upserts changed devices and deletes removed ones in a single transaction."""
+        rows = [(device['mac'], json.dumps(device, separators=(',', ':'))) for device in changed]
+        removed = [(mac,) for mac in removed]
+        if not rows and not removed:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO devices (mac, data) VALUES (?, ?) ON CONFLICT (mac) DO UPDATE SET data = excluded.data",
+                rows
+            )
+            self._conn.executemany("DELETE FROM devices WHERE mac = ?", removed)
+
+    def snapshot_due(self) -> bool:
+        """Returns True if fields that are not written on every change (last_seen) should be synced."""
+        return time.time() - self._last_snapshot >= self.snapshot_interval
+
+    def snapshot(self, devices: Iterable[dict]):
+        """Writes every device and checkpoints the WAL into the main database file."""
+        self.write(devices)
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._last_snapshot = time.time()
+
+    # The methods below implement the EventLog interface.
+
+    def append(self, event: dict):
+        """
+        Queues an event to be stored by the next `flush`. The event must have an 'id'.
+
+        A scan can add many events at once, so they are written in one
+        transaction per inventory update rather than one per event.
+        """
+        row = (
+            event['id'],
+            datetime.fromisoformat(event['timestamp']).timestamp(),
+            event['type'],
+            event_mac(event),
+            json.dumps(event, separators=(',', ':')),
+        )
+        with self._lock:
+            self._pending_events.append(row)
+
+    def flush(self):
+        """Stores the queued events in a single transaction."""
+        with self._lock:
+            rows, self._pending_events = self._pending_events, []
+            if not rows:
+                return
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO events (id, timestamp, type, mac, data) VALUES (?, ?, ?, ?, ?)", rows)
+            except sqlite3.Error:
+                # Keep them for the next flush
+                self._pending_events[:0] = rows
+                raise
+
+    def tail(self, count: int) -> List[dict]:
+        """Returns the most recent `count` events, oldest first."""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM events ORDER BY id DESC LIMIT ?", (count,)).fetchall()
+        return [json.loads(data) for (data,) in reversed(rows)]
+
+    def iter_reverse(self, before: Optional[int] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, mac: Optional[str] = None,
+                     event_type: Optional[str] = None, batch_size: int = 500):
+        """Yields stored events newest first, filtered in the database."""
+        self.flush()
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            clauses.append("timestamp <= ?")
+            params.append(until.timestamp())
+        if mac is not None:
+            clauses.append("mac = ?")
+            params.append(mac)
+        if event_type is not None:
+            clauses.append("type = ?")
+            params.append(event_type)
+        while True:
+            where = clauses + (["id < ?"] if before is not None else [])
+            sql = "SELECT id, data FROM events"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += " ORDER BY id DESC LIMIT ?"
+            with self._lock:
+                rows = self._conn.execute(sql, params + ([before] if before is not None else []) + [batch_size]).fetchall()
+            for _, data in rows:
+                yield json.loads(data)
+            if len(rows) < batch_size:
+                return
+            before = rows[-1][0]
+
+    def close(self):
+        """Stores any queued events and closes the database connection."""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+def create_store(storage_config: dict, persistence_file: Path, snapshot_interval: float = 600):
+    """
+    Creates the device store selected by the 'storage' section of config.yaml.
+
+    Args:
+        storage_config: The 'storage' configuration section. 'backend' is
+            'json' (the default) or 'sqlite'; 'path' sets the database file.
+        persistence_file: The JSON inventory file. The SQLite backend imports it on first start.
+        snapshot_interval: Seconds between full snapshots.
+    """
+    backend = storage_config.get('backend', 'json')
+    if backend == 'sqlite':
+        path = storage_config.get('path') or Path(persistence_file).with_name("pingpoint.db")
+        return SQLiteStore(path, legacy_json=persistence_file, snapshot_interval=snapshot_interval)
+    if backend != 'json':
+        raise ValueError(f"Unknown storage backend: {backend}")
+    return JournaledStore(persistence_file, snapshot_interval=snapshot_interval)
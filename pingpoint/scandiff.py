@@ -0,0 +1,68 @@
+from typing import Iterable, List, NamedTuple
+
+
+class ScanDelta(NamedTuple):
+    """The difference between a scan and the previous scan of the same source."""
+    added: List[dict]  # Hosts that were not in the previous scan
+    changed: List[dict]  # Hosts whose fields differ from the previous scan
+    unchanged: List[dict]  # Hosts exactly as in the previous scan
+    removed: List[str]  # MAC addresses that were in the previous scan only
+
+
+class ScanDiffer:
+    """
+    Compares each scan of a source with the one before it.
+
+    Only a hash of the fields the inventory uses (IP address, hostname,
+    subnet and vendor) is kept per MAC address, so the previous result costs
+    little memory. Other fields, such as a lease expiration, can change
+    without the host counting as changed. Hosts are normalized first: MAC
+    addresses are upper-cased, and hosts without one are dropped.
+
+    `diff` does not update the stored result; `commit` does, once the delta
+    has been applied. If applying it fails, the next scan is compared with
+    the last result that was applied, so nothing is lost.
+    """
+    def __init__(self):
+        self._previous = {}  # MAC address -> hash of its fields
+        self._pending = None
+
+    def diff(self, hosts: Iterable[dict]) -> ScanDelta:
+        """Compares a scan with the last committed one."""
+        delta = ScanDelta([], [], [], [])
+        current = {}
+        previous = self._previous
+        for host in hosts:
+            mac = host.get('mac')
+            if not mac:
+                continue
+            mac = mac.upper()
+            if mac != host['mac']:
+                host = {**host, 'mac': mac}
+            signature = hash((host.get('ip'), host.get('hostname'), host.get('subnet'), host.get('vendor')))
+            if mac in current:
+                # Reported twice in one scan; let the inventory apply both.
+                delta.changed.append(host)
+                continue
+            current[mac] = signature
+            old = previous.get(mac)
+            if old is None:
+                delta.added.append(host)
+            elif old != signature:
+                delta.changed.append(host)
+            else:
+                delta.unchanged.append(host)
+        delta.removed.extend(mac for mac in previous if mac not in current)
+        self._pending = current
+        return delta
+
+    def commit(self):
+        """Makes the scan last passed to `diff` the one the next scan is compared with."""
+        if self._pending is not None:
+            self._previous = self._pending
+            self._pending = None
+
+    def reset(self):
+        """Forgets the previous scan, so the next scan is applied in full."""
+        self._previous = {}
+        self._pending = None
@@ -1,16 +1,265 @@
+import io
+import time
+import queue
+import tempfile
 import paramiko
 import logging
+import ipaddress
+import threading
 import subprocess
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import xml.etree.ElementTree as ET
 from typing import Optional, List
 from .models import Fingerprint
+from .oui import lookup_vendor
+
+class _ProcessGroup:
+    """The nmap processes of one scan, so they can all be killed if the scan is abandoned."""
+    def __init__(self):
+        self._processes = set()
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def add(self, process):
+        """Tracks a started process. It is killed at once if the group was already closed."""
+        with self._lock:
+            if not self.closed:
+                self._processes.add(process)
+                return
+        process.kill()
+
+    def discard(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+    def close(self):
+        """Kills every running process and any that are started later."""
+        with self._lock:
+            self.closed = True
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+
+@contextmanager
+def _nmap_output(command, timeout, group: Optional[_ProcessGroup] = None):
+    """
+    Starts an nmap process and yields its stdout pipe for incremental parsing.
+
+    The process is killed if it runs longer than `timeout` seconds. On exit the
+    pipe is drained and the exit status checked, mirroring `subprocess.run(check=True)`.
+    Stderr goes to a temporary file rather than a pipe, since it is only read
+    at the end and a full pipe would stall nmap. The process is added to
+    `group`, if given, while it runs.
+
+    Raises:
+        subprocess.TimeoutExpired: If the process had to be killed.
+        subprocess.CalledProcessError: If nmap exited with a non-zero status.
+    """
+    stderr_file = tempfile.TemporaryFile()
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+    except BaseException:
+        stderr_file.close()
+        raise
+    if group is not None:
+        group.add(process)
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.daemon = True
+    timer.start()
+    try:
+        try:
+            yield process.stdout
+            process.stdout.read()
+        except ET.ParseError as e:
+            # A killed process leaves truncated XML behind, and a failed one none at all.
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(command, timeout) from e
+            returncode = process.wait()
+            if returncode != 0:
+                stderr_file.seek(0)
+                raise subprocess.CalledProcessError(returncode, command,
+                                                    stderr=stderr_file.read().decode(errors='replace')) from e
+            raise
+        returncode = process.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        if group is not None:
+            group.discard(process)
+        process.stdout.close()
+        stderr_file.close()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(command, timeout)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, stderr=stderr.decode(errors='replace'))
+
 
 class NmapScanner:
     """
     A scanner that uses Nmap to find devices on the network.
+
+    Large subnets can be split into shards (e.g. /24 blocks of a /16) which are
+    swept concurrently by a bounded pool of nmap workers. Nmap's XML output is
+    parsed as it is produced, so hosts are available before a sweep finishes.
     """
-    def __init__(self, subnets):
+    # Hosts found by the workers but not yet consumed from scan_iter
+    QUEUE_SIZE = 1024
+
+    def __init__(self, subnets, max_workers: int = 1, shard_prefix: Optional[int] = None, shard_timeout: int = 300):
         self.subnets = subnets
+        self.max_workers = max(1, max_workers)
+        self.shard_prefix = shard_prefix
+        self.shard_timeout = shard_timeout
+
+    @classmethod
+    def from_config(cls, config: dict, subnets: Optional[List[str]] = None):
+        """
+        Creates a scanner using the 'nmap' section of the application configuration.
+
+        Args:
+            config: The application configuration dictionary.
+            subnets: The subnets to scan. Defaults to the configured 'subnets'.
+        """
+        nmap_config = config.get('nmap') or {}
+        return cls(
+            subnets=subnets if subnets is not None else config['subnets'],
+            max_workers=nmap_config.get('workers', 1),
+            shard_prefix=nmap_config.get('shard_prefix'),
+            shard_timeout=nmap_config.get('shard_timeout', 300)
+        )
+
+    def _shards(self):
+        """
+        Splits the configured subnets into (shard, subnet) pairs.
+
+        Subnets that are already smaller than the shard size, or that are not
+        valid CIDR notation (e.g. nmap ranges like 10.0.0.1-50), are scanned whole.
+        """
+        shards = []
+        for subnet in self.subnets:
+            try:
+                network = ipaddress.ip_network(subnet, strict=False)
+            except ValueError:
+                shards.append((subnet, subnet))
+                continue
+            if self.shard_prefix is None or network.prefixlen >= self.shard_prefix:
+                shards.append((subnet, subnet))
+            else:
+                shards.extend((str(shard), subnet) for shard in network.subnets(new_prefix=self.shard_prefix))
+        return shards
+
+    def _scan_shard(self, shard, subnet, on_host, group: Optional[_ProcessGroup] = None):
+        """Runs a ping sweep of a single shard, passing each host found to `on_host`."""
+        # -sn: Ping Scan - disables port scan
+        # --privileged: Assume user has privileges
+        # -oX -: Output scan in XML format to stdout
+        command = ["nmap", "-sn", "--privileged", "-oX", "-", shard]
+        with _nmap_output(command, self.shard_timeout, group) as stdout:
+            for host in self._iter_hosts(stdout, subnet):
+                on_host(host)
+
+    def scan_iter(self):
+        """
+        Runs an Nmap scan across the configured subnets, yielding hosts as they are found.
+
+        Shards are scanned by up to `max_workers` concurrent nmap processes. A
+        failed or timed-out shard is logged and skipped, so the hosts found in
+        the remaining shards are still returned.
+
+        Workers wait while `QUEUE_SIZE` hosts are queued but not yet consumed.
+        If the generator is closed before the scan finishes, the nmap
+        processes still running are killed.
+
+        Yields:
+            Dictionaries with 'ip', 'mac', 'vendor' and 'subnet' keys. Hosts are
+            deduplicated by MAC address.
+        """
+        shards = self._shards()
+        logging.info(f"Starting Nmap scan for subnets: {', '.join(self.subnets)} "
+                     f"({len(shards)} shards, {self.max_workers} workers)")
+
+        # Workers put ('host', host) items on the queue as nmap reports them,
+        # followed by a single ('done', (shard, exception)) item per shard.
+        items = queue.Queue(maxsize=self.QUEUE_SIZE)
+        group = _ProcessGroup()
+
+        def put(item):
+            # Waits for the consumer, unless it has abandoned the scan.
+            while not group.closed:
+                try:
+                    items.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def run_shard(shard, subnet):
+            if group.closed:
+                return
+            try:
+                self._scan_shard(shard, subnet, lambda host: put(('host', host)), group)
+                put(('done', (shard, None)))
+            except BaseException as e:
+                put(('done', (shard, e)))
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = [executor.submit(run_shard, shard, subnet) for shard, subnet in shards]
+        try:
+            seen_macs = set()
+            found = 0
+            failed_shards = 0
+            remaining = len(shards)
+            while remaining:
+                kind, payload = items.get()
+                if kind == 'host':
+                    if payload['mac']:
+                        mac_upper = payload['mac'].upper()
+                        if mac_upper in seen_macs:
+                            continue
+                        seen_macs.add(mac_upper)
+                    found += 1
+                    yield payload
+                    continue
+
+                remaining -= 1
+                shard, error = payload
+                if error is None:
+                    continue
+                if isinstance(error, FileNotFoundError):
+                    logging.error("Nmap command not found. Please ensure Nmap is installed and in your system's PATH.")
+                    raise error
+                failed_shards += 1
+                if isinstance(error, subprocess.TimeoutExpired):
+                    logging.error(f"Nmap scan for {shard} timed out after {self.shard_timeout} seconds.")
+                elif isinstance(error, subprocess.CalledProcessError):
+                    logging.error(f"Nmap scan for {shard} failed: {error.stderr}")
+                else:
+                    logging.error(f"An unexpected error occurred during Nmap scan for {shard}: {error}")
+        finally:
+            group.close()
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+        if failed_shards:
+            logging.warning(f"Nmap scan finished with {failed_shards} of {len(shards)} shards failing. "
+                            f"Returning partial results.")
+        logging.info(f"Nmap scan finished. Found {found} hosts.")
 
     def scan(self):
         """
@@ -20,75 +269,89 @@ class NmapScanner:
             A list of dictionaries, where each dictionary represents a host
             and contains 'ip', 'mac', and 'vendor' keys.
         """
-        logging.info(f"Starting Nmap scan for subnets: {', '.join(self.subnets)}")
-        results = []
-        for subnet in self.subnets:
-            try:
-                # -sn: Ping Scan - disables port scan
-                # --privileged: Assume user has privileges
-                # -oX -: Output scan in XML format to stdout
-                command = ["nmap", "-sn", "--privileged", "-oX", "-", subnet]
-                process = subprocess.run(
-                    command,
-                    check=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=300 # 5 minutes timeout
-                )
-                results.extend(self._parse_xml(process.stdout, subnet))
-            except FileNotFoundError:
-                logging.error("Nmap command not found. Please ensure Nmap is installed and in your system's PATH.")
-                raise
-            except subprocess.CalledProcessError as e:
-                logging.error(f"Nmap scan for {subnet} failed: {e.stderr}")
-                continue # Continue to the next subnet
-            except Exception as e:
-                logging.error(f"An unexpected error occurred during Nmap scan for {subnet}: {e}")
-                continue
+        return list(self.scan_iter())
 
-        logging.info(f"Nmap scan finished. Found {len(results)} hosts.")
-        return results
+    def _iter_hosts(self, stream, subnet):
+        """
+        Incrementally parses Nmap XML from a binary stream, yielding hosts that are up.
 
-    def _parse_xml(self, xml_output, subnet):
-        """Parses the XML output from Nmap."""
-        hosts = []
-        root = ET.fromstring(xml_output)
-        for host in root.findall('host'):
-            status = host.find('status')
+        Each <host> element is discarded once it has been read, so memory use
+        does not grow with the size of the sweep.
+        """
+        root = None
+        for event, elem in ET.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag != 'host':
+                continue
+            status = elem.find('status')
             if status is not None and status.get('state') == 'up':
-                ip_addr = host.find('address[@addrtype="ipv4"]').get('addr')
-                mac_addr_element = host.find('address[@addrtype="mac"]')
+                ip_addr = elem.find('address[@addrtype="ipv4"]').get('addr')
+                mac_addr_element = elem.find('address[@addrtype="mac"]')
                 mac_addr = mac_addr_element.get('addr') if mac_addr_element is not None else None
                 vendor = mac_addr_element.get('vendor') if mac_addr_element is not None else None
-                hosts.append({'ip': ip_addr, 'mac': mac_addr, 'vendor': vendor, 'subnet': subnet})
-        return hosts
+                if vendor is None and mac_addr:
+                    vendor = lookup_vendor(mac_addr)
+                yield {'ip': ip_addr, 'mac': mac_addr, 'vendor': vendor, 'subnet': subnet}
+            # Completed hosts are the only children of <nmaprun> held so far.
+            root.clear()
+
+    def _parse_xml(self, xml_output, subnet):
+        """Parses the XML output from Nmap."""
+        return list(self._iter_hosts(io.BytesIO(xml_output.encode()), subnet))
+
+    def quick_fingerprint(self, ip_address: str, top_ports: int = 100, timeout: int = 60) -> Optional[Fingerprint]:
+        """
+        Performs a fast service probe of the most common ports on a single IP.
+
+        This is the first tier of fingerprinting: it usually finishes in seconds
+        and is enough to classify most devices. It does not attempt OS detection.
 
-    def scan_for_fingerprint(self, ip_address: str) -> Optional[Fingerprint]:
+        Args:
+            ip_address: The IP address of the device to scan.
+            top_ports: The number of most common ports to probe.
+            timeout: The time budget for the scan, in seconds.
+
+        Returns:
+            A Fingerprint object, or None if the scan fails or the host is down.
+        """
+        # -sV --version-light: Lightweight service/version detection
+        # --top-ports: Only probe the N most common ports
+        command = ["nmap", "-sV", "--version-light", "--top-ports", str(top_ports), "-oX", "-", ip_address]
+        return self._run_fingerprint(command, ip_address, timeout, "quick")
+
+    def scan_for_fingerprint(self, ip_address: str, timeout: int = 600) -> Optional[Fingerprint]:
         """
         Performs a detailed Nmap scan on a single IP to create a device fingerprint.
 
         Args:
             ip_address: The IP address of the device to scan.
+            timeout: The time budget for the scan, in seconds.
 
         Returns:
             A Fingerprint object, or None if the scan fails or the host is down.
         """
-        logging.info(f"Starting fingerprint scan for IP: {ip_address}")
+        # -A: Enable OS detection, version detection, script scanning, and traceroute
+        command = ["nmap", "-A", "-oX", "-", ip_address]
+        return self._run_fingerprint(command, ip_address, timeout, "deep")
+
+    def _run_fingerprint(self, command: List[str], ip_address: str, timeout: int, tier: str) -> Optional[Fingerprint]:
+        """Runs a fingerprint scan command and parses its XML output."""
+        logging.info(f"Starting {tier} fingerprint scan for IP: {ip_address}")
         try:
-            # -A: Enable OS detection, version detection, script scanning, and traceroute
-            # -oX -: Output scan in XML format to stdout
-            command = ["nmap", "-A", "-oX", "-", ip_address]
-            process = subprocess.run(
-                command,
-                check=True,
-                capture_output=True,
-                text=True,
-                timeout=600  # 10 minutes timeout for aggressive scan
-            )
-            return self._parse_fingerprint_xml(process.stdout)
+            with _nmap_output(command, timeout) as stdout:
+                fingerprint = self._parse_fingerprint_stream(stdout)
+            if fingerprint is not None:
+                fingerprint.tier = tier
+            return fingerprint
         except FileNotFoundError:
             logging.error("Nmap command not found. Please ensure Nmap is installed and in your system's PATH.")
             raise
+        except subprocess.TimeoutExpired:
+            logging.error(f"Nmap {tier} fingerprint scan for {ip_address} timed out after {timeout} seconds.")
+            return None
         except subprocess.CalledProcessError as e:
             logging.error(f"Nmap fingerprint scan for {ip_address} failed: {e.stderr}")
             return None
@@ -99,10 +362,21 @@ class NmapScanner:
     def _parse_fingerprint_xml(self, xml_output: str) -> Optional[Fingerprint]:
         """Parses the XML output from a detailed Nmap scan into a Fingerprint object."""
         try:
-            root = ET.fromstring(xml_output)
-            host = root.find('host')
-            if host is None or host.find('status').get('state') != 'up':
-                return None
+            return self._parse_fingerprint_stream(io.BytesIO(xml_output.encode()))
+        except ET.ParseError as e:
+            logging.error(f"Failed to parse Nmap fingerprint XML: {e}")
+            return None
+
+    def _parse_fingerprint_stream(self, stream) -> Optional[Fingerprint]:
+        """Incrementally parses detailed Nmap XML from a binary stream into a Fingerprint object."""
+        fingerprint = None
+        for _, host in ET.iterparse(stream):
+            if host.tag != 'host' or fingerprint is not None:
+                continue
+            if host.find('status').get('state') != 'up':
+                # Only the first host is of interest; keep draining the stream.
+                fingerprint = False
+                continue
 
             fingerprint = Fingerprint()
 
@@ -120,6 +394,7 @@ class NmapScanner:
             # Get open ports and services
             ports_elem = host.find('ports')
             if ports_elem is not None:
+                ports = []
                 for port in ports_elem.findall('port'):
                     if port.find('state').get('state') == 'open':
                         service = port.find('service')
@@ -130,51 +405,108 @@ class NmapScanner:
                             'product': service.get('product') if service is not None else None,
                             'version': service.get('version') if service is not None else None,
                         }
-                        fingerprint.ports.append(port_info)
-            
-            return fingerprint
-        except ET.ParseError as e:
-            logging.error(f"Failed to parse Nmap fingerprint XML: {e}")
-            return None
+                        ports.append(port_info)
+                fingerprint.ports = ports
+            host.clear()
 
+        return fingerprint or None
 
 import re
 
+_MAC_PATTERN = re.compile(r"^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$")
+# The first IP address and the first MAC address after it on a line. Any
+# columns may come before the MAC address, so 'show arp', /proc/net/arp and
+# 'arp -a' ("? (192.168.1.1) at 00:11:...") all match. Incomplete entries
+# in 'arp -a' show no MAC address and do not match, but those in 'show arp'
+# and /proc/net/arp (flags 0x0) show an all-zero one, which the parsers skip.
+_INCOMPLETE_MAC = '00:00:00:00:00:00'
+_ARP_ENTRY = re.compile(
+    r"^(?:[^\n]*?[^\d.\n])??(\d{1,3}(?:\.\d{1,3}){3})\b(?:[^\n]*?[ \t])?([0-9A-Fa-f]{2}(?::[0-9A-Fa-f]{2}){5})(?![\w:])",
+    re.MULTILINE
+)
+# IP, MAC, expiration (a date and time), pool and the rest of the line, the
+# client name, which may contain spaces or be empty ('show dhcp leases')
+_LEASE_ENTRY = re.compile(
+    r"^(\d{1,3}(?:\.\d{1,3}){3})[ \t]+([0-9A-Fa-f]{2}(?::[0-9A-Fa-f]{2}){5})[ \t]+"
+    r"(\d{4}/\d{2}/\d{2}[ \t]+\d{2}:\d{2}:\d{2}|\S+)[ \t]+(\S+)[ \t]*([^\n]*)",
+    re.MULTILINE
+)
+
 def is_valid_mac(mac):
     """Checks if a string is a valid MAC address."""
-    return re.match(r"^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$", mac)
+    return _MAC_PATTERN.match(mac)
+
+def _lease_expiry(value):
+    """Converts a lease expiration such as '2025/06/23 04:14:37' to ISO 8601, or None if it is not a date."""
+    if len(value) < 19 or value[4] != '/':
+        return None
+    return value[:10].replace('/', '-') + 'T' + value[-8:]
 
 def parse_edgemax_arp(arp_data):
     """Parses the output of 'show arp' from an EdgeMax router."""
-    devices = []
-    # Regex to capture IP and MAC, allowing for variable spacing
-    arp_pattern = re.compile(r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\s+.*\s+([0-9a-fA-F:]{17})')
-    lines = arp_data.strip().split('\n')
-    for line in lines:
-        match = arp_pattern.search(line)
-        if match:
-            ip, mac = match.groups()
-            if is_valid_mac(mac):
-                devices.append({'ip': ip, 'mac': mac, 'vendor': None})
-    return devices
+    return [{'ip': ip, 'mac': mac, 'vendor': lookup_vendor(mac)} for ip, mac in _ARP_ENTRY.findall(arp_data)
+            if mac != _INCOMPLETE_MAC]
 
 def parse_edgemax_leases(leases_data):
     """Parses the output of 'show dhcp leases' from an EdgeMax router."""
     devices = []
-    lines = leases_data.strip().split('\n')[1:]  # Skip header
-    for line in lines:
-        parts = line.split()
-        if len(parts) >= 5:
-            ip = parts[0]
-            mac = parts[1]
-            subnet = parts[4]
-            if is_valid_mac(mac):
-                # The client name can be '?' or contain spaces.
-                hostname = ' '.join(parts[5:]) if parts[5] != '?' else None
-                
-                devices.append({'ip': ip, 'mac': mac, 'hostname': hostname, 'subnet': subnet, 'vendor': None})
+    for ip, mac, expiry, pool, client_name in _LEASE_ENTRY.findall(leases_data):
+        # The client name can be '?' or contain spaces.
+        client_name = client_name.rstrip()
+        hostname = client_name if client_name and client_name != '?' else None
+        devices.append({'ip': ip, 'mac': mac, 'hostname': hostname, 'subnet': pool,
+                        'lease_expires': _lease_expiry(expiry), 'vendor': lookup_vendor(mac)})
     return devices
 
+def parse_edgemax_collection(arp_data, leases_data):
+    """
+    Parses the ARP table and DHCP leases of an EdgeMax router into one record per device.
+
+    Each output is read in a single pass of a precompiled pattern, and the
+    entries for a MAC address are merged: the IP address comes from the ARP
+    table, which reflects current traffic, and the hostname, pool and lease
+    expiration from the lease. Devices with only a lease are included.
+
+    Returns:
+        Dictionaries with 'ip', 'mac' (upper case), 'hostname', 'subnet'
+        (the DHCP pool), 'lease_expires' (ISO 8601) and 'vendor' keys.
+    """
+    devices = {}
+    for ip, mac in _ARP_ENTRY.findall(arp_data):
+        mac = mac.upper()
+        if mac not in devices and mac != _INCOMPLETE_MAC:
+            devices[mac] = {'ip': ip, 'mac': mac, 'hostname': None, 'subnet': None, 'lease_expires': None}
+    for ip, mac, expiry, pool, client_name in _LEASE_ENTRY.findall(leases_data):
+        mac = mac.upper()
+        device = devices.get(mac)
+        if device is None:
+            device = devices[mac] = {'ip': ip, 'mac': mac, 'hostname': None, 'subnet': None, 'lease_expires': None}
+        elif device['subnet'] is not None:
+            # A second lease for the same MAC; keep the first
+            continue
+        client_name = client_name.rstrip()
+        device['hostname'] = client_name if client_name and client_name != '?' else None
+        device['subnet'] = pool
+        device['lease_expires'] = _lease_expiry(expiry)
+    for mac, device in devices.items():
+        device['vendor'] = lookup_vendor(mac)
+    return list(devices.values())
+
+
+def get_routers(config):
+    """
+    Returns the EdgeMax routers to poll.
+
+    Routers are listed under 'routers'. A single 'edgemax' section is treated
+    as a one-router list, so existing configurations keep working.
+    """
+    routers = config.get('routers')
+    if routers:
+        return routers
+    if config.get('edgemax'):
+        return [config['edgemax']]
+    return []
+
 
 def scan_network(config):
     """
@@ -186,48 +518,36 @@ def scan_network(config):
     Returns:
         A list of discovered devices.
     """
-    try:
-        logging.info("Attempting primary scan method (EdgeMax SSH)...")
-        em_config = config['edgemax']
-        scanner = EdgeMaxScanner(
-            host=em_config['host'],
-            port=em_config['port'],
-            username=em_config['username'],
-            password=em_config['password']
-        )
-        return scanner.scan()
-
-    except Exception as e:
-        logging.warning(f"Primary scan method (EdgeMax) failed: {e}. Falling back to Nmap.")
-        nmap_scanner = NmapScanner(subnets=config['subnets'])
-        return nmap_scanner.scan()
+    return collection_engine.collect(config)
 
 
 class EdgeMaxScanner:
     """
     A scanner for Ubiquiti EdgeMax routers using SSH.
+
+    SSH sessions are kept open between scans and shared by all scanners that
+    connect to the same router, so a scan cycle does not pay for a new key
+    exchange and login. A dropped session is reopened transparently.
     """
+    # Use the vyatta-op-cmd-wrapper to execute operational commands.
+    WRAPPER = "/opt/vyatta/bin/vyatta-op-cmd-wrapper"
+    # Printed between the outputs of batched commands
+    DELIMITER = "----PINGPOINT-END-OF-OUTPUT----"
+    # Seconds between SSH keepalive packets on idle sessions
+    KEEPALIVE_INTERVAL = 30
+
+    # Open SSH clients, keyed by (host, port, username)
+    _sessions = {}
+    _sessions_lock = threading.Lock()
+
     def scan(self):
         """
         Performs a scan using the EdgeMax router and returns the parsed results.
         """
-        arp_data = self.get_arp_table()
-        leases_data = self.get_dhcp_leases()
-        self.close()
-
-        # Combine and deduplicate results
-        devices_by_mac = {}
-        parsed_arp = parse_edgemax_arp(arp_data)
-        parsed_leases = parse_edgemax_leases(leases_data)
-
-        for device in parsed_arp + parsed_leases:
-            if device['mac']:
-                mac_upper = device['mac'].upper()
-                if mac_upper not in devices_by_mac:
-                    devices_by_mac[mac_upper] = device
-        
-        logging.info(f"EdgeMax scan successful. Found {len(devices_by_mac)} unique devices.")
-        return list(devices_by_mac.values())
+        arp_data, leases_data = self.collect()
+        devices = parse_edgemax_collection(arp_data, leases_data)
+        logging.info(f"EdgeMax scan successful. Found {len(devices)} unique devices.")
+        return devices
     def __init__(self, host, port, username, password):
         self.host = host
         self.port = port
@@ -235,32 +555,89 @@ class EdgeMaxScanner:
         self.password = password
         self.ssh_client = None
 
+    @property
+    def _session_key(self):
+        return (self.host, self.port, self.username)
+
     def _connect(self):
-        """Establishes an SSH connection."""
-        if self.ssh_client is None:
+        """Attaches to the shared SSH session for this router, opening it if needed."""
+        with EdgeMaxScanner._sessions_lock:
+            client = EdgeMaxScanner._sessions.get(self._session_key)
+            if client is not None:
+                transport = client.get_transport()
+                if transport is not None and transport.is_active():
+                    self.ssh_client = client
+                    return
+                logging.info(f"SSH session to {self.host} is no longer active. Reconnecting...")
+                client.close()
+                del EdgeMaxScanner._sessions[self._session_key]
+
             try:
                 client = paramiko.SSHClient()
                 client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
                 logging.info(f"Connecting to EdgeMax router at {self.host}...")
                 client.connect(self.host, port=self.port, username=self.username, password=self.password, timeout=10)
-                self.ssh_client = client
+                client.get_transport().set_keepalive(self.KEEPALIVE_INTERVAL)
             except Exception as e:
                 logging.error(f"SSH connection failed: {e}")
                 raise
-
-    def _execute_command(self, command):
-        """Executes a command on the remote device."""
-        self._connect()
-        # Use the vyatta-op-cmd-wrapper to execute operational commands.
-        wrapper = "/opt/vyatta/bin/vyatta-op-cmd-wrapper"
-        full_command = f"{wrapper} {command}"
-        logging.info(f"Executing remote command: {full_command}")
-        stdin, stdout, stderr = self.ssh_client.exec_command(full_command)
+            EdgeMaxScanner._sessions[self._session_key] = client
+            self.ssh_client = client
+
+    def _run(self, full_command):
+        """Runs a command on the current session and returns its stdout."""
+        stdin, stdout, stderr = self.ssh_client.exec_command(full_command, timeout=60)
+        # Read before waiting for the exit status so a large output cannot fill the channel window.
+        output = stdout.read().decode()
         exit_status = stdout.channel.recv_exit_status()
         if exit_status != 0:
             error_message = stderr.read().decode().strip()
             raise IOError(f"Command '{full_command}' failed with exit status {exit_status}: {error_message}")
-        return stdout.read().decode().strip()
+        return output
+
+    def _execute(self, full_command):
+        """Executes a command, reconnecting and retrying once if the session has dropped."""
+        self._connect()
+        logging.info(f"Executing remote command: {full_command}")
+        try:
+            return self._run(full_command)
+        except (paramiko.SSHException, EOFError, OSError) as e:
+            transport = self.ssh_client.get_transport()
+            if transport is not None and transport.is_active():
+                # The command itself failed; the session is fine.
+                raise
+            logging.warning(f"SSH session to {self.host} failed ({e}). Reconnecting...")
+            self.close()
+            self._connect()
+            return self._run(full_command)
+
+    def _execute_command(self, command):
+        """Executes a command on the remote device."""
+        return self._execute(f"{self.WRAPPER} {command}").strip()
+
+    def _execute_batch(self, commands):
+        """
+        Executes several commands in a single remote invocation.
+
+        Returns:
+            A list with the output of each command, in order.
+        """
+        full_command = " && ".join(f"{self.WRAPPER} {command} && echo '{self.DELIMITER}'" for command in commands)
+        sections = self._execute(full_command).split(f"{self.DELIMITER}\n")
+        if len(sections) != len(commands) + 1:
+            raise IOError(f"Expected {len(commands)} outputs from the batched command, got {len(sections) - 1}")
+        return [section.strip() for section in sections[:-1]]
+
+    def collect(self):
+        """
+        Retrieves the ARP table and DHCP leases in a single round trip.
+
+        Returns:
+            A tuple of (arp_data, leases_data).
+        """
+        logging.info("Fetching ARP table and DHCP leases from EdgeMax router...")
+        arp_data, leases_data = self._execute_batch(["show arp", "show dhcp leases"])
+        return arp_data, leases_data
 
     def get_dhcp_leases(self):
         """Retrieves DHCP lease information."""
@@ -273,11 +650,205 @@ class EdgeMaxScanner:
         return self._execute_command("show arp")
 
     def close(self):
-        """Closes the SSH connection."""
-        if self.ssh_client:
-            self.ssh_client.close()
-            self.ssh_client = None
+        """Closes the SSH session to this router."""
+        with EdgeMaxScanner._sessions_lock:
+            client = EdgeMaxScanner._sessions.pop(self._session_key, None)
+        client = client or self.ssh_client
+        if client:
+            client.close()
             logging.info("SSH connection closed.")
+        self.ssh_client = None
+
+    @classmethod
+    def close_all(cls):
+        """Closes every open SSH session."""
+        with cls._sessions_lock:
+            clients = list(cls._sessions.values())
+            cls._sessions.clear()
+        for client in clients:
+            client.close()
+
+class _Poll:
+    """The state of one router's poll within a collection."""
+    def __init__(self):
+        self.started = threading.Event()
+        self.started_at = None
+        # Set while holding CollectionEngine._lock, so exactly one of them is set
+        self.finished = False  # The poll recorded its result
+        self.abandoned = False  # The collection stopped waiting for it
+
+    def start(self):
+        self.started_at = time.time()
+        self.started.set()
+
+
+class CollectionEngine:
+    """
+    Polls any number of EdgeMax routers concurrently and merges their results.
+
+    Each router is polled on its own worker thread with its own timeout,
+    counted from when a worker picks it up rather than from the start of the
+    collection, and its health is tracked across cycles. When a router fails,
+    only the subnets listed behind it are swept with Nmap instead.
+    """
+    def __init__(self, max_workers: int = 8, default_timeout: int = 60):
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self._health = {}  # Keyed by router name
+        self._lock = threading.Lock()
+
+    def collect(self, config, fallback: bool = True):
+        """
+        Collects devices from all configured routers, falling back to Nmap where needed.
+
+        Args:
+            config: The application configuration dictionary.
+            fallback: Whether to sweep the subnets of failed routers with Nmap.
+
+        Returns:
+            A list of discovered devices, deduplicated by MAC address.
+
+        Raises:
+            IOError: If fallback is disabled and no router could be polled.
+        """
+        routers = get_routers(config)
+        if not routers:
+            if not fallback:
+                raise IOError("No EdgeMax routers are configured.")
+            logging.info("No EdgeMax routers configured. Using Nmap.")
+            return NmapScanner.from_config(config).scan()
+
+        logging.info(f"Attempting primary scan method (EdgeMax SSH) on {len(routers)} router(s)...")
+        results = []
+        failed = []
+        executor = ThreadPoolExecutor(max_workers=min(len(routers), self.max_workers))
+        polls = [_Poll() for _ in routers]
+        futures = [executor.submit(self._poll, router, poll) for router, poll in zip(routers, polls)]
+        # A queued router waits for a worker, which is free by the time the
+        # slowest router ahead of it has timed out (unless its thread hangs).
+        start_timeout = max(router.get('timeout', self.default_timeout) for router in routers)
+        for router, future, poll in zip(routers, futures, polls):
+            timeout = router.get('timeout', self.default_timeout)
+            try:
+                results.extend(self._wait(future, poll, timeout, start_timeout))
+            except Exception as e:
+                self._record_failure(router, e)
+                logging.warning(f"Primary scan method (EdgeMax) failed for router {self._name(router)}: {e}.")
+                failed.append(router)
+        # Do not wait for routers that timed out; their threads finish on their own.
+        executor.shutdown(wait=False)
+
+        if failed and not fallback:
+            if len(failed) == len(routers):
+                raise IOError("All EdgeMax routers failed to respond.")
+        elif failed:
+            if all(router.get('subnets') for router in failed):
+                subnets = list(dict.fromkeys(subnet for router in failed for subnet in router['subnets']))
+                logging.warning(f"Falling back to Nmap for subnets behind failed routers: {', '.join(subnets)}")
+                results.extend(NmapScanner.from_config(config, subnets=subnets).scan())
+            else:
+                logging.warning("Falling back to Nmap for all configured subnets.")
+                results.extend(NmapScanner.from_config(config).scan())
+
+        return self._merge(results)
+
+    def health(self):
+        """Returns the health state of every router polled so far, keyed by router name."""
+        with self._lock:
+            return {name: dict(state) for name, state in self._health.items()}
+
+    def _name(self, router):
+        return router.get('name') or router['host']
+
+    def _wait(self, future, poll: _Poll, timeout: float, start_timeout: float):
+        """
+        Returns the devices from a poll, allowing it `timeout` seconds from when it started.
+
+        Raises:
+            TimeoutError: If the poll did not start within `start_timeout`
+                seconds or did not finish in time.
+        """
+        if poll.started.wait(start_timeout):
+            remaining = poll.started_at + timeout - time.time()
+            message = f"no response within {timeout} seconds"
+        else:
+            remaining = 0
+            message = f"not started within {start_timeout} seconds, since all workers were busy"
+        try:
+            return future.result(timeout=max(0, remaining))
+        except FutureTimeoutError:
+            with self._lock:
+                poll.abandoned = not poll.finished
+            if not poll.abandoned:
+                # It finished just as the timeout expired
+                return future.result()
+            future.cancel()
+            raise TimeoutError(message) from None
+
+    def _poll(self, router, poll: _Poll):
+        """Collects from a single router and records its health."""
+        poll.start()
+        started = poll.started_at
+        scanner = EdgeMaxScanner(
+            host=router['host'],
+            port=router.get('port', 22),
+            username=router['username'],
+            password=router.get('password')
+        )
+        devices = scanner.scan()
+        name = self._name(router)
+        for device in devices:
+            device['router'] = name
+        with self._lock:
+            if poll.abandoned:
+                # Its failure has been recorded and the collection has moved on.
+                logging.info(f"Ignoring a late response from router {name}.")
+                return devices
+            poll.finished = True
+            state = self._health.setdefault(name, {'host': router['host']})
+            state.update({
+                'status': 'ok',
+                'last_success': time.time(),
+                'last_duration_seconds': round(time.time() - started, 3),
+                'last_device_count': len(devices),
+                'consecutive_failures': 0,
+            })
+        return devices
+
+    def _record_failure(self, router, error):
+        with self._lock:
+            state = self._health.setdefault(self._name(router), {'host': router['host']})
+            state.update({
+                'status': 'failed',
+                'last_failure': time.time(),
+                'last_error': str(error),
+                'consecutive_failures': state.get('consecutive_failures', 0) + 1,
+            })
+
+    def _merge(self, results):
+        """Merges devices reported by several sources, filling in fields missing from the first report."""
+        devices_by_mac = {}
+        merged = []
+        for device in results:
+            if not device.get('mac'):
+                merged.append(device)
+                continue
+            mac_upper = device['mac'].upper()
+            existing = devices_by_mac.get(mac_upper)
+            if existing is None:
+                devices_by_mac[mac_upper] = device
+                merged.append(device)
+                continue
+            for key, value in device.items():
+                if existing.get(key) is None and value is not None:
+                    existing[key] = value
+        logging.info(f"Collection finished. Found {len(devices_by_mac)} unique devices.")
+        return merged
+
+
+# Shared engine used by scan_network, so router health persists across cycles
+collection_engine = CollectionEngine()
+
 
 # Example of how to use it:
 if __name__ == '__main__':
@@ -0,0 +1,19 @@
+import json
+from typing import Iterable
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder is used without it
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    """Encodes an object as compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, separators=(',', ':'), default=str).encode()
+
+
+def join_array(fragments: Iterable[bytes]) -> bytes:
+    """Assembles a JSON array from already encoded elements."""
+    return b"[" + b",".join(fragments) + b"]"
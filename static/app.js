@@ -28,23 +28,49 @@ document.addEventListener('DOMContentLoaded', () => {
     const scanStatus = document.getElementById('scan-status');
     let timeline = null; // To hold the timeline instance
 
+    const setScanButtonsDisabled = (disabled) => {
+        edgemaxBtn.disabled = disabled;
+        nmapBtn.disabled = disabled;
+    };
+
+    // Polls the scan status until the given scan finishes, then refreshes the dashboard.
+    const waitForScan = async (scanType) => {
+        try {
+            const response = await fetch('/api/scan/status');
+            const status = (await response.json())[scanType];
+            if (status && status.running) {
+                scanStatus.textContent = `${scanType} scan running: ${status.progress} devices processed...`;
+                setTimeout(() => waitForScan(scanType), 1000);
+                return;
+            }
+            if (status && status.last_error) {
+                scanStatus.textContent = `${scanType} scan failed: ${status.last_error}`;
+            } else if (status) {
+                scanStatus.textContent = `${scanType} scan finished in ${status.last_duration_seconds.toFixed(1)}s, found ${status.last_result_count} devices.`;
+            }
+            fetchData();
+        } catch (error) {
+            scanStatus.textContent = `Failed to get ${scanType} scan status.`;
+            console.error('Error fetching scan status:', error);
+        }
+        setScanButtonsDisabled(false);
+    };
+
     const triggerScan = async (scanType) => {
         scanStatus.textContent = `Initiating ${scanType} scan...`;
-        edgemaxBtn.disabled = true;
-        nmapBtn.disabled = true;
+        setScanButtonsDisabled(true);
         try {
             const response = await fetch(`/api/scan/${scanType}`, { method: 'POST' });
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
             const result = await response.json();
             scanStatus.textContent = result.message;
+            waitForScan(scanType);
         } catch (error) {
             scanStatus.textContent = `Failed to start ${scanType} scan.`;
             console.error(`Error triggering ${scanType} scan:`, error);
-        } finally {
-            // Re-enable buttons after a short delay
-            setTimeout(() => {
-                edgemaxBtn.disabled = false;
-                nmapBtn.disabled = false;
-            }, 2000);
+            setScanButtonsDisabled(false);
         }
     };
 
@@ -87,28 +113,37 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
-    const renderTimeline = (events) => {
-        const getClassName = (eventType) => {
-            switch (eventType) {
-                case 'device_joined': return 'new-device';
-                case 'device_reconnected': return 'returning-device';
-                case 'device_offline': return 'offline-device';
-                case 'device_ip_change': return 'ip-change-device';
-                default: return '';
-            }
-        };
+    const getClassName = (eventType) => {
+        switch (eventType) {
+            case 'device_joined': return 'new-device';
+            case 'device_reconnected': return 'returning-device';
+            case 'device_offline': return 'offline-device';
+            case 'device_ip_change': return 'ip-change-device';
+            default: return '';
+        }
+    };
+
+    const timelineItem = (event) => ({
+        id: event.id,
+        content: ``, // Keep content empty for a smaller icon-like appearance
+        start: event.timestamp,
+        title: `<b>${event.message}</b><br>
+                Device: ${event.device.friendly_name || event.device.mac}<br>
+                IP: ${event.device.ip_addresses.join(', ')}<br>
+                Time: ${new Date(event.timestamp).toLocaleString()}`,
+        className: getClassName(event.type),
+        type: 'point' // Use points for a cleaner look
+    });
 
-        const items = new vis.DataSet(events.map((event, index) => ({
-            id: index,
-            content: ``, // Keep content empty for a smaller icon-like appearance
-            start: event.timestamp,
-            title: `<b>${event.message}</b><br>
-                    Device: ${event.device.friendly_name || event.device.mac}<br>
-                    IP: ${event.device.ip_addresses.join(', ')}<br>
-                    Time: ${new Date(event.timestamp).toLocaleString()}`,
-            className: getClassName(event.type),
-            type: 'point' // Use points for a cleaner look
-        })));
+    // Adds a single pushed event to the timeline without redrawing it.
+    const addTimelineEvent = (event) => {
+        if (timeline) {
+            timeline.itemsData.update(timelineItem(event));
+        }
+    };
+
+    const renderTimeline = (events) => {
+        const items = new vis.DataSet(events.map(timelineItem));
 
         const options = {
             stack: false,
@@ -133,108 +168,211 @@ document.addEventListener('DOMContentLoaded', () => {
         timeline.fit();
     };
 
+    // Devices shown on the dashboard, keyed by MAC address, and the inventory
+    // change sequence they reflect. Each poll only fetches what changed since.
+    const devicesByMac = new Map();
+    let deviceSeq = 0;
+
     const fetchDevices = async () => {
         try {
-            const response = await fetch('/api/devices');
+            const response = await fetch(`/api/devices?since=${deviceSeq}`);
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
-            const devices = await response.json();
-            renderDeviceTable(devices);
+            const delta = await response.json();
+            if (delta.reset) {
+                devicesByMac.clear();
+                deviceTableBody.innerHTML = '';
+            }
+            delta.changed.forEach(device => devicesByMac.set(device.mac, device));
+            delta.removed.forEach(mac => devicesByMac.delete(mac));
+            deviceSeq = delta.seq;
+            applyDeviceChanges(delta.changed, delta.removed);
         } catch (error) {
             console.error("Failed to fetch devices:", error);
-            deviceTableBody.innerHTML = '<tr><td colspan="6">Failed to load devices.</td></tr>';
+            if (devicesByMac.size === 0) {
+                deviceTableBody.innerHTML = '<tr class="empty-row"><td colspan="13">Failed to load devices.</td></tr>';
+            }
         }
     };
 
-    const renderDeviceTable = (devices) => {
-        deviceTableBody.innerHTML = ''; // Clear existing rows
+    const findDeviceRow = (mac) => deviceTableBody.querySelector(`tr[data-mac="${mac}"]`);
 
-        if (devices.length === 0) {
-            deviceTableBody.innerHTML = '<tr><td colspan="9">No devices found.</td></tr>';
-            return;
-        }
+    const renderDeviceRow = (device) => {
+        const row = document.createElement('tr');
+        row.dataset.mac = device.mac;
+        row.dataset.subnet = device.subnet || 'Unknown Subnet';
+        row.dataset.status = device.status;
+        const statusClass = device.status === 'online' ? 'status-online' : 'status-offline';
 
-        // Group devices by subnet
-        const devicesBySubnet = devices.reduce((acc, device) => {
-            const subnet = device.subnet || 'Unknown Subnet';
-            if (!acc[subnet]) {
-                acc[subnet] = [];
+        row.innerHTML = `
+            <td><span class="status-dot ${statusClass}"></span> ${device.status}</td>
+            <td><input type="text" class="editable" data-field="friendly_name" value="${(device.friendly_name !== device.mac ? device.friendly_name : '') || ''}" placeholder="Add name..."></td>
+            <td>${device.hostname || 'N/A'}</td>
+            <td>${device.subnet || 'N/A'}</td>
+            <td>${device.mac}</td>
+            <td>${device.ip_addresses.join(', ') || 'N/A'}</td>
+            <td>${device.vendor || 'Unknown'}</td>
+            <td>${device.category || 'N/A'}</td>
+            <td><input type="text" class="editable" data-field="notes" value="${device.notes || ''}" placeholder="Add notes..."></td>
+            <td>
+                ${device.vulnerabilities ? 'Yes' : 'No'}
+            </td>
+            <td>${new Date(device.last_seen).toLocaleString()}</td>
+            <td><input type="checkbox" class="critical-checkbox" data-field="alert_on_offline" ${device.alert_on_offline ? 'checked' : ''}></td>
+            <td><button class="save-btn">Save</button></td>
+        `;
+        return row;
+    };
+
+    // Returns the header row of a subnet group, creating the group if needed.
+    const findSubnetHeader = (subnet) => {
+        const headers = deviceTableBody.querySelectorAll('tr.subnet-row');
+        for (const header of headers) {
+            if (header.dataset.subnet === subnet) {
+                return header;
             }
-            acc[subnet].push(device);
-            return acc;
-        }, {});
-
-        for (const subnet in devicesBySubnet) {
-            const subnetRow = document.createElement('tr');
-            subnetRow.innerHTML = `<td colspan="10" style="background-color: #e9ecef; font-weight: bold;">${subnet}</td>`;
-            deviceTableBody.appendChild(subnetRow);
-
-            const subnetDevices = devicesBySubnet[subnet];
-            // Sort devices within the subnet
-            subnetDevices.sort((a, b) => {
-                if (a.status === b.status) return 0;
-                return a.status === 'online' ? -1 : 1;
-            });
+        }
+        const header = document.createElement('tr');
+        header.className = 'subnet-row';
+        header.dataset.subnet = subnet;
+        header.innerHTML = `<td colspan="13" style="background-color: #e9ecef; font-weight: bold;">${subnet}</td>`;
+        deviceTableBody.appendChild(header);
+        return header;
+    };
 
-            subnetDevices.forEach(device => {
-                const row = document.createElement('tr');
-                row.dataset.mac = device.mac;
-                const statusClass = device.status === 'online' ? 'status-online' : 'status-offline';
-                
-                row.innerHTML = `
-                    <td><span class="status-dot ${statusClass}"></span> ${device.status}</td>
-                    <td><input type="text" class="editable" data-field="friendly_name" value="${(device.friendly_name !== device.mac ? device.friendly_name : '') || ''}" placeholder="Add name..."></td>
-                    <td>${device.hostname || 'N/A'}</td>
-                    <td>${device.subnet || 'N/A'}</td>
-                    <td>${device.mac}</td>
-                    <td>${device.ip_addresses.join(', ') || 'N/A'}</td>
-                    <td>${device.vendor || 'Unknown'}</td>
-                    <td>${device.category || 'N/A'}</td>
-                    <td><input type="text" class="editable" data-field="notes" value="${device.notes || ''}" placeholder="Add notes..."></td>
-                    <td>
-                        ${device.vulnerabilities ? 'Yes' : 'No'}
-                    </td>
-                    <td>${new Date(device.last_seen).toLocaleString()}</td>
-                    <td><input type="checkbox" class="critical-checkbox" data-field="alert_on_offline" ${device.alert_on_offline ? 'checked' : ''}></td>
-                    <td><button class="save-btn">Save</button></td>
-                `;
-                deviceTableBody.appendChild(row);
-            });
+    const subnetGroupRows = (header) => {
+        const rows = [];
+        for (let row = header.nextElementSibling; row && !row.classList.contains('subnet-row'); row = row.nextElementSibling) {
+            rows.push(row);
         }
+        return rows;
+    };
 
-        // Add event listeners for the new save buttons
-        document.querySelectorAll('.save-btn').forEach(button => {
-            button.addEventListener('click', (e) => {
-                const row = e.target.closest('tr');
-                const mac = row.dataset.mac;
-                const friendlyNameInput = row.querySelector('[data-field="friendly_name"]');
-                const notesInput = row.querySelector('[data-field="notes"]');
-                const criticalCheckbox = row.querySelector('[data-field="alert_on_offline"]');
-                updateDeviceDetails(mac, friendlyNameInput.value, notesInput.value, criticalCheckbox.checked);
-            });
+    // Online devices are listed before offline ones within a subnet.
+    const sortSubnetGroup = (header) => {
+        const rows = subnetGroupRows(header);
+        if (rows.length === 0) {
+            header.remove();
+            return;
+        }
+        const sorted = rows.filter(row => row.dataset.status === 'online')
+            .concat(rows.filter(row => row.dataset.status !== 'online'));
+        if (sorted.every((row, index) => row === rows[index])) {
+            return;
+        }
+        let previous = header;
+        sorted.forEach(row => {
+            previous.after(row);
+            previous = row;
         });
+    };
 
+    const applyDeviceChanges = (changed, removed) => {
+        const emptyRow = deviceTableBody.querySelector('.empty-row');
+        if (emptyRow) {
+            emptyRow.remove();
+        }
+        const touchedSubnets = new Set();
 
-        // Add focus/blur listeners for expanding input fields
-        document.querySelectorAll('#device-table-body input.editable').forEach(input => {
-            input.addEventListener('focus', (e) => {
-                e.target.classList.add('editing');
-            });
-            input.addEventListener('blur', (e) => {
-                e.target.classList.remove('editing');
-            });
+        removed.forEach(mac => {
+            const row = findDeviceRow(mac);
+            if (row) {
+                touchedSubnets.add(row.dataset.subnet);
+                row.remove();
+            }
+        });
+
+        changed.forEach(device => {
+            const existing = findDeviceRow(device.mac);
+            if (existing && existing.contains(document.activeElement)) {
+                // Do not discard an edit in progress; the row is redrawn when it loses focus.
+                existing.dataset.stale = 'true';
+                return;
+            }
+            const row = renderDeviceRow(device);
+            if (existing) {
+                touchedSubnets.add(existing.dataset.subnet);
+                existing.remove();
+            }
+            const header = findSubnetHeader(row.dataset.subnet);
+            const groupRows = subnetGroupRows(header);
+            (groupRows.length ? groupRows[groupRows.length - 1] : header).after(row);
+            touchedSubnets.add(row.dataset.subnet);
         });
+
+        touchedSubnets.forEach(subnet => sortSubnetGroup(findSubnetHeader(subnet)));
+
+        if (devicesByMac.size === 0) {
+            deviceTableBody.innerHTML = '<tr class="empty-row"><td colspan="13">No devices found.</td></tr>';
+        }
     };
 
+    // Listeners are attached once to the table body, so they cover rows added later.
+    deviceTableBody.addEventListener('click', (e) => {
+        if (!e.target.classList.contains('save-btn')) {
+            return;
+        }
+        const row = e.target.closest('tr');
+        const mac = row.dataset.mac;
+        const friendlyNameInput = row.querySelector('[data-field="friendly_name"]');
+        const notesInput = row.querySelector('[data-field="notes"]');
+        const criticalCheckbox = row.querySelector('[data-field="alert_on_offline"]');
+        updateDeviceDetails(mac, friendlyNameInput.value, notesInput.value, criticalCheckbox.checked);
+    });
+
+    // Expand input fields while they are being edited
+    deviceTableBody.addEventListener('focusin', (e) => {
+        if (e.target.classList.contains('editable')) {
+            e.target.classList.add('editing');
+        }
+    });
+    deviceTableBody.addEventListener('focusout', (e) => {
+        if (e.target.classList.contains('editable')) {
+            e.target.classList.remove('editing');
+        }
+        const row = e.target.closest('tr');
+        if (row && row.dataset.stale && !row.contains(e.relatedTarget)) {
+            // Apply updates that arrived while the row was being edited.
+            const device = devicesByMac.get(row.dataset.mac);
+            if (device) {
+                setTimeout(() => applyDeviceChanges([device], []), 0);
+            }
+        }
+    });
+
     const fetchData = () => {
         fetchDevices();
         fetchEvents();
     };
 
+    // Applies a pushed inventory delta, or fetches what was missed if it does not follow on.
+    const applyDevicesMessage = (delta) => {
+        if (delta.seq <= deviceSeq) {
+            return;
+        }
+        if (delta.since !== deviceSeq) {
+            fetchDevices();
+            return;
+        }
+        delta.changed.forEach(device => devicesByMac.set(device.mac, device));
+        delta.removed.forEach(mac => devicesByMac.delete(mac));
+        deviceSeq = delta.seq;
+        applyDeviceChanges(delta.changed, delta.removed);
+    };
+
     // Initial fetch
     fetchData();
 
-    // Refresh data every 30 seconds
-    setInterval(fetchData, 30000);
+    if (window.EventSource) {
+        // Changes are pushed by the server. EventSource reconnects on its own
+        // and resumes from the last message it received.
+        const stream = new EventSource('/api/stream');
+        stream.addEventListener('devices', (e) => applyDevicesMessage(JSON.parse(e.data)));
+        stream.addEventListener('event', (e) => addTimelineEvent(JSON.parse(e.data)));
+        stream.addEventListener('reset', fetchData);
+    } else {
+        // Refresh data every 30 seconds
+        setInterval(fetchData, 30000);
+    }
 });
@@ -52,13 +52,16 @@ document.addEventListener('DOMContentLoaded', () => {
         data.scan_interval = parseInt(formData.get('scan_interval'), 10);
         data.subnets = formData.get('subnets').split(',').map(s => s.trim()).filter(s => s);
 
-        // Nested structures
-        data.edgemax = {
-            host: formData.get('edgemax_host'),
-            port: parseInt(formData.get('edgemax_port'), 10),
-            username: formData.get('edgemax_user'),
-            password: formData.get('edgemax_password')
-        };
+        // Nested structures. The single router is optional when routers are
+        // listed under 'routers' in config.yaml.
+        if (formData.get('edgemax_host')) {
+            data.edgemax = {
+                host: formData.get('edgemax_host'),
+                port: parseInt(formData.get('edgemax_port'), 10) || 22,
+                username: formData.get('edgemax_user'),
+                password: formData.get('edgemax_password')
+            };
+        }
         data.home_assistant = {
             webhook_url: formData.get('ha_webhook_url')
         };
@@ -67,7 +70,7 @@ document.addEventListener('DOMContentLoaded', () => {
         };
 
         // Filter out empty password/api_key fields so they are not sent
-        if (!data.edgemax.password) {
+        if (data.edgemax && !data.edgemax.password) {
             delete data.edgemax.password;
         }
         if (!data.fingerbank.api_key) {
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+import threading
+import unittest
+from pingpoint.broadcast import Broadcaster
+from pingpoint.inventory import Inventory
+
+
+def parse(message):
+    """Splits an SSE message into its id, event name and decoded data."""
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+
+class TestBroadcaster(unittest.TestCase):
+
+    def test_fans_out_messages_from_other_threads(self):
+        """Test that messages published on another thread reach every subscriber in order."""
+        broadcaster = Broadcaster()
+
+        async def scenario():
+            subscribers = [broadcaster.subscribe() for _ in range(3)]
+            thread = threading.Thread(target=lambda: [broadcaster.publish('event', {'n': n}) for n in range(5)])
+            thread.start()
+            thread.join()
+            return [[parse(await s.get(timeout=1))[2]['n'] for _ in range(5)] for s in subscribers]
+
+        self.assertEqual(asyncio.run(scenario()), [[0, 1, 2, 3, 4]] * 3)
+
+    def test_resumes_from_last_event_id(self):
+        """Test that a reconnecting client receives missed messages, or a reset if too far behind."""
+        broadcaster = Broadcaster(history_size=3)
+        ids = [broadcaster.publish('event', {'n': n}) for n in range(5)]
+
+        async def scenario():
+            resumed = broadcaster.subscribe(last_event_id=ids[2])
+            missed = [parse(await resumed.get(timeout=1))[2]['n'] for _ in range(2)]
+            behind = broadcaster.subscribe(last_event_id=ids[0])
+            return missed, parse(await behind.get(timeout=1))[1]
+
+        missed, event = asyncio.run(scenario())
+        self.assertEqual(missed, [3, 4])
+        self.assertEqual(event, 'reset')
+
+    def test_drops_slow_subscribers(self):
+        """Test that a subscriber whose queue overflows is dropped without affecting others."""
+        broadcaster = Broadcaster(queue_size=2)
+
+        async def scenario():
+            slow = broadcaster.subscribe()
+            fast = broadcaster.subscribe()
+            received = []
+            for n in range(4):
+                broadcaster.publish('event', {'n': n})
+                await asyncio.sleep(0)
+                received.append(parse(await fast.get(timeout=1))[2]['n'])
+            with self.assertRaises(ConnectionAbortedError):
+                while True:
+                    await slow.get(timeout=1)
+            return received
+
+        self.assertEqual(asyncio.run(scenario()), [0, 1, 2, 3])
+        stats = broadcaster.stats()
+        self.assertEqual(stats['subscribers'], 1)
+        self.assertEqual(stats['dropped_subscribers'], 1)
+
+    def test_inventory_publishes_deltas_and_events(self):
+        """Test that a scan publishes its new events and one device delta."""
+        test_file = "test_broadcast_devices.json"
+        inventory = Inventory(persistence_file=test_file)
+        inventory.broadcaster = Broadcaster()
+        try:
+            async def scenario():
+                subscription = inventory.broadcaster.subscribe()
+                inventory.update_from_scan([{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}])
+                await asyncio.sleep(0)
+                return [parse(await subscription.get(timeout=1)) for _ in range(2)]
+
+            (_, first, event), (_, second, delta) = asyncio.run(scenario())
+        finally:
+            for path in (test_file, f"{test_file}.journal"):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.assertEqual((first, event['type']), ('event', 'device_joined'))
+        self.assertEqual(second, 'devices')
+        self.assertEqual(delta['seq'], delta['since'] + 1)
+        self.assertEqual([d['mac'] for d in delta['changed']], ['AA:BB:CC:00:11:22'])
+
+
+if __name__ == '__main__':
+    unittest.main()
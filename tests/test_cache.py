@@ -0,0 +1,52 @@
+import os
+import time
+import unittest
+from unittest.mock import patch
+from pingpoint.cache import FingerprintCache, fingerprint_signature
+from pingpoint.models import Fingerprint
+
+
+class TestFingerprintCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_file = "test_fingerprint_cache.json"
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def tearDown(self):
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def test_signature_ignores_device_part_of_mac_and_port_order(self):
+        ports = [{'portid': '80', 'protocol': 'tcp'}, {'portid': '443', 'protocol': 'tcp'}]
+        first = fingerprint_signature('aa:bb:cc:00:00:01', Fingerprint(os_match='Linux', ports=ports))
+        second = fingerprint_signature('AA:BB:CC:99:99:99', Fingerprint(os_match='Linux', ports=ports[::-1]))
+        self.assertEqual(first, second)
+        self.assertEqual(first, 'AA:BB:CC|tcp/80,tcp/443|Linux')
+        self.assertNotEqual(first, fingerprint_signature('AA:BB:CD:00:00:01', Fingerprint(os_match='Linux', ports=ports)))
+
+    def test_evicts_least_recently_used_and_expires_entries(self):
+        cache = FingerprintCache(max_entries=2, ttl=60)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+        with patch('pingpoint.cache.time.time', return_value=time.time() + 61):
+            self.assertIsNone(cache.get('a'))
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses'], stats['evictions']), (1, 2, 2, 1))
+
+    def test_entries_survive_restart(self):
+        cache = FingerprintCache(self.cache_file)
+        cache.put('fingerprint:AA:BB:CC:00:11:22', {'os_match': 'Linux', 'ports': []})
+        cache.save()
+        restored = FingerprintCache(self.cache_file)
+        self.assertEqual(restored.get('fingerprint:AA:BB:CC:00:11:22'), {'os_match': 'Linux', 'ports': []})
+        self.assertIsNone(FingerprintCache(self.cache_file, ttl=0).get('fingerprint:AA:BB:CC:00:11:22'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from pingpoint.coordinator import ScanCoordinator
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class TestScanCoordinator(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = MagicMock()
+        self.inventory.update_from_scan.side_effect = lambda hosts, webhook_url: list(hosts)
+        self.coordinator = ScanCoordinator(self.inventory)
+        self.release = threading.Event()
+        self.calls = 0
+
+    def blocking_scan(self):
+        self.calls += 1
+        yield {'mac': 'AA:BB:CC:00:11:22'}
+        self.release.wait(5)
+        yield {'mac': 'AA:BB:CC:00:11:33'}
+
+    def test_duplicate_triggers_attach_to_running_scan(self):
+        """Test that only one scan per source runs and duplicates attach to it."""
+        self.assertEqual(self.coordinator.trigger('edgemax', self.blocking_scan), 'started')
+        wait_for(lambda: self.coordinator.status()['edgemax']['progress'] == 1)
+        self.assertEqual(self.coordinator.trigger('edgemax', self.blocking_scan), 'attached')
+        # Other sources are independent.
+        self.assertEqual(self.coordinator.trigger('nmap', lambda: []), 'started')
+
+        status = self.coordinator.status()['edgemax']
+        self.assertTrue(status['running'])
+        self.assertEqual(status['attached'], 1)
+
+        self.release.set()
+        wait_for(lambda: not self.coordinator.status()['edgemax']['running'])
+        status = self.coordinator.status()['edgemax']
+        self.assertEqual(status['last_result_count'], 2)
+        self.assertEqual(status['runs'], 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_queued_triggers_coalesce_into_one_follow_up(self):
+        """Test that follow-up requests made during a scan result in a single extra run."""
+        self.coordinator.trigger('edgemax', self.blocking_scan)
+        for _ in range(3):
+            self.assertEqual(self.coordinator.trigger('edgemax', self.blocking_scan, queue_if_running=True), 'queued')
+        self.assertTrue(self.coordinator.status()['edgemax']['queued'])
+
+        self.release.set()
+        wait_for(lambda: self.coordinator.status()['edgemax']['runs'] == 2)
+        self.assertEqual(self.calls, 2)
+        self.assertFalse(self.coordinator.status()['edgemax']['queued'])
+
+    def test_run_waits_for_running_scan(self):
+        """Test that a blocking run attaches to an in-flight scan and returns its result."""
+        self.coordinator.trigger('edgemax', self.blocking_scan)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.coordinator.run('edgemax', self.blocking_scan)))
+        thread.start()
+        wait_for(lambda: self.coordinator.status()['edgemax']['attached'] == 1)
+        self.release.set()
+        thread.join(5)
+        self.assertEqual(results, [2])
+        self.assertEqual(self.calls, 1)
+
+    def test_failed_scan_is_recorded(self):
+        """Test that a scan error is reported in the status instead of raised."""
+        def failing_scan():
+            raise IOError("All EdgeMax routers failed to respond.")
+
+        self.assertIsNone(self.coordinator.run('edgemax', failing_scan))
+        status = self.coordinator.status()['edgemax']
+        self.assertFalse(status['running'])
+        self.assertIn('failed to respond', status['last_error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
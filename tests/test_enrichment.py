@@ -0,0 +1,128 @@
+import os
+import time
+import unittest
+from unittest.mock import patch
+from pingpoint.cache import FingerprintCache
+from pingpoint.enrichment import EnrichmentQueue
+from pingpoint.inventory import Inventory
+from pingpoint.models import Fingerprint
+
+
+class TestEnrichmentQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory_file = "test_enrichment_devices.json"
+        self.queue_file = "test_enrichment_queue.json"
+        for path in (self.inventory_file, f"{self.inventory_file}.journal", self.queue_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self.inventory = Inventory(persistence_file=self.inventory_file)
+        self.queue = EnrichmentQueue(self.inventory, persistence_file=self.queue_file, workers=1)
+        self.inventory.enrichment_queue = self.queue
+
+    def tearDown(self):
+        self.queue.stop()
+        for path in (self.inventory_file, f"{self.inventory_file}.journal", self.queue_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_scan_enqueues_new_devices_once(self):
+        scan = [{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}]
+        self.inventory.update_from_scan(scan)
+        self.assertFalse(self.queue.enqueue('AA:BB:CC:00:11:22', '192.168.1.101'))
+        stats = self.queue.stats()
+        self.assertEqual(stats['pending'], 1)
+        self.assertEqual(self.queue._pending['AA:BB:CC:00:11:22']['ip'], '192.168.1.101')
+
+    def test_pending_jobs_survive_restart(self):
+        self.queue.enqueue('AA:BB:CC:00:11:22', '192.168.1.100')
+        restored = EnrichmentQueue(self.inventory, persistence_file=self.queue_file)
+        self.assertEqual(restored.stats()['pending'], 1)
+
+    def run_until_done(self):
+        self.queue.start()
+        deadline = time.time() + 5
+        while self.queue.stats()['completed'] + self.queue.stats()['failed'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        return self.queue.stats()
+
+    @patch('pingpoint.enrichment.load_config', return_value={})
+    @patch('pingpoint.enrichment.NmapScanner')
+    def test_worker_applies_quick_fingerprint(self, MockNmapScanner, mock_load_config):
+        scanner = MockNmapScanner.return_value
+        scanner.quick_fingerprint.return_value = Fingerprint(
+            ports=[{'portid': '80', 'protocol': 'tcp', 'service_name': 'http', 'product': 'lighttpd', 'version': None}],
+            tier='quick')
+        self.inventory.update_from_scan([{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}])
+
+        stats = self.run_until_done()
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['recent_jobs'][0]['mac'], 'AA:BB:CC:00:11:22')
+        self.assertEqual(list(stats['average_tier_seconds']), ['quick'])
+        device = self.inventory.get_device('AA:BB:CC:00:11:22')
+        self.assertEqual(device.fingerprint.tier, 'quick')
+        scanner.quick_fingerprint.assert_called_once_with('192.168.1.100', top_ports=100, timeout=60)
+        scanner.scan_for_fingerprint.assert_not_called()
+
+    @patch('pingpoint.enrichment.load_config', return_value={})
+    @patch('pingpoint.enrichment.NmapScanner')
+    def test_ambiguous_quick_fingerprint_runs_deep_scan(self, MockNmapScanner, mock_load_config):
+        scanner = MockNmapScanner.return_value
+        scanner.quick_fingerprint.return_value = Fingerprint(tier='quick')
+        scanner.scan_for_fingerprint.return_value = Fingerprint(
+            os_match='Linux 5.X',
+            ports=[{'portid': '22', 'protocol': 'tcp', 'service_name': 'ssh', 'product': 'OpenSSH', 'version': '8.9'}],
+            tier='deep')
+        self.inventory.update_from_scan([{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}])
+
+        stats = self.run_until_done()
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(set(stats['recent_jobs'][0]['tier_seconds']), {'quick', 'deep'})
+        fingerprint = self.inventory.get_device('AA:BB:CC:00:11:22').fingerprint
+        self.assertEqual(fingerprint.os_match, 'Linux 5.X')
+        self.assertEqual(fingerprint.tier, 'deep')
+        self.assertEqual(len(fingerprint.ports), 1)
+
+    @patch('pingpoint.enrichment.FingerbankClient')
+    @patch('pingpoint.enrichment.load_config', return_value={'fingerbank': {'api_key': 'key'}})
+    @patch('pingpoint.enrichment.NmapScanner')
+    def test_deep_scan_does_not_modify_published_fingerprint(self, MockNmapScanner, mock_load_config, MockFingerbank):
+        MockFingerbank.return_value.enrich_device.return_value = False
+        scanner = MockNmapScanner.return_value
+        scanner.quick_fingerprint.return_value = Fingerprint(
+            ports=[{'portid': '80', 'protocol': 'tcp', 'service_name': 'http', 'product': 'lighttpd', 'version': None}],
+            tier='quick')
+        published = []
+
+        def deep_scan(ip, timeout):
+            # Fingerbank could not classify the quick fingerprint, which is already published.
+            published.append(self.inventory.get_device('AA:BB:CC:00:11:22').fingerprint)
+            return Fingerprint(os_match='Linux 5.X', tier='deep',
+                               ports=[{'portid': '22', 'protocol': 'tcp', 'service_name': 'ssh', 'product': 'OpenSSH'}])
+        scanner.scan_for_fingerprint.side_effect = deep_scan
+        self.inventory.update_from_scan([{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}])
+
+        stats = self.run_until_done()
+        self.assertEqual(stats['completed'], 1)
+        quick = published[0]
+        self.assertEqual((quick.tier, quick.os_match, len(quick.ports)), ('quick', None, 1))
+        fingerprint = self.inventory.get_device('AA:BB:CC:00:11:22').fingerprint
+        self.assertEqual((fingerprint.tier, fingerprint.os_match, len(fingerprint.ports)), ('deep', 'Linux 5.X', 2))
+
+    @patch('pingpoint.enrichment.load_config', return_value={})
+    @patch('pingpoint.enrichment.NmapScanner')
+    def test_rediscovered_device_uses_cached_fingerprint(self, MockNmapScanner, mock_load_config):
+        self.queue.cache = FingerprintCache()
+        self.queue.cache.put('fingerprint:AA:BB:CC:00:11:22', Fingerprint(os_match='Linux 5.X', tier='deep').to_dict())
+        self.inventory.update_from_scan([{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}])
+
+        stats = self.run_until_done()
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(list(stats['recent_jobs'][0]['tier_seconds']), ['cached'])
+        self.assertEqual(self.inventory.get_device('AA:BB:CC:00:11:22').fingerprint.os_match, 'Linux 5.X')
+        MockNmapScanner.return_value.quick_fingerprint.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from pingpoint.eventlog import EventLog
+from pingpoint.events import EventStore
+
+START = datetime(2025, 6, 22, 12, 0, 0)
+
+
+def make_event(minute, mac='AA:BB:CC:00:11:22'):
+    return {
+        "timestamp": (START + timedelta(minutes=minute)).isoformat(),
+        "type": "device_joined",
+        "device": {"mac": mac},
+        "message": f"Event at minute {minute}"
+    }
+
+
+class TestEventLog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fill(self, store, count):
+        for minute in range(count):
+            store.append(make_event(minute))
+
+    def test_rotates_segments_by_size(self):
+        log = EventLog(self.directory, max_segment_bytes=1000, index_interval=2)
+        self.fill(EventStore(capacity=100, log=log), 30)
+        log.close()
+        segments = sorted(self.directory.glob("events-*.log"))
+        self.assertGreater(len(segments), 1)
+        for segment in segments:
+            self.assertLessEqual(segment.stat().st_size, 1000)
+            self.assertTrue(segment.with_suffix('.idx').exists())
+
+    def test_restart_restores_tail(self):
+        log = EventLog(self.directory, max_segment_bytes=1000)
+        self.fill(EventStore(capacity=100, log=log), 30)
+        log.close()
+
+        log = EventLog(self.directory, max_segment_bytes=1000)
+        store = EventStore(capacity=5, log=log)
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store[0]['id'], 29)
+        self.assertEqual(store[-1]['id'], 25)
+        # New events continue the id sequence.
+        self.assertEqual(store.append(make_event(30))['id'], 30)
+
+    def test_queries_reach_past_memory_window(self):
+        log = EventLog(self.directory, max_segment_bytes=1000, index_interval=2)
+        store = EventStore(capacity=5, log=log)
+        self.fill(store, 30)
+
+        events, cursor = store.query(limit=8)
+        self.assertEqual([e['id'] for e in events], list(range(29, 21, -1)))
+        self.assertEqual(cursor, 22)
+
+        events, cursor = store.query(since=START + timedelta(minutes=3), until=START + timedelta(minutes=6), limit=10)
+        self.assertEqual([e['id'] for e in events], [6, 5, 4, 3])
+        self.assertIsNone(cursor)
+
+        events, _ = store.query(cursor=2)
+        self.assertEqual([e['id'] for e in events], [1, 0])
+
+    def test_partial_record_is_truncated(self):
+        log = EventLog(self.directory)
+        self.fill(EventStore(capacity=10, log=log), 3)
+        log.close()
+        segment = next(self.directory.glob("events-*.log"))
+        with open(segment, "ab") as f:
+            f.write(b'{"id": 3, "timest')
+
+        store = EventStore(capacity=10, log=EventLog(self.directory))
+        self.assertEqual(len(store), 3)
+        self.assertTrue(open(segment, "rb").read().endswith(b"\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from datetime import datetime, timedelta
+from pingpoint.events import EventStore
+
+START = datetime(2025, 6, 22, 12, 0, 0)
+
+
+def make_event(minute, event_type='device_joined', mac='AA:BB:CC:00:11:22'):
+    return {
+        "timestamp": (START + timedelta(minutes=minute)).isoformat(),
+        "type": event_type,
+        "device": {"mac": mac},
+        "message": f"Event at minute {minute}"
+    }
+
+
+class TestEventStore(unittest.TestCase):
+
+    def test_newest_first_indexing(self):
+        store = EventStore(capacity=10)
+        for minute in range(3):
+            store.append(make_event(minute))
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store[0]['message'], 'Event at minute 2')
+        self.assertEqual(store[-1]['message'], 'Event at minute 0')
+        self.assertEqual([e['id'] for e in store], [2, 1, 0])
+
+    def test_capacity_evicts_oldest(self):
+        store = EventStore(capacity=5)
+        for minute in range(23):
+            store.append(make_event(minute, mac=f'MAC{minute % 2}'))
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store[-1]['id'], 18)
+        events, _ = store.query(mac='MAC0', limit=100)
+        self.assertEqual([e['id'] for e in events], [22, 20, 18])
+
+    def test_query_filters(self):
+        store = EventStore(capacity=100)
+        for minute in range(10):
+            event_type = 'device_offline' if minute % 3 == 0 else 'device_joined'
+            store.append(make_event(minute, event_type=event_type, mac=f'MAC{minute % 2}'))
+
+        events, _ = store.query(event_type='device_offline')
+        self.assertEqual([e['id'] for e in events], [9, 6, 3, 0])
+
+        events, _ = store.query(since=START + timedelta(minutes=4), until=START + timedelta(minutes=7))
+        self.assertEqual([e['id'] for e in events], [7, 6, 5, 4])
+
+        events, _ = store.query(mac='MAC0', event_type='device_offline')
+        self.assertEqual([e['id'] for e in events], [6, 0])
+
+        events, _ = store.query(mac='UNKNOWN')
+        self.assertEqual(events, [])
+
+    def test_cursor_pagination(self):
+        store = EventStore(capacity=100)
+        for minute in range(7):
+            store.append(make_event(minute))
+
+        pages = []
+        cursor = None
+        while True:
+            events, cursor = store.query(limit=3, cursor=cursor)
+            pages.append([e['id'] for e in events])
+            if cursor is None:
+                break
+        self.assertEqual(pages, [[6, 5, 4], [3, 2, 1], [0]])
+
+
+    def test_events_are_stored_without_device_copies(self):
+        store = EventStore(capacity=10)
+        event = make_event(0)
+        event['device']['fingerprint'] = {'ports': [{'portid': '22'}]}
+        event['changes'] = {'ip_addresses': [['10.0.0.1'], ['10.0.0.1', '10.0.0.2']]}
+        store.append(event)
+        store.append(make_event(1))
+        self.assertEqual(store[-1], {
+            'id': 0,
+            'timestamp': event['timestamp'],
+            'type': 'device_joined',
+            'mac': 'AA:BB:CC:00:11:22',
+            'message': 'Event at minute 0',
+            'changes': {'ip_addresses': [['10.0.0.1'], ['10.0.0.1', '10.0.0.2']]},
+        })
+        self.assertNotIn('changes', store[0])
+        events, _ = store.query(mac='AA:BB:CC:00:11:22')
+        self.assertEqual(len(events), 2)
+
+if __name__ == '__main__':
+    unittest.main()
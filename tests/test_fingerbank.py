@@ -0,0 +1,45 @@
+import unittest
+from unittest.mock import MagicMock
+from pingpoint.cache import FingerprintCache
+from pingpoint.fingerbank import FingerbankClient, RateLimiter
+from pingpoint.models import Device, Fingerprint
+
+
+def make_device(mac):
+    ports = [{'portid': '80', 'protocol': 'tcp', 'service_name': 'http', 'product': None, 'version': None}]
+    return Device(mac=mac, ip_addresses=['192.168.1.50'], fingerprint=Fingerprint(os_match='Linux 4.X', ports=ports))
+
+
+class TestFingerbankClient(unittest.TestCase):
+
+    def test_identical_devices_are_classified_from_cache(self):
+        session = MagicMock()
+        session.post.return_value.json.return_value = {'device_name': 'Smart Plug/Acme', 'vulnerabilities': []}
+        client = FingerbankClient('key', cache=FingerprintCache(), session=session)
+
+        first, second = make_device('AA:BB:CC:00:00:01'), make_device('AA:BB:CC:00:00:02')
+        self.assertTrue(client.enrich_device(first))
+        self.assertTrue(client.enrich_device(second))
+        self.assertEqual(session.post.call_count, 1)
+        self.assertEqual((second.category, second.vendor), ('Smart Plug', 'Acme'))
+
+        client.enrich_device(make_device('AA:BB:CD:00:00:03'))
+        self.assertEqual(session.post.call_count, 2)
+
+    def test_name_without_vendor_keeps_oui_vendor(self):
+        session = MagicMock()
+        session.post.return_value.json.return_value = {'device_name': 'Printer', 'vulnerabilities': []}
+        device = make_device('AA:BB:CC:00:00:01')
+        device.vendor = 'Brother Industries, Ltd.'
+        self.assertTrue(FingerbankClient('key', session=session).enrich_device(device))
+        self.assertEqual((device.category, device.vendor), ('Printer', 'Brother Industries, Ltd.'))
+
+    def test_rate_limiter_spaces_out_calls_after_burst(self):
+        limiter = RateLimiter(rate=20, per=1.0, burst=2)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertAlmostEqual(limiter.acquire(), 0.05, delta=0.02)
+
+
+if __name__ == '__main__':
+    unittest.main()
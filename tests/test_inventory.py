@@ -1,21 +1,30 @@
 import unittest
 import os
+import json
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from dataclasses import replace
 from pingpoint.inventory import Inventory, Device
+from pingpoint.models import Fingerprint
 
 class TestInventory(unittest.TestCase):
 
     def setUp(self):
         """Set up a clean inventory for each test."""
         self.test_file = "test_inventory_devices.json"
-        # Ensure no old test file is lying around
-        if os.path.exists(self.test_file):
-            os.remove(self.test_file)
+        self.journal_file = f"{self.test_file}.journal"
+        # Ensure no old test files are lying around
+        for path in (self.test_file, self.journal_file):
+            if os.path.exists(path):
+                os.remove(path)
         self.inventory = Inventory(persistence_file=self.test_file)
 
     def tearDown(self):
-        """Clean up the test file after each test."""
-        if os.path.exists(self.test_file):
-            os.remove(self.test_file)
+        """Clean up the test files after each test."""
+        for path in (self.test_file, self.journal_file):
+            if os.path.exists(path):
+                os.remove(path)
 
     def test_new_device_join(self):
         """Test that a new device is correctly added to the inventory."""
@@ -43,18 +52,20 @@ class TestInventory(unittest.TestCase):
 
         # 2. Device is missing once (should still be online)
         self.inventory.update_from_scan([])
-        self.assertEqual(device.status, 'online')
-        self.assertEqual(self.inventory._offline_counters.get(mac), 1)
+        self.assertEqual(self.inventory.get_device(mac).status, 'online')
+        self.assertEqual(self.inventory.missed_scans(mac), 1)
 
         # 3. Device is missing twice (should be marked offline)
         self.inventory.update_from_scan([])
-        self.assertEqual(device.status, 'offline')
-        self.assertIsNone(self.inventory._offline_counters.get(mac)) # Counter should be cleared
+        self.assertEqual(self.inventory.get_device(mac).status, 'offline')
+        # Devices returned earlier are point-in-time copies.
+        self.assertEqual(device.status, 'online')
+        self.assertEqual(self.inventory.missed_scans(mac), 0) # Counter should be cleared
         self.assertEqual(self.inventory.events[0]['type'], 'device_offline')
 
         # 4. Device reconnects
         self.inventory.update_from_scan(scan1)
-        self.assertEqual(device.status, 'online')
+        self.assertEqual(self.inventory.get_device(mac).status, 'online')
         self.assertEqual(self.inventory.events[0]['type'], 'device_reconnected')
 
     def test_ip_address_change(self):
@@ -69,6 +80,7 @@ class TestInventory(unittest.TestCase):
         scan2 = [{'mac': mac, 'ip': '192.168.1.101'}]
         self.inventory.update_from_scan(scan2)
         
+        device = self.inventory.get_device(mac)
         self.assertIn('192.168.1.101', device.ip_addresses)
         self.assertEqual(len(device.ip_addresses), 2)
         self.assertEqual(self.inventory.events[0]['type'], 'ip_change')
@@ -86,6 +98,197 @@ class TestInventory(unittest.TestCase):
         self.assertIsNotNone(device)
         self.assertEqual(device.status, 'online')
 
+    def test_save_journals_only_changed_devices(self):
+        """Test that a save appends only changed devices and a reload replays them."""
+        scan = [{'mac': f'AA:BB:CC:00:11:{i:02X}', 'ip': f'192.168.1.{i}'} for i in range(10)]
+        self.inventory.update_from_scan(scan)
+        with open(self.journal_file) as f:
+            self.assertEqual(len(f.readlines()), 10)
+
+        # An unchanged rescan writes nothing; a details update writes one record.
+        self.inventory.update_from_scan(scan)
+        self.inventory.update_device_details('AA:BB:CC:00:11:03', 'Printer', 'Office', True)
+        with open(self.journal_file) as f:
+            self.assertEqual(len(f.readlines()), 11)
+        self.assertFalse(os.path.exists(self.test_file))
+
+        new_inventory = Inventory(persistence_file=self.test_file)
+        self.assertEqual(len(new_inventory.all_devices()), 10)
+        self.assertEqual(new_inventory.get_device('AA:BB:CC:00:11:03').friendly_name, 'Printer')
+
+    def test_snapshot_truncates_journal(self):
+        """Test that a snapshot folds the journal into the snapshot file."""
+        self.inventory.update_from_scan([{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}])
+        self.inventory.save_to_disk(snapshot=True)
+        self.assertEqual(os.path.getsize(self.journal_file), 0)
+        self.assertFalse(os.path.exists(f"{self.test_file}.tmp"))
+
+        new_inventory = Inventory(persistence_file=self.test_file)
+        self.assertIsNotNone(new_inventory.get_device('AA:BB:CC:00:11:22'))
+
+    def test_reads_do_not_wait_for_writers(self):
+        """Test that readers get the last published view while a writer holds the lock."""
+        self.inventory.update_from_scan([{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}])
+        locked = threading.Event()
+        release = threading.Event()
+
+        def writer():
+            with self.inventory._lock:
+                self.inventory.devices['AA:BB:CC:00:11:22'].status = 'offline'
+                locked.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        locked.wait(5)
+        try:
+            devices = self.inventory.all_devices()
+            self.assertEqual([d.status for d in devices], ['online'])
+        finally:
+            release.set()
+            thread.join()
+
+    def test_apply_enrichment_keeps_user_changes(self):
+        """Test that enrichment results are applied without overwriting a name set meanwhile."""
+        mac = 'AA:BB:CC:00:11:22'
+        self.inventory.update_from_scan([{'mac': mac, 'ip': '192.168.1.100'}])
+        enriched = replace(self.inventory.get_device(mac), fingerprint=Fingerprint(os_match='Linux'),
+                           friendly_name='Fingerbank Name', category='Printer')
+        self.inventory.update_device_details(mac, 'My Printer', '', False)
+
+        self.assertTrue(self.inventory.apply_enrichment(mac, enriched))
+        device = self.inventory.get_device(mac)
+        self.assertEqual(device.friendly_name, 'My Printer')
+        self.assertEqual(device.category, 'Printer')
+        self.assertEqual(device.fingerprint.os_match, 'Linux')
+        self.assertFalse(self.inventory.apply_enrichment('00:00:00:00:00:00', enriched))
+
+    def test_changes_since_returns_deltas(self):
+        """Test that deltas include only changed and removed devices since a sequence number."""
+        scan = [{'mac': f'AA:BB:CC:00:11:{i:02X}', 'ip': f'192.168.1.{i}'} for i in range(3)]
+        self.inventory.update_from_scan(scan)
+        seq, reset, changed, removed = self.inventory.changes_since(0)
+        self.assertTrue(reset)
+        self.assertEqual(len(changed), 3)
+
+        # Being seen again within the last_seen resolution is not a change.
+        self.inventory.update_from_scan(scan)
+        self.assertEqual(self.inventory.changes_since(seq), (seq, False, [], []))
+
+        self.inventory.update_device_details('AA:BB:CC:00:11:01', 'Printer', '', False)
+        self.assertTrue(self.inventory.remove_device('AA:BB:CC:00:11:02'))
+        self.assertFalse(self.inventory.remove_device('AA:BB:CC:00:11:02'))
+        new_seq, reset, changed, removed = self.inventory.changes_since(seq)
+        self.assertGreater(new_seq, seq)
+        self.assertFalse(reset)
+        self.assertEqual([d.friendly_name for d in changed], ['Printer'])
+        self.assertEqual(removed, ['AA:BB:CC:00:11:02'])
+        self.assertIsNone(self.inventory.get_device('AA:BB:CC:00:11:02'))
+
+        # The removal is persisted.
+        new_inventory = Inventory(persistence_file=self.test_file)
+        self.assertEqual(len(new_inventory.all_devices()), 2)
+        # Sequence numbers from before a restart force a reload.
+        self.assertTrue(new_inventory.changes_since(new_seq)[1])
+
+    def test_last_seen_is_republished_after_resolution(self):
+        """Test that last_seen-only updates are published once they exceed the resolution."""
+        self.inventory.last_seen_resolution = 0
+        scan = [{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}]
+        self.inventory.update_from_scan(scan)
+        seq = self.inventory.seq
+        self.inventory.update_from_scan(scan)
+        self.assertEqual(len(self.inventory.changes_since(seq)[2]), 1)
+
+
+    def test_devices_json_is_cached_until_a_device_changes(self):
+        """Test that the encoded device list is reused and re-encoded only after changes."""
+        scan = [{'mac': f'AA:BB:CC:00:11:{i:02X}', 'ip': f'192.168.1.{i}'} for i in range(2)]
+        self.inventory.update_from_scan(scan)
+        seq, body = self.inventory.devices_json()
+        self.assertIs(self.inventory.devices_json()[1], body)
+        self.assertEqual(json.loads(body), [d.to_dict() for d in self.inventory.all_devices()])
+
+        self.inventory.update_device_details('AA:BB:CC:00:11:01', 'Printer', '', False)
+        new_seq, new_body = self.inventory.devices_json()
+        self.assertGreater(new_seq, seq)
+        names = {d['mac']: d['friendly_name'] for d in json.loads(new_body)}
+        self.assertEqual(names['AA:BB:CC:00:11:01'], 'Printer')
+
+    def test_expanded_events_show_device_state_at_event_time(self):
+        """Test that events are joined with the device and keep the values they changed."""
+        mac = 'AA:BB:CC:00:11:22'
+        self.inventory.update_from_scan([{'mac': mac, 'ip': '192.168.1.100'}])
+        self.inventory.update_from_scan([{'mac': mac, 'ip': '192.168.1.101'}])
+        self.inventory.update_device_details(mac, 'Laptop', '', False)
+        for _ in range(self.inventory.offline_debounce_scans):
+            self.inventory.update_from_scan([])
+
+        offline, ip_change, joined = (self.inventory.expand_event(e) for e in self.inventory.events)
+        self.assertNotIn('device', self.inventory.events[0])
+        self.assertEqual(joined['device']['friendly_name'], 'Laptop')
+        self.assertEqual(joined['device']['status'], 'online')
+        self.assertEqual(ip_change['device']['ip_addresses'], ['192.168.1.100', '192.168.1.101'])
+        self.assertEqual(ip_change['device']['status'], 'online')
+        self.assertEqual(offline['device']['status'], 'offline')
+
+        self.inventory.remove_device(mac)
+        self.assertEqual(self.inventory.expand_event(self.inventory.events[0])['device']['mac'], mac)
+
+    def test_offline_grace_period_tolerates_partial_scans(self):
+        """Test that with a grace period, devices go offline by time rather than by missed scans."""
+        inventory = Inventory(persistence_file=self.test_file, offline_grace_seconds=600)
+        first, second = 'AA:BB:CC:00:11:01', 'AA:BB:CC:00:11:02'
+        inventory.update_from_scan([{'mac': first, 'ip': '192.168.1.1'}, {'mac': second, 'ip': '192.168.1.2'}])
+        for _ in range(5):
+            inventory.update_from_scan([{'mac': first, 'ip': '192.168.1.1'}])
+        self.assertEqual(inventory.get_device(second).status, 'online')
+        self.assertEqual(inventory.missed_scans(second), 5)
+
+        with patch('pingpoint.inventory.datetime') as clock:
+            clock.now.return_value = datetime.now() + timedelta(minutes=11)
+            inventory.update_from_scan([{'mac': first, 'ip': '192.168.1.1'}])
+        self.assertEqual(inventory.get_device(second).status, 'offline')
+        self.assertEqual(inventory.get_device(first).status, 'online')
+        # Only online devices stay scheduled.
+        self.assertEqual(len(inventory._expiry), 1)
+
+    def test_find_devices_uses_indexes(self):
+        """Test that IP, hostname, subnet and vendor lookups follow devices as they change."""
+        phone, plug, laptop = 'AA:BB:CC:00:11:01', 'AA:BB:CC:00:11:02', 'AA:BB:CC:00:11:03'
+        self.inventory.update_from_scan([
+            {'mac': phone, 'ip': '10.30.1.25', 'hostname': 'Pixel-7', 'subnet': 'LAN_POOL', 'vendor': 'Google'},
+            {'mac': plug, 'ip': '10.10.4.2', 'subnet': 'IOT_POOL', 'vendor': 'Espressif Inc.'},
+            {'mac': laptop, 'ip': '10.10.200.9', 'subnet': 'LAN_POOL', 'vendor': 'Dell'},
+        ])
+        macs = lambda **filters: sorted(d.mac for d in self.inventory.find_devices(**filters))
+        self.assertEqual(macs(ip='10.30.1.25'), [phone])
+        self.assertEqual(macs(hostname='pixel-7'), [phone])
+        self.assertEqual(macs(subnet='10.10.0.0/16'), [plug, laptop])
+        self.assertEqual(macs(subnet='LAN_POOL'), [phone, laptop])
+        self.assertEqual(macs(subnet='10.10.0.0/16', vendor='Espressif Inc.'), [plug])
+
+        # The laptop takes over the phone's address; both keep it in their history.
+        self.inventory.update_from_scan([
+            {'mac': phone, 'ip': '10.30.1.26', 'hostname': 'Pixel-7', 'subnet': 'LAN_POOL', 'vendor': 'Google'},
+            {'mac': laptop, 'ip': '10.30.1.25', 'subnet': 'LAN_POOL', 'vendor': 'Dell'},
+        ])
+        self.assertEqual([d.mac for d in self.inventory.find_devices(ip='10.30.1.25')][0], laptop)
+        self.assertEqual(macs(ip='10.30.1.25'), [phone, laptop])
+        self.assertEqual(macs(subnet='10.10.0.0/16'), [plug])
+        self.assertEqual(macs(subnet='10.30.1.0/24', status='online'), [phone, laptop])
+
+        self.inventory.update_from_scan([])
+        self.inventory.update_from_scan([])
+        self.assertEqual(macs(status='offline'), [phone, plug, laptop])
+        self.inventory.remove_device(plug)
+        self.assertEqual(macs(vendor='Espressif Inc.'), [])
+        self.assertEqual(len(self.inventory._index), 2)
+
+        # The indexes are rebuilt when the inventory is loaded.
+        self.inventory.save_to_disk(snapshot=True)
+        reloaded = Inventory(persistence_file=self.test_file)
+        self.assertEqual(sorted(d.mac for d in reloaded.find_devices(hostname='PIXEL-7')), [phone])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,118 @@
+import socket
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from pingpoint.inventory import Inventory
+from pingpoint.liveness import LivenessProber
+from pingpoint.models import Device, Fingerprint
+
+MAC = 'AA:BB:CC:00:11:22'
+
+
+class TestLivenessProber(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.inventory = Inventory(persistence_file=Path(self.tmp.name) / "devices.json")
+        self.inventory.update_from_scan([{'mac': MAC, 'ip': '192.168.1.100'}])
+        self.inventory.update_device_details(MAC, 'Server', '', True)
+        self.prober = LivenessProber(self.inventory, misses=2)
+
+    def tearDown(self):
+        self.prober.stop()
+        self.tmp.cleanup()
+
+    def test_tcp_probe_uses_fingerprinted_ports(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+        prober = LivenessProber(self.inventory, methods=('tcp',), timeout=0.5)
+        device = Device(mac=MAC, ip_addresses=['127.0.0.1'],
+                        fingerprint=Fingerprint(ports=[{'portid': str(port), 'protocol': 'tcp'}]))
+        try:
+            self.assertTrue(prober.probe(device))
+        finally:
+            listener.close()
+        self.assertFalse(prober.probe(Device(mac=MAC, ip_addresses=['127.0.0.1'])))
+
+    def test_offline_after_consecutive_misses(self):
+        with patch.object(self.prober, 'probe', return_value=True):
+            self.prober.probe_round()
+        with patch.object(self.prober, 'probe', return_value=False):
+            self.prober.probe_round()
+            self.assertEqual(self.inventory.get_device(MAC).status, 'online')
+            self.assertEqual(self.prober.stats()['failing'], [MAC])
+            self.prober.probe_round()
+        self.assertEqual(self.inventory.get_device(MAC).status, 'offline')
+        self.assertEqual(self.inventory.events[0]['type'], 'device_offline')
+
+        # A stale router ARP entry in the next scan does not bring it back.
+        self.inventory.update_from_scan([{'mac': MAC, 'ip': '192.168.1.100'}])
+        self.assertEqual(self.inventory.get_device(MAC).status, 'offline')
+
+        with patch.object(self.prober, 'probe', return_value=True):
+            self.prober.probe_round()
+        self.assertEqual(self.inventory.get_device(MAC).status, 'online')
+        self.assertEqual(self.inventory.events[0]['type'], 'device_reconnected')
+        self.assertEqual(self.prober.stats()['failing'], [])
+
+    def test_misses_are_ignored_for_devices_that_never_answer(self):
+        with patch.object(self.prober, 'probe', return_value=False):
+            for _ in range(3):
+                self.prober.probe_round()
+                self.inventory.update_from_scan([{'mac': MAC, 'ip': '192.168.1.100'}])
+        self.assertEqual(self.inventory.get_device(MAC).status, 'online')
+        self.assertNotIn('device_offline', [event['type'] for event in self.inventory.events])
+
+    def test_unflagging_hands_the_device_back_to_scans(self):
+        with patch.object(self.prober, 'probe', return_value=True):
+            self.prober.probe_round()
+        with patch.object(self.prober, 'probe', return_value=False):
+            self.prober.probe_round()
+            self.prober.probe_round()
+        self.assertEqual(self.inventory.get_device(MAC).status, 'offline')
+        self.inventory.update_device_details(MAC, 'Server', '', False)
+        self.inventory.update_from_scan([{'mac': MAC, 'ip': '192.168.1.100'}])
+        self.assertEqual(self.inventory.get_device(MAC).status, 'online')
+
+    def test_probed_offline_device_seen_at_new_ip(self):
+        with patch.object(self.prober, 'probe', return_value=True):
+            self.prober.probe_round()
+        with patch.object(self.prober, 'probe', return_value=False):
+            self.prober.probe_round()
+            self.prober.probe_round()
+        for _ in range(3):
+            self.inventory.update_from_scan([{'mac': MAC, 'ip': '192.168.1.150', 'hostname': 'server'}])
+        device = self.inventory.get_device(MAC)
+        self.assertEqual(device.status, 'offline')
+        self.assertEqual(device.ip_addresses, ['192.168.1.100', '192.168.1.150'])
+        self.assertEqual(device.hostname, 'server')
+
+        with patch.object(self.prober, 'probe', return_value=True) as probe:
+            self.prober.probe_round()
+        self.assertEqual(probe.call_args[0][1], '192.168.1.150')
+        self.assertEqual(self.inventory.get_device(MAC).status, 'online')
+
+        # Back at an address it used before, which is probed instead of its newest one.
+        self.inventory.update_from_scan([{'mac': MAC, 'ip': '192.168.1.100'}])
+        with patch.object(self.prober, 'probe', return_value=True) as probe:
+            self.prober.probe_round()
+        self.assertEqual(probe.call_args[0][1], '192.168.1.100')
+
+    def test_only_flagged_devices_are_probed(self):
+        self.inventory.update_from_scan([{'mac': 'AA:BB:CC:00:11:33', 'ip': '192.168.1.101'}])
+        with patch.object(self.prober, 'probe', return_value=True) as probe:
+            self.assertEqual(list(self.prober.probe_round()), [MAC])
+        self.assertEqual(probe.call_count, 1)
+        self.inventory.update_device_details(MAC, 'Server', '', False)
+        self.assertEqual(self.inventory.flagged_devices(), [])
+
+    def test_rejects_unknown_methods(self):
+        with self.assertRaises(ValueError):
+            LivenessProber(self.inventory, methods=('snmp',))
+
+
+if __name__ == '__main__':
+    unittest.main()
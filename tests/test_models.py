@@ -0,0 +1,94 @@
+import gc
+import copy
+import json
+import unittest
+from dataclasses import replace
+from datetime import datetime
+from pingpoint import models
+from pingpoint.models import Device, Fingerprint
+
+
+def make_device_dict():
+    return {
+        'mac': 'AA:BB:CC:00:11:22',
+        'ip_addresses': ['192.168.1.100'],
+        'vendor': 'Apple, Inc.',
+        'category': None,
+        'hostname': 'phone',
+        'friendly_name': 'Phone',
+        'subnet': '192.168.1.0/24',
+        'status': 'online',
+        'first_seen': '2025-06-22T12:00:00.123456',
+        'last_seen': '2025-06-22T13:30:00',
+        'alert_on_offline': True,
+        'notes': None,
+        'fingerprint': {
+            'os_match': 'Apple iOS 16',
+            'os_accuracy': '95',
+            'ports': [{'portid': '62078', 'protocol': 'tcp', 'service_name': 'iphone-sync', 'product': None, 'version': None}],
+            'hostname': None,
+            'tier': 'quick',
+        },
+        'vulnerabilities': False,
+        'locally_administered': True,
+    }
+
+
+class TestModels(unittest.TestCase):
+
+    def test_json_round_trip(self):
+        data = make_device_dict()
+        original = copy.deepcopy(data)
+        device = Device.from_dict(data)
+        self.assertEqual(data, original)
+        self.assertEqual(device.to_dict(), original)
+        self.assertEqual(device.mac, 'AA:BB:CC:00:11:22')
+        self.assertEqual(device.first_seen, datetime(2025, 6, 22, 12, 0, 0, 123456))
+        self.assertEqual(Device.from_dict(device.to_dict()), device)
+
+    def test_packed_fields_accept_plain_values(self):
+        device = Device(mac='AA:BB:CC:00:11:22', first_seen=datetime(2025, 1, 1), last_seen=datetime(2025, 1, 1))
+        device.last_seen = datetime(2025, 6, 22, 12, 0, 0, 1)
+        self.assertEqual(device.last_seen, datetime(2025, 6, 22, 12, 0, 0, 1))
+        # Non-canonical MAC addresses are kept as given.
+        self.assertEqual(Device(mac='aa-bb-cc-00-11-22').mac, 'aa-bb-cc-00-11-22')
+        self.assertFalse(hasattr(device, '__dict__'))
+
+    def test_locally_administered_flag(self):
+        self.assertFalse(Device(mac='00:1A:11:00:11:22').locally_administered)
+        self.assertTrue(Device(mac='DA:A1:19:00:11:22').locally_administered)
+        self.assertTrue(Device(mac='da-a1-19-00-11-22').locally_administered)
+
+    def test_copy_and_replace(self):
+        device = Device.from_dict(make_device_dict())
+        copied = device.copy()
+        self.assertEqual(copied, device)
+        copied.ip_addresses.append('192.168.1.101')
+        self.assertEqual(device.ip_addresses, ['192.168.1.100'])
+        renamed = replace(device, friendly_name='Other')
+        self.assertEqual(renamed.friendly_name, 'Other')
+        self.assertEqual(renamed.last_seen, device.last_seen)
+
+    def test_fingerprints_share_ports(self):
+        first = Fingerprint.from_dict(make_device_dict()['fingerprint'])
+        second = Fingerprint(ports=make_device_dict()['fingerprint']['ports'])
+        self.assertIs(first.ports[0], second.ports[0])
+
+    def test_shared_ports_are_read_only_and_released(self):
+        ports = [{'portid': '8123', 'protocol': 'tcp', 'service_name': 'http', 'product': 'Home Assistant'}]
+        fingerprint = Fingerprint(ports=ports)
+        port = fingerprint.ports[0]
+        with self.assertRaises(TypeError):
+            port['product'] = 'Other'
+        self.assertEqual(copy.deepcopy(port), ports[0])
+        self.assertEqual(json.loads(json.dumps(fingerprint.to_dict()))['ports'], ports)
+
+        key = tuple(ports[0].items())
+        self.assertIn(key, models._PORTS)
+        del fingerprint, port
+        gc.collect()
+        self.assertNotIn(key, models._PORTS)
+
+
+if __name__ == '__main__':
+    unittest.main()
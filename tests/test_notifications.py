@@ -0,0 +1,86 @@
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+import requests
+from pingpoint.models import Device
+from pingpoint.notifications import NotificationDispatcher
+
+WEBHOOK = "http://homeassistant.local/api/webhook/test"
+
+
+def make_device(i=0):
+    return Device(mac=f'AA:BB:CC:00:11:{i:02X}', ip_addresses=[f'192.168.1.{i}'], friendly_name=f'Device {i}')
+
+
+def make_response(status_code):
+    response = MagicMock(status_code=status_code)
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(f"{status_code} Error")
+    return response
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+@patch('pingpoint.notifications.requests.Session')
+class TestNotificationDispatcher(unittest.TestCase):
+
+    def test_retries_transient_failures(self, MockSession):
+        """Test that 5xx responses are retried and the notification is eventually sent."""
+        session = MockSession.return_value
+        session.post.side_effect = [make_response(503), make_response(200)]
+        dispatcher = NotificationDispatcher(retry_backoff=0.01)
+        dispatcher.start()
+        self.assertTrue(dispatcher.submit(WEBHOOK, 'device_joined', make_device()))
+        wait_for(lambda: dispatcher.stats()['sent'] == 1)
+        dispatcher.stop()
+
+        stats = dispatcher.stats()
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(stats['retries'], 1)
+        self.assertEqual(stats['failed'], 0)
+        self.assertEqual(session.post.call_args[1]['json']['mac'], 'AA:BB:CC:00:11:00')
+
+    def test_client_errors_are_not_retried(self, MockSession):
+        """Test that a 4xx response fails immediately."""
+        MockSession.return_value.post.return_value = make_response(404)
+        dispatcher = NotificationDispatcher(retry_backoff=0.01)
+        dispatcher.start()
+        dispatcher.submit(WEBHOOK, 'device_joined', make_device())
+        wait_for(lambda: dispatcher.stats()['failed'] == 1)
+        dispatcher.stop()
+        self.assertEqual(dispatcher.stats()['requests'], 1)
+        self.assertIn('404', dispatcher.stats()['last_error'])
+
+    def test_coalesces_notifications_within_window(self, MockSession):
+        """Test that notifications within the batch window are sent as one payload."""
+        session = MockSession.return_value
+        session.post.return_value = make_response(200)
+        dispatcher = NotificationDispatcher(batch_window=0.2)
+        for i in range(5):
+            dispatcher.submit(WEBHOOK, 'device_offline', make_device(i))
+        dispatcher.start()
+        wait_for(lambda: dispatcher.stats()['sent'] == 5)
+        dispatcher.stop()
+
+        session.post.assert_called_once()
+        payload = session.post.call_args[1]['json']
+        self.assertEqual(payload['event'], 'batch')
+        self.assertEqual(payload['count'], 5)
+        self.assertEqual([e['mac'] for e in payload['events']], [make_device(i).mac for i in range(5)])
+
+    def test_drops_when_queue_is_full(self, MockSession):
+        """Test that submitting to a full queue drops the notification instead of blocking."""
+        dispatcher = NotificationDispatcher(queue_size=2)
+        results = [dispatcher.submit(WEBHOOK, 'device_joined', make_device(i)) for i in range(3)]
+        self.assertEqual(results, [True, True, False])
+        stats = dispatcher.stats()
+        self.assertEqual(stats['queue_depth'], 2)
+        self.assertEqual(stats['dropped'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
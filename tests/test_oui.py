@@ -0,0 +1,60 @@
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+from pingpoint.inventory import Inventory
+from pingpoint.oui import OuiDatabase, is_locally_administered, update
+
+REGISTRY_CSV = """Registry,Assignment,Organization Name,Organization Address
+MA-L,001A11,Google  Inc.,"1600 Amphitheatre Parkway Mountain View CA US 94043"
+MA-M,70B3D51,"Acme Sensors, Ltd.",Somewhere
+"""
+
+
+class TestOuiDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.prefix_file = "test_oui.txt"
+
+    def tearDown(self):
+        for path in (self.prefix_file, "test_oui_devices.json", "test_oui_devices.json.journal"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_longest_prefix_wins(self):
+        with open(self.prefix_file, "w") as f:
+            f.write("# comment\n70B3D5 IEEE Registration Authority\n70B3D51 Acme Sensors\n70B3D5123 Tiny Corp\n001A11 Google\n")
+        database = OuiDatabase.from_files([self.prefix_file, "missing.txt"])
+        self.assertEqual(len(database), 4)
+        self.assertEqual(database.lookup('00:1a:11:00:00:01'), 'Google')
+        self.assertEqual(database.lookup('70-B3-D5-12-34-56'), 'Tiny Corp')
+        self.assertEqual(database.lookup('70:B3:D5:1F:00:00'), 'Acme Sensors')
+        self.assertEqual(database.lookup('70:B3:D5:F0:00:00'), 'IEEE Registration Authority')
+        self.assertIsNone(database.lookup('00:00:00:00:00:01'))
+        self.assertIsNone(database.lookup('not a mac'))
+
+    def test_locally_administered(self):
+        self.assertTrue(is_locally_administered('DA:A1:19:00:11:22'))
+        self.assertFalse(is_locally_administered('00:1A:11:00:11:22'))
+        database = OuiDatabase()
+        database.add('DAA119', 'Randomized')
+        self.assertIsNone(database.lookup('DA:A1:19:00:11:22'))
+
+    @patch('pingpoint.oui.requests.get')
+    def test_update_writes_ieee_registries(self, mock_get):
+        mock_get.return_value = MagicMock(text=REGISTRY_CSV)
+        self.assertEqual(update(self.prefix_file, urls=["registry.csv"]), 2)
+        database = OuiDatabase.from_files([self.prefix_file])
+        self.assertEqual(database.lookup('00:1A:11:22:33:44'), 'Google Inc.')
+        self.assertEqual(database.lookup('70:B3:D5:1F:00:00'), 'Acme Sensors, Ltd.')
+
+    @patch('pingpoint.inventory.lookup_vendor', return_value='Google')
+    def test_inventory_fills_missing_vendor(self, mock_lookup):
+        inventory = Inventory(persistence_file="test_oui_devices.json")
+        inventory.update_from_scan([{'mac': '00:1A:11:00:11:22', 'ip': '192.168.1.100', 'vendor': None},
+                                    {'mac': '00:1A:11:00:11:33', 'ip': '192.168.1.101', 'vendor': 'Nmap Vendor'}])
+        self.assertEqual(inventory.get_device('00:1A:11:00:11:22').vendor, 'Google')
+        self.assertEqual(inventory.get_device('00:1A:11:00:11:33').vendor, 'Nmap Vendor')
+
+
+if __name__ == '__main__':
+    unittest.main()
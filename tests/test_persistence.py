@@ -0,0 +1,115 @@
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+from pingpoint.inventory import Inventory
+from pingpoint.events import EventStore
+from pingpoint.persistence import JournaledStore, SQLiteStore, create_store
+
+START = datetime(2025, 6, 22, 12, 0, 0)
+
+
+class TestSQLiteStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name)
+        self.json_file = self.directory / "devices.json"
+        self.db_file = self.directory / "pingpoint.db"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_inventory(self):
+        store = SQLiteStore(self.db_file, legacy_json=self.json_file)
+        return Inventory(persistence_file=self.json_file, event_log=store, store=store)
+
+    def test_round_trip_and_filters(self):
+        """Test that devices saved to SQLite reload and can be filtered."""
+        inventory = self.make_inventory()
+        scan = [{'mac': f'AA:BB:CC:00:11:{i:02X}', 'ip': f'192.168.1.{i}', 'vendor': 'Apple' if i % 2 else 'Intel',
+                 'subnet': '192.168.1.0/24'} for i in range(6)]
+        inventory.update_from_scan(scan)
+        inventory.update_device_details('AA:BB:CC:00:11:03', 'Printer', 'Office', True)
+        inventory.store.close()
+
+        inventory = self.make_inventory()
+        self.assertEqual(len(inventory.all_devices()), 6)
+        self.assertEqual(inventory.get_device('AA:BB:CC:00:11:03').friendly_name, 'Printer')
+        apple = inventory.find_devices(vendor='Apple', status='online')
+        self.assertEqual(sorted(d.mac for d in apple), ['AA:BB:CC:00:11:01', 'AA:BB:CC:00:11:03', 'AA:BB:CC:00:11:05'])
+        self.assertEqual(inventory.find_devices(subnet='10.0.0.0/8'), [])
+        # The join events were restored from the database.
+        self.assertEqual(len(inventory.events), 6)
+
+    def test_database_errors_do_not_fail_scans(self):
+        """Test that a failed save is logged and retried with the next save instead of raising."""
+        inventory = self.make_inventory()
+        with patch.object(inventory.store, 'write', side_effect=sqlite3.OperationalError("database is locked")):
+            inventory.update_from_scan([{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}])
+        self.assertEqual(inventory.get_device('AA:BB:CC:00:11:22').status, 'online')
+        inventory.save_to_disk()
+        self.assertIn('AA:BB:CC:00:11:22', inventory.store.load())
+        inventory.store.close()
+
+    def test_events_of_a_scan_are_stored_in_one_transaction(self):
+        """Test that the events a scan adds are committed together when it publishes."""
+        inventory = self.make_inventory()
+        statements = []
+        inventory.store._conn.set_trace_callback(statements.append)
+        inventory.update_from_scan([{'mac': f'AA:BB:CC:00:11:{i:02X}', 'ip': f'192.168.1.{i}'} for i in range(20)])
+        self.assertEqual(sum(1 for sql in statements if sql.startswith('INSERT OR REPLACE INTO events')), 20)
+        self.assertEqual(sum(1 for sql in statements if sql == 'COMMIT'), 2)  # The events, then the devices
+        self.assertEqual(len(inventory.store.tail(100)), 20)
+        inventory.store.close()
+
+    def test_migrates_json_inventory(self):
+        """Test that an existing devices.json is imported on first start only."""
+        legacy = Inventory(persistence_file=self.json_file)
+        legacy.update_from_scan([{'mac': 'AA:BB:CC:00:11:22', 'ip': '192.168.1.100'}])
+        legacy.save_to_disk(snapshot=True)
+
+        inventory = self.make_inventory()
+        self.assertIsNotNone(inventory.get_device('AA:BB:CC:00:11:22'))
+        inventory.store.close()
+
+        # Later changes to the JSON file are not imported again.
+        JournaledStore(self.json_file).snapshot([])
+        store = SQLiteStore(self.db_file, legacy_json=self.json_file)
+        self.assertEqual(list(store.load()), ['AA:BB:CC:00:11:22'])
+        store.close()
+
+    def test_event_queries_reach_past_memory_window(self):
+        """Test that event queries beyond the in-memory window are filtered in the database."""
+        store = SQLiteStore(self.db_file)
+        events = EventStore(capacity=3, log=store)
+        for minute in range(10):
+            events.append({
+                "timestamp": (START + timedelta(minutes=minute)).isoformat(),
+                "type": "device_offline" if minute % 2 else "device_joined",
+                "device": {"mac": f"MAC{minute % 3}"},
+                "message": f"Event at minute {minute}"
+            })
+
+        results, cursor = events.query(event_type='device_offline', limit=10)
+        self.assertEqual([e['id'] for e in results], [9, 7, 5, 3, 1])
+        self.assertIsNone(cursor)
+        results, _ = events.query(mac='MAC0', until=START + timedelta(minutes=6))
+        self.assertEqual([e['id'] for e in results], [6, 3, 0])
+        store.close()
+
+    def test_create_store(self):
+        """Test that the storage backend is selected by configuration."""
+        self.assertIsInstance(create_store({}, self.json_file), JournaledStore)
+        store = create_store({'backend': 'sqlite'}, self.json_file)
+        self.assertIsInstance(store, SQLiteStore)
+        self.assertEqual(store.path, self.db_file)
+        store.close()
+        with self.assertRaises(ValueError):
+            create_store({'backend': 'postgres'}, self.json_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import unittest
+from pingpoint.coordinator import ScanCoordinator
+from pingpoint.inventory import Inventory
+from pingpoint.scandiff import ScanDiffer
+
+
+def host(i, ip=None, **fields):
+    return {'mac': f'aa:bb:cc:00:11:{i:02x}', 'ip': ip or f'192.168.1.{i}', **fields}
+
+
+class TestScanDiffer(unittest.TestCase):
+
+    def test_classifies_hosts_against_committed_scan(self):
+        differ = ScanDiffer()
+        delta = differ.diff([host(1), host(2), {'ip': '192.168.1.99'}])
+        self.assertEqual([h['mac'] for h in delta.added], ['AA:BB:CC:00:11:01', 'AA:BB:CC:00:11:02'])
+        # Without a commit the next scan is still compared with nothing.
+        self.assertEqual(len(differ.diff([host(1)]).added), 1)
+
+        differ.diff([host(1), host(2)])
+        differ.commit()
+        delta = differ.diff([host(1, lease_expires='2025-06-23T04:14:37'), host(2, ip='192.168.1.50'), host(3)])
+        self.assertEqual([h['mac'] for h in delta.unchanged], ['AA:BB:CC:00:11:01'])
+        self.assertEqual([h['ip'] for h in delta.changed], ['192.168.1.50'])
+        self.assertEqual([h['mac'] for h in delta.added], ['AA:BB:CC:00:11:03'])
+        self.assertEqual(delta.removed, [])
+        differ.commit()
+        self.assertEqual(differ.diff([host(3)]).removed, ['AA:BB:CC:00:11:01', 'AA:BB:CC:00:11:02'])
+
+
+class TestIncrementalScans(unittest.TestCase):
+
+    def setUp(self):
+        self.test_file = "test_scandiff_devices.json"
+        self.tearDown()
+        self.inventory = Inventory(persistence_file=self.test_file)
+        self.coordinator = ScanCoordinator(self.inventory)
+
+    def tearDown(self):
+        for path in (self.test_file, f"{self.test_file}.journal"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def scan(self, hosts):
+        self.coordinator.run('edgemax', lambda: list(hosts))
+        return self.coordinator.status()['edgemax']['last_changes']
+
+    def test_list_scans_apply_only_changes(self):
+        self.assertEqual(self.scan([host(1), host(2)])['added'], 2)
+        changes = self.scan([host(1), host(2, ip='192.168.1.50')])
+        self.assertEqual((changes['unchanged'], changes['changed']), (1, 1))
+        self.assertEqual(self.inventory.get_device('AA:BB:CC:00:11:02').ip_addresses, ['192.168.1.2', '192.168.1.50'])
+        self.assertEqual(self.inventory.events[0]['type'], 'ip_change')
+
+        # Missing hosts still go offline, and unchanged hosts keep devices online.
+        self.scan([host(1)])
+        self.scan([host(1)])
+        self.assertEqual(self.inventory.get_device('AA:BB:CC:00:11:01').status, 'online')
+        self.assertEqual(self.inventory.get_device('AA:BB:CC:00:11:02').status, 'offline')
+        self.assertEqual(self.inventory.missed_scans('AA:BB:CC:00:11:01'), 0)
+
+    def test_unchanged_host_of_removed_device_is_added_again(self):
+        self.scan([host(1)])
+        self.inventory.remove_device('AA:BB:CC:00:11:01')
+        changes = self.scan([host(1)])
+        self.assertEqual(changes['unchanged'], 1)
+        self.assertEqual(self.inventory.get_device('AA:BB:CC:00:11:01').status, 'online')
+        self.assertEqual(self.inventory.events[0]['type'], 'device_joined')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import io
+import time
+import threading
 import unittest
 from unittest.mock import patch, MagicMock
-from pingpoint.scanner import parse_edgemax_arp, parse_edgemax_leases, NmapScanner, scan_network
+from pingpoint.models import Fingerprint
+from pingpoint.scanner import parse_edgemax_arp, parse_edgemax_leases, parse_edgemax_collection, NmapScanner, EdgeMaxScanner, CollectionEngine, scan_network
 
 # Mock data for EdgeMax
 MOCK_ARP_DATA = """IP address       HW type     HW address           Flags Mask            Iface
@@ -30,6 +34,31 @@ MOCK_NMAP_XML = """<?xml version="1.0" encoding="UTF-8"?>
 </nmaprun>
 """
 
+MOCK_FINGERPRINT_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<nmaprun scanner="nmap" args="nmap -A -oX - 192.168.1.10">
+<host><status state="up" reason="arp-response"/>
+<address addr="192.168.1.10" addrtype="ipv4"/>
+<hostnames><hostname name="test-device" type="PTR"/></hostnames>
+<ports>
+<port protocol="tcp" portid="22"><state state="open"/><service name="ssh" product="OpenSSH" version="8.9"/></port>
+<port protocol="tcp" portid="80"><state state="closed"/><service name="http"/></port>
+</ports>
+<os><osmatch name="Linux 5.X" accuracy="95"/></os>
+</host>
+<runstats><finished elapsed="12.5"/></runstats>
+</nmaprun>
+"""
+
+def mock_nmap_process(xml, returncode=0, stderr='', stderr_file=None):
+    """Builds a stand-in for a Popen object whose stdout streams the given XML and whose stderr goes to `stderr_file`."""
+    process = MagicMock()
+    process.stdout = io.BytesIO(xml.encode())
+    if stderr_file is not None:
+        stderr_file.write(stderr.encode())
+    process.wait.return_value = returncode
+    process.poll.return_value = returncode
+    return process
+
 MOCK_CONFIG = {
     'edgemax': {
         'host': '192.168.1.1',
@@ -50,6 +79,22 @@ class TestScanner(unittest.TestCase):
         self.assertEqual(devices[1]['ip'], '192.168.1.10')
         self.assertEqual(devices[1]['mac'], 'AA:BB:CC:DD:EE:FF')
 
+    def test_parse_proc_net_arp(self):
+        data = ("IP address       HW type     Flags       HW address            Mask     Device\n"
+                "192.168.1.1      0x1         0x2         00:11:22:33:44:55     *        eth0\n"
+                "192.168.1.7      0x1         0x0         00:00:00:00:00:00     *        eth0\n")
+        devices = parse_edgemax_arp(data)
+        self.assertEqual([(d['ip'], d['mac']) for d in devices],
+                         [('192.168.1.1', '00:11:22:33:44:55')])
+
+    def test_parse_arp_a_output(self):
+        data = ("? (192.168.1.1) at 00:11:22:33:44:55 [ether] on eth0\n"
+                "esp32-cam.lan (192.168.1.10) at aa:bb:cc:dd:ee:ff [ether] on eth0\n"
+                "? (192.168.1.20) at <incomplete> on eth0\n")
+        devices = parse_edgemax_arp(data)
+        self.assertEqual([(d['ip'], d['mac']) for d in devices],
+                         [('192.168.1.1', '00:11:22:33:44:55'), ('192.168.1.10', 'aa:bb:cc:dd:ee:ff')])
+
     def test_parse_edgemax_leases(self):
         devices = parse_edgemax_leases(MOCK_LEASES_DATA)
         self.assertEqual(len(devices), 2)
@@ -58,9 +103,24 @@ class TestScanner(unittest.TestCase):
         self.assertEqual(devices[1]['ip'], '192.168.1.20')
         self.assertEqual(devices[1]['mac'], '11:22:33:44:55:66')
 
-    @patch('pingpoint.scanner.subprocess.run')
-    def test_nmap_scanner(self, mock_run):
-        mock_run.return_value.stdout = MOCK_NMAP_XML
+    def test_parse_edgemax_collection_merges_arp_and_leases(self):
+        leases = MOCK_LEASES_DATA + "192.168.1.30    00:11:22:33:44:77  2025/06/23 05:00:00  IOT_POOL\n"
+        arp = MOCK_ARP_DATA + "192.168.1.40    0x1    0x0    00:00:00:00:00:00    *    eth1\n"
+        devices = parse_edgemax_collection(arp, leases)
+        self.assertEqual([d['mac'] for d in devices],
+                         ['00:11:22:33:44:55', 'AA:BB:CC:DD:EE:FF', '11:22:33:44:55:66', '00:11:22:33:44:77'])
+        # The ARP entry comes first but the lease fields are kept.
+        self.assertEqual(devices[1]['ip'], '192.168.1.10')
+        self.assertEqual(devices[1]['hostname'], 'test-device')
+        self.assertEqual(devices[1]['subnet'], 'LAN_POOL')
+        self.assertEqual(devices[1]['lease_expires'], '2025-06-23T04:14:37')
+        self.assertIsNone(devices[0]['hostname'])
+        self.assertIsNone(devices[3]['hostname'])
+        self.assertEqual(devices[3]['subnet'], 'IOT_POOL')
+
+    @patch('pingpoint.scanner.subprocess.Popen')
+    def test_nmap_scanner(self, mock_popen):
+        mock_popen.return_value = mock_nmap_process(MOCK_NMAP_XML)
         scanner = NmapScanner(subnets=['192.168.1.1/24'])
         results = scanner.scan()
         self.assertEqual(len(results), 2)
@@ -68,6 +128,94 @@ class TestScanner(unittest.TestCase):
         self.assertEqual(results[1]['mac'], 'AA:BB:CC:DD:EE:FF')
         self.assertEqual(results[1]['vendor'], 'Apple')
 
+    def test_parse_xml_streams_hosts(self):
+        scanner = NmapScanner(subnets=[])
+        hosts = scanner._iter_hosts(io.BytesIO(MOCK_NMAP_XML.encode()), '192.168.1.0/24')
+        first = next(hosts)
+        self.assertEqual(first['mac'], '00:11:22:33:44:55')
+        self.assertEqual(len(list(hosts)), 1)
+
+    @patch('pingpoint.scanner.subprocess.Popen')
+    def test_scan_for_fingerprint(self, mock_popen):
+        mock_popen.return_value = mock_nmap_process(MOCK_FINGERPRINT_XML)
+        fingerprint = NmapScanner(subnets=[]).scan_for_fingerprint('192.168.1.10')
+        self.assertEqual(fingerprint.hostname, 'test-device')
+        self.assertEqual(fingerprint.os_match, 'Linux 5.X')
+        self.assertEqual(fingerprint.os_accuracy, '95')
+        self.assertEqual([p['portid'] for p in fingerprint.ports], ['22'])
+        self.assertEqual(fingerprint.ports[0]['product'], 'OpenSSH')
+        self.assertEqual(fingerprint.tier, 'deep')
+
+    def test_fingerprint_merge(self):
+        quick = Fingerprint(ports=[{'portid': '80', 'protocol': 'tcp', 'service_name': 'http', 'product': None, 'version': None}], tier='quick')
+        deep = Fingerprint(os_match='Linux', ports=[
+            {'portid': '80', 'protocol': 'tcp', 'service_name': 'http', 'product': 'nginx', 'version': '1.24'},
+            {'portid': '22', 'protocol': 'tcp', 'service_name': 'ssh', 'product': 'OpenSSH', 'version': '8.9'},
+        ], tier='deep')
+        merged = quick.merge(deep)
+        self.assertEqual(merged.os_match, 'Linux')
+        self.assertEqual(merged.tier, 'deep')
+        self.assertEqual([p['portid'] for p in merged.ports], ['80', '22'])
+        self.assertEqual(merged.ports[0]['product'], 'nginx')
+
+    def test_nmap_shards(self):
+        scanner = NmapScanner(subnets=['10.10.0.0/22', '192.168.1.0/24'], shard_prefix=24)
+        shards = scanner._shards()
+        self.assertEqual(len(shards), 5)
+        self.assertEqual(shards[0], ('10.10.0.0/24', '10.10.0.0/22'))
+        self.assertEqual(shards[3], ('10.10.3.0/24', '10.10.0.0/22'))
+        self.assertEqual(shards[4], ('192.168.1.0/24', '192.168.1.0/24'))
+
+    @patch('pingpoint.scanner.subprocess.Popen')
+    def test_nmap_scanner_sharded_partial_results(self, mock_popen):
+        def fake_popen(command, stdout=None, stderr=None):
+            if command[-1] == '10.10.1.0/24':
+                return mock_nmap_process('', returncode=1, stderr='Failed to resolve', stderr_file=stderr)
+            return mock_nmap_process(MOCK_NMAP_XML)
+        mock_popen.side_effect = fake_popen
+
+        scanner = NmapScanner(subnets=['10.10.0.0/23'], max_workers=2, shard_prefix=24, shard_timeout=5)
+        with self.assertLogs(level='ERROR') as logs:
+            results = scanner.scan()
+        self.assertIn('Failed to resolve', '\n'.join(logs.output))
+
+        # The failed shard is skipped and duplicate MACs across shards are merged.
+        self.assertEqual(mock_popen.call_count, 2)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['subnet'], '10.10.0.0/23')
+
+    @patch('pingpoint.scanner.subprocess.Popen')
+    def test_abandoned_nmap_scan_kills_running_shards(self, mock_popen):
+        killed = threading.Event()
+
+        class SlowStdout(io.RawIOBase):
+            """Streams one host, then blocks like a running sweep until the process is killed."""
+            def __init__(self):
+                second_host = MOCK_NMAP_XML.index('<host', MOCK_NMAP_XML.index('<host') + 1)
+                self.data = io.BytesIO(MOCK_NMAP_XML[:second_host].encode())
+
+            def readable(self):
+                return True
+
+            def readinto(self, buffer):
+                chunk = self.data.read(len(buffer))
+                if not chunk:
+                    killed.wait(5)
+                buffer[:len(chunk)] = chunk
+                return len(chunk)
+
+        process = mock_nmap_process('')
+        process.stdout = SlowStdout()
+        process.poll.return_value = None
+        process.kill.side_effect = killed.set
+        process.wait.return_value = -9
+        mock_popen.return_value = process
+
+        hosts = NmapScanner(subnets=['192.168.1.0/24']).scan_iter()
+        self.assertEqual(next(hosts)['mac'], '00:11:22:33:44:55')
+        hosts.close()
+        self.assertTrue(killed.wait(5))
+
     @patch('pingpoint.scanner.EdgeMaxScanner')
     def test_scan_network_primary_success(self, MockEdgeMaxScanner):
         # Mock the EdgeMaxScanner instance and its scan method
@@ -92,13 +240,140 @@ class TestScanner(unittest.TestCase):
         MockEdgeMaxScanner.side_effect = Exception("SSH Connection Failed")
 
         # Mock the NmapScanner instance and its scan method
-        mock_nmap_instance = MockNmapScanner.return_value
+        mock_nmap_instance = MockNmapScanner.from_config.return_value
         mock_nmap_instance.scan.return_value = [{'ip': '192.168.1.10', 'mac': 'AA:BB:CC:DD:EE:FF', 'vendor': 'Apple'}]
 
         results = scan_network(MOCK_CONFIG)
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]['mac'], 'AA:BB:CC:DD:EE:FF')
-        MockNmapScanner.assert_called_once_with(subnets=MOCK_CONFIG['subnets'])
+        MockNmapScanner.from_config.assert_called_once_with(MOCK_CONFIG)
+
+    @patch('pingpoint.scanner.EdgeMaxScanner')
+    @patch('pingpoint.scanner.NmapScanner')
+    def test_scan_network_multiple_routers(self, MockNmapScanner, MockEdgeMaxScanner):
+        config = {
+            'subnets': ['192.168.1.0/24', '10.10.0.0/16'],
+            'routers': [
+                {'name': 'main', 'host': '192.168.1.1', 'username': 'u', 'password': 'p', 'subnets': ['192.168.1.0/24']},
+                {'name': 'lab', 'host': '10.10.0.1', 'username': 'u', 'password': 'p', 'subnets': ['10.10.0.0/16']},
+            ]
+        }
+
+        def make_scanner(host, **kwargs):
+            scanner = MagicMock()
+            if host == '10.10.0.1':
+                scanner.scan.side_effect = IOError("Connection refused")
+            else:
+                scanner.scan.return_value = [
+                    {'ip': '192.168.1.10', 'mac': 'aa:bb:cc:dd:ee:ff', 'hostname': None, 'vendor': None},
+                ]
+            return scanner
+        MockEdgeMaxScanner.side_effect = make_scanner
+        MockNmapScanner.from_config.return_value.scan.return_value = [
+            {'ip': '10.10.0.5', 'mac': '11:22:33:44:55:66', 'vendor': 'Apple'},
+            {'ip': '192.168.1.10', 'mac': 'AA:BB:CC:DD:EE:FF', 'vendor': 'Apple'},
+        ]
+
+        engine = CollectionEngine()
+        results = engine.collect(config)
+
+        # Only the failed router's subnets fall back to Nmap, and duplicates are merged.
+        MockNmapScanner.from_config.assert_called_once_with(config, subnets=['10.10.0.0/16'])
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['router'], 'main')
+        self.assertEqual(results[0]['vendor'], 'Apple')
+        health = engine.health()
+        self.assertEqual(health['main']['status'], 'ok')
+        self.assertEqual(health['lab']['status'], 'failed')
+        self.assertEqual(health['lab']['consecutive_failures'], 1)
+
+    @patch('pingpoint.scanner.EdgeMaxScanner')
+    def test_router_timeout_starts_when_its_poll_starts(self, MockEdgeMaxScanner):
+        routers = [{'name': name, 'host': f'10.0.0.{i}', 'username': 'u', 'timeout': 0.5}
+                   for i, name in enumerate(['first', 'second'])]
+
+        def make_scanner(host, **kwargs):
+            scanner = MagicMock()
+            scanner.scan.side_effect = lambda: time.sleep(0.3) or [{'ip': host, 'mac': f'AA:BB:CC:00:00:0{host[-1]}'}]
+            return scanner
+        MockEdgeMaxScanner.side_effect = make_scanner
+
+        # With a single worker, the second router only starts once the first is done.
+        engine = CollectionEngine(max_workers=1)
+        results = engine.collect({'routers': routers}, fallback=False)
+        self.assertEqual(len(results), 2)
+        self.assertEqual({state['status'] for state in engine.health().values()}, {'ok'})
+
+    @patch('pingpoint.scanner.EdgeMaxScanner')
+    def test_late_router_response_is_ignored(self, MockEdgeMaxScanner):
+        responded = threading.Event()
+
+        def slow_scan():
+            time.sleep(0.3)
+            responded.set()
+            return [{'ip': '10.0.0.1', 'mac': 'AA:BB:CC:00:00:01'}]
+        MockEdgeMaxScanner.return_value.scan.side_effect = slow_scan
+
+        engine = CollectionEngine()
+        config = {'routers': [{'name': 'slow', 'host': '10.0.0.1', 'username': 'u', 'timeout': 0.1}]}
+        with self.assertRaises(IOError):
+            engine.collect(config, fallback=False)
+        self.assertTrue(responded.wait(2))
+        time.sleep(0.05)
+        self.assertEqual(engine.health()['slow']['status'], 'failed')
+
+
+def mock_exec_result(output, exit_status=0):
+    """Builds the (stdin, stdout, stderr) triple returned by exec_command."""
+    stdout = MagicMock()
+    stdout.read.return_value = output.encode()
+    stdout.channel.recv_exit_status.return_value = exit_status
+    stderr = MagicMock()
+    stderr.read.return_value = b''
+    return MagicMock(), stdout, stderr
+
+
+class TestEdgeMaxScanner(unittest.TestCase):
+
+    def setUp(self):
+        EdgeMaxScanner._sessions.clear()
+
+    def tearDown(self):
+        EdgeMaxScanner._sessions.clear()
+
+    def batched_output(self):
+        delimiter = EdgeMaxScanner.DELIMITER
+        return f"{MOCK_ARP_DATA}\n{delimiter}\n{MOCK_LEASES_DATA}\n{delimiter}\n"
+
+    @patch('pingpoint.scanner.paramiko.SSHClient')
+    def test_scan_reuses_session_with_one_command(self, MockSSHClient):
+        client = MockSSHClient.return_value
+        client.exec_command.side_effect = lambda *args, **kwargs: mock_exec_result(self.batched_output())
+
+        first = EdgeMaxScanner('192.168.1.1', 22, 'test', 'password').scan()
+        second = EdgeMaxScanner('192.168.1.1', 22, 'test', 'password').scan()
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 3)
+        client.connect.assert_called_once()
+        client.get_transport.return_value.set_keepalive.assert_called_once_with(EdgeMaxScanner.KEEPALIVE_INTERVAL)
+        self.assertEqual(client.exec_command.call_count, 2)
+        client.close.assert_not_called()
+
+    @patch('pingpoint.scanner.paramiko.SSHClient')
+    def test_reconnects_when_session_drops(self, MockSSHClient):
+        dead, alive = MagicMock(), MagicMock()
+        MockSSHClient.side_effect = [dead, alive]
+        dead.exec_command.side_effect = EOFError()
+        dead.get_transport.return_value.is_active.return_value = False
+        alive.exec_command.return_value = mock_exec_result(self.batched_output())
+
+        arp_data, leases_data = EdgeMaxScanner('192.168.1.1', 22, 'test', 'password').collect()
+
+        self.assertIn('AA:BB:CC:DD:EE:FF', arp_data)
+        self.assertIn('another-device', leases_data)
+        dead.close.assert_called_once()
+        alive.connect.assert_called_once()
 
 
 if __name__ == '__main__':